@@ -2,7 +2,8 @@
 ALOsシステム: Abstract Language Objects システムの実装
 論文 "Towards Digital Nature" に基づく実装
 """
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 import json
 import os
@@ -117,6 +118,40 @@ Format the output as a JSON structure."""
         
         return alos_data
     
+    def create_alos_concurrently(
+        self,
+        requests: List[Tuple[str, Dict, List[str]]],
+        max_workers: int = 4
+    ) -> Dict[str, Any]:
+        """
+        複数のポケモンのALOsを並行して生成
+        
+        各ポケモンの生成は独立しており、1匹が失敗しても他のポケモンには影響しません。
+        
+        Args:
+            requests: (ポケモンの名前, ポケモンのデータ, コンテクスト) のリスト
+            max_workers: 同時に実行するAPI呼び出しの最大数
+            
+        Returns:
+            {ポケモンの名前: 生成されたALOs定義、または失敗時の例外}
+        """
+        results = {}
+        if not requests:
+            return results
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(requests)))) as executor:
+            futures = {
+                name: executor.submit(self.create_alos, name, data, context)
+                for name, data, context in requests
+            }
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = e
+        
+        return results
+    
     def simulate_interaction(
         self,
         pokemons: List[Dict],
@@ -0,0 +1,149 @@
+"""
+ベンチマーク共通: ポケモンやエンジンの生成と時間計測のヘルパー
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from pokemon_alos import PokemonALOs
+from world import WorldConfig
+
+CONTEXT_FILE = os.path.join(ROOT, "pokemon_context.json")
+SPECIES_KEYS = ("pikachu", "meowth", "sprigatito")
+
+
+class DummyALOsSystem:
+    """LLMを呼ばないALOsシステム（インタラクションの計算だけを計測するため）"""
+    
+    def simulate_interaction(self, pokemons, scenario, context):
+        return "（ベンチマーク）"
+
+
+def load_context() -> Dict:
+    """pokemon_context.json を読み込む"""
+    with open(CONTEXT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def seed_all(seed: int):
+    """random と numpy の乱数を固定"""
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def make_pokemons(
+    n_agents: int,
+    context: Optional[Dict] = None,
+    seed: int = 0,
+    world: Optional[WorldConfig] = None
+) -> List[PokemonALOs]:
+    """
+    ベンチマーク用のポケモンを生成
+    
+    3体以下なら通常のキー、それより多い場合は "pikachu_12" のような連番のキーにします。
+    
+    Args:
+        n_agents: 生成する数
+        context: pokemon_context.json の内容（省略時は読み込む）
+        seed: 初期位置の乱数シード
+        world: ワールド設定（省略時は既定の10×10）
+    
+    Returns:
+        ポケモンのリスト
+    """
+    context = context or load_context()
+    seed_all(seed)
+    pokemons = []
+    for i in range(n_agents):
+        species = SPECIES_KEYS[i % len(SPECIES_KEYS)]
+        key = species if n_agents <= len(SPECIES_KEYS) else f"{species}_{i}"
+        pokemons.append(PokemonALOs(key, context[species], world=world))
+    return pokemons
+
+
+def make_engine(n_agents: int, rag_system=None, seed: int = 0, world: Optional[WorldConfig] = None):
+    """
+    RAGとLLMを使わないシミュレーションエンジンを生成
+    
+    Args:
+        n_agents: ポケモンの数
+        rag_system: RAGシステム（省略時は use_rag=False の PokemonRAG）
+        seed: 乱数シード
+        world: ワールド設定（省略時は既定の10×10）
+    
+    Returns:
+        SimulationEngine
+    """
+    from rag_system import PokemonRAG
+    from simulation_engine import SimulationEngine
+    
+    pokemons = make_pokemons(n_agents, seed=seed, world=world)
+    if rag_system is None:
+        rag_system = PokemonRAG(CONTEXT_FILE, use_rag=False)
+    return SimulationEngine(pokemons, DummyALOsSystem(), rag_system, echo_events=False, world=world)
+
+
+def measure(
+    fn: Callable[[], object],
+    number: int = 1,
+    min_time: float = 0.5,
+    min_repeats: int = 3,
+    max_repeats: int = 200,
+    warmup: int = 1
+) -> Dict:
+    """
+    関数の実行時間を計測
+    
+    fn を number 回呼ぶのを1サンプルとし、min_time 秒を超えるか
+    max_repeats サンプルに達するまで繰り返します。
+    
+    Args:
+        fn: 計測する関数
+        number: 1サンプルあたりの呼び出し回数（速い処理のタイマーの誤差を減らす）
+        min_time: 計測を続ける最短時間（秒）
+        min_repeats: 最小のサンプル数
+        max_repeats: 最大のサンプル数
+        warmup: 計測前に捨てる呼び出し回数
+    
+    Returns:
+        1回あたりの時間（マイクロ秒）の中央値・平均・最小と、サンプル数
+    """
+    for _ in range(warmup):
+        fn()
+    
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number * 1e6)
+        if len(samples) >= min_repeats and time.perf_counter() - started >= min_time:
+            break
+    
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "mean_us": round(statistics.fmean(samples), 3),
+        "min_us": round(min(samples), 3),
+        "repeats": len(samples),
+        "number": number
+    }
+
+
+def format_time(us: float) -> str:
+    """マイクロ秒を読みやすい単位で表示"""
+    if us >= 1e6:
+        return f"{us / 1e6:.2f} s"
+    if us >= 1e3:
+        return f"{us / 1e3:.2f} ms"
+    return f"{us:.2f} µs"
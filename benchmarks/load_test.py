@@ -0,0 +1,356 @@
+"""
+負荷試験: LLMの遅延を模擬したシナリオ単位のシミュレーション実行
+
+使い方:
+    python benchmarks/load_test.py [--agents 30] [--ticks 200] [--duration 60]
+                                   [--llm-p50 0.2] [--llm-p99 1.5] [--llm-error-rate 0.02]
+                                   [--battle-rate 0.15] [--friendship-rate 0.2]
+                                   [--rag none|lexical] [--phases] [--output result.json]
+                                   [--field-size auto|1000] [--boundary clamp|wrap]
+
+ALOsシステムの代わりに、対数正規分布の遅延（p50とp99で指定）と
+一定の割合のエラーを返す偽のLLMを使って SimulationEngine を動かし、
+ティック/秒、ティックの所要時間のパーセンタイル、ティックあたりのLLM呼び出し数、
+時間経過によるメモリの増加を報告します。
+"""
+import argparse
+import array
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _common import CONTEXT_FILE, make_pokemons, seed_all
+
+from world import WorldConfig
+
+import numpy as np
+
+# 標準正規分布の99パーセンタイル点
+_Z99 = 2.3263478740408408
+
+
+class FakeLLMError(RuntimeError):
+    """偽のLLMが注入したエラー"""
+
+
+class FakeALOsSystem:
+    """遅延とエラーを注入する偽のALOsシステム
+    
+    遅延は中央値 p50、99パーセンタイル p99 の対数正規分布に従います。
+    呼び出しは複数スレッドから来てもよいように、統計はロックで守ります。
+    """
+    
+    def __init__(self, p50: float = 0.2, p99: float = 1.5, error_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            p50: 遅延の中央値（秒）
+            p99: 遅延の99パーセンタイル（秒, p50以上）
+            error_rate: 例外を投げる確率
+            seed: 遅延とエラーの乱数シード
+        """
+        if p50 < 0 or p99 < p50:
+            raise ValueError("遅延は 0 <= p50 <= p99 で指定してください")
+        
+        self.p50 = p50
+        self.p99 = p99
+        self.error_rate = error_rate
+        self._mu = math.log(p50) if p50 > 0 else None
+        self._sigma = math.log(p99 / p50) / _Z99 if p50 > 0 else 0.0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        
+        self.calls = 0
+        self.errors = 0
+        # 試験自体がメモリの増加に混ざらないよう、floatオブジェクトではなく配列に溜める
+        self.latencies = array.array("d")
+    
+    def _draw(self):
+        """(遅延, エラーにするかどうか) を引く"""
+        with self._lock:
+            latency = self._rng.lognormvariate(self._mu, self._sigma) if self._mu is not None else 0.0
+            failed = self._rng.random() < self.error_rate
+            self.calls += 1
+            if failed:
+                self.errors += 1
+            self.latencies.append(latency)
+        return latency, failed
+    
+    def simulate_interaction(self, pokemons: List[Dict], scenario: str, context: List[str]) -> str:
+        """ALOsSystem.simulate_interaction と同じ形で、遅延の後に結果かエラーを返す"""
+        latency, failed = self._draw()
+        if latency > 0:
+            time.sleep(latency)
+        if failed:
+            raise FakeLLMError("注入されたLLMエラー")
+        names = "と".join(p.get("name", "?") for p in pokemons)
+        return f"（負荷試験）{names}: {scenario}"
+
+
+def percentiles(values: Sequence[float], points=(50, 90, 99)) -> Dict[str, float]:
+    """パーセンタイルと最大値を辞書で返す"""
+    if len(values) == 0:
+        return {}
+    array = np.asarray(values, dtype=float)
+    result = {f"p{p}": float(np.percentile(array, p)) for p in points}
+    result["max"] = float(array.max())
+    return result
+
+
+def _rss_bytes() -> Optional[int]:
+    """プロセスの常駐メモリ（Linux以外ではNone）"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def run_load_test(
+    n_agents: int,
+    ticks: Optional[int],
+    duration: Optional[float],
+    llm: FakeALOsSystem,
+    rag_mode: str = "none",
+    battle_rate: float = 0.15,
+    friendship_rate: float = 0.2,
+    memory_every: int = 10,
+    trace_python_heap: bool = False,
+    profile_phases: bool = False,
+    world: Optional[WorldConfig] = None,
+    seed: int = 0,
+    progress: bool = True
+) -> Dict:
+    """
+    負荷試験を実行
+    
+    Args:
+        n_agents: ポケモンの数
+        ticks: 実行するティック数（Noneなら duration まで）
+        duration: 実行する最大の秒数（Noneなら ticks まで）
+        llm: 偽のALOsシステム
+        rag_mode: RAGの検索モード (none/lexical)
+        battle_rate: バトルの確率（SimulationEngine.battle_probability）
+        friendship_rate: 友好イベントの確率（SimulationEngine.friendship_probability）
+        memory_every: メモリを記録する間隔（ティック）
+        trace_python_heap: tracemallocでPythonのヒープも記録するかどうか（計測が遅くなる）
+        profile_phases: ステップのフェーズごとの所要時間も記録するかどうか
+        world: ワールド設定（省略時は既定の10×10）
+        seed: 乱数シード
+        progress: 途中経過を表示するかどうか
+    
+    Returns:
+        結果の辞書
+    """
+    from rag_system import PokemonRAG
+    from simulation_engine import SimulationEngine
+    
+    if rag_mode == "none":
+        rag = PokemonRAG(CONTEXT_FILE, use_rag=False)
+    else:
+        rag = PokemonRAG(CONTEXT_FILE, use_rag=True, retrieval_mode=rag_mode)
+    
+    pokemons = make_pokemons(n_agents, seed=seed, world=world)
+    engine = SimulationEngine(pokemons, llm, rag, echo_events=False, world=world)
+    engine.battle_probability = battle_rate
+    engine.friendship_probability = friendship_rate
+    engine.set_profiling(profile_phases)
+    seed_all(seed + 1)
+    
+    if trace_python_heap:
+        tracemalloc.start()
+    
+    tick_times: List[float] = []
+    calls_per_tick: List[int] = []
+    memory: List[Dict] = []
+    
+    def sample_memory(tick: int):
+        entry = {"tick": tick, "elapsed_s": round(time.perf_counter() - started, 3)}
+        rss = _rss_bytes()
+        if rss is not None:
+            entry["rss_mb"] = round(rss / 2**20, 2)
+        if trace_python_heap:
+            entry["heap_mb"] = round(tracemalloc.get_traced_memory()[0] / 2**20, 2)
+        memory.append(entry)
+    
+    started = time.perf_counter()
+    sample_memory(0)
+    tick = 0
+    while True:
+        if ticks is not None and tick >= ticks:
+            break
+        if duration is not None and time.perf_counter() - started >= duration:
+            break
+        
+        calls_before = llm.calls
+        t0 = time.perf_counter()
+        engine.step(include_state=False)
+        tick_times.append(time.perf_counter() - t0)
+        calls_per_tick.append(llm.calls - calls_before)
+        tick += 1
+        
+        if tick % memory_every == 0:
+            sample_memory(tick)
+            if progress:
+                print(f"  ティック {tick}: {tick_times[-1] * 1000:.1f} ms, LLM呼び出し {calls_per_tick[-1]}回")
+    
+    elapsed = time.perf_counter() - started
+    if not memory or memory[-1]["tick"] != tick:
+        sample_memory(tick)
+    if trace_python_heap:
+        tracemalloc.stop()
+    engine.close()
+    
+    result = {
+        "config": {
+            "agents": n_agents,
+            "ticks": ticks,
+            "duration_s": duration,
+            "rag": rag_mode,
+            "battle_rate": battle_rate,
+            "friendship_rate": friendship_rate,
+            "llm_p50_s": llm.p50,
+            "llm_p99_s": llm.p99,
+            "llm_error_rate": llm.error_rate,
+            "field": list(engine.world.size),
+            "boundary": engine.world.boundary,
+            "seed": seed
+        },
+        "ticks": tick,
+        "elapsed_s": round(elapsed, 3),
+        "ticks_per_sec": round(tick / elapsed, 3) if elapsed > 0 else None,
+        "tick_latency_ms": {k: round(v * 1000, 3) for k, v in percentiles(tick_times).items()},
+        "llm": {
+            "calls": llm.calls,
+            "errors": llm.errors,
+            "calls_per_tick_mean": round(float(np.mean(calls_per_tick)), 3) if calls_per_tick else 0.0,
+            "calls_per_tick_max": max(calls_per_tick, default=0),
+            "latency_ms": {k: round(v * 1000, 3) for k, v in percentiles(llm.latencies).items()},
+            "time_share": round(sum(llm.latencies) / elapsed, 3) if elapsed > 0 else None
+        },
+        "events": engine.event_count,
+        "memory": {
+            "samples": memory,
+            **_memory_growth(memory)
+        }
+    }
+    if profile_phases:
+        result["phases"] = engine.get_phase_stats()
+    return result
+
+
+def _memory_growth(samples: List[Dict]) -> Dict:
+    """メモリの増加量と、1000ティックあたりの増加率（最小二乗の傾き）"""
+    result = {}
+    for key in ("rss_mb", "heap_mb"):
+        points = [(s["tick"], s[key]) for s in samples if key in s]
+        if len(points) < 2:
+            continue
+        x = np.array([p[0] for p in points], dtype=float)
+        y = np.array([p[1] for p in points], dtype=float)
+        result[f"{key}_growth"] = round(float(y[-1] - y[0]), 2)
+        if np.ptp(x) > 0:
+            result[f"{key}_per_1k_ticks"] = round(float(np.polyfit(x, y, 1)[0] * 1000), 3)
+    return result
+
+
+def print_report(result: Dict):
+    """結果を読みやすく表示"""
+    config = result["config"]
+    llm = result["llm"]
+    latency = result["tick_latency_ms"]
+    memory = result["memory"]
+    
+    print("\n" + "=" * 60)
+    width, height = config["field"]
+    print(f"負荷試験の結果 ({config['agents']}体, {width:g}×{height:g} {config['boundary']}, "
+          f"{result['ticks']}ティック, {result['elapsed_s']:.1f}秒)")
+    print("=" * 60)
+    print(f"  ティック/秒: {result['ticks_per_sec']}")
+    if latency:
+        print(f"  ティックの所要時間: p50 {latency['p50']:.1f} ms / p90 {latency['p90']:.1f} ms / "
+              f"p99 {latency['p99']:.1f} ms / 最大 {latency['max']:.1f} ms")
+    print(f"  LLM呼び出し: 合計 {llm['calls']}回 (エラー {llm['errors']}回), "
+          f"ティックあたり 平均 {llm['calls_per_tick_mean']} / 最大 {llm['calls_per_tick_max']}")
+    if llm["latency_ms"]:
+        print(f"  LLMの遅延: p50 {llm['latency_ms']['p50']:.0f} ms / p99 {llm['latency_ms']['p99']:.0f} ms, "
+              f"実行時間に占める割合 {llm['time_share'] * 100:.0f}%")
+    if "rss_mb_growth" in memory:
+        print(f"  メモリ(RSS): {memory['samples'][0]['rss_mb']} MB → {memory['samples'][-1]['rss_mb']} MB "
+              f"(+{memory['rss_mb_growth']} MB, {memory.get('rss_mb_per_1k_ticks', 0)} MB/1000ティック)")
+    if "heap_mb_growth" in memory:
+        print(f"  Pythonヒープ: +{memory['heap_mb_growth']} MB "
+              f"({memory.get('heap_mb_per_1k_ticks', 0)} MB/1000ティック)")
+    if "phases" in result:
+        from profiling import format_phase_stats
+        print(format_phase_stats(result["phases"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLMの遅延を模擬したシミュレーションの負荷試験')
+    parser.add_argument('--agents', type=int, default=30, help='ポケモンの数')
+    parser.add_argument('--ticks', type=int, default=200, help='実行するティック数（0なら--durationまで）')
+    parser.add_argument('--duration', type=float, default=None, help='実行する最大の秒数')
+    parser.add_argument('--llm-p50', type=float, default=0.2, help='LLMの遅延の中央値（秒）')
+    parser.add_argument('--llm-p99', type=float, default=1.5, help='LLMの遅延の99パーセンタイル（秒）')
+    parser.add_argument('--llm-error-rate', type=float, default=0.02, help='LLMがエラーを返す確率')
+    parser.add_argument('--battle-rate', type=float, default=0.15, help='バトルの確率')
+    parser.add_argument('--friendship-rate', type=float, default=0.2, help='友好イベントの確率')
+    parser.add_argument('--rag', type=str, default='none', choices=['none', 'lexical'], help='RAGの検索モード')
+    parser.add_argument('--memory-every', type=int, default=10, help='メモリを記録する間隔（ティック）')
+    parser.add_argument('--trace-heap', action='store_true', help='tracemallocでPythonのヒープも記録する（遅くなる）')
+    parser.add_argument('--phases', action='store_true', help='ステップのフェーズごとの所要時間も記録する')
+    parser.add_argument('--field-size', type=str, default='10',
+                        help='フィールドの1辺の長さ（autoなら個体数に合わせて面積あたりの個体数を一定にする）')
+    parser.add_argument('--boundary', type=str, default='clamp', choices=['clamp', 'wrap'], help='フィールドの端の扱い')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    parser.add_argument('--output', type=str, default=None, help='結果を書き出すJSONファイル')
+    parser.add_argument('--quiet', action='store_true', help='途中経過を表示しない')
+    args = parser.parse_args()
+    
+    ticks = args.ticks if args.ticks > 0 else None
+    if ticks is None and args.duration is None:
+        parser.error("--ticks 0 の場合は --duration を指定してください")
+    
+    if args.field_size == 'auto':
+        world = WorldConfig.for_agents(args.agents, boundary=args.boundary)
+    else:
+        side = float(args.field_size)
+        world = WorldConfig(width=side, height=side, boundary=args.boundary)
+    
+    llm = FakeALOsSystem(args.llm_p50, args.llm_p99, args.llm_error_rate, seed=args.seed)
+    print(f"🏋️ 負荷試験を開始: {args.agents}体, LLM p50 {args.llm_p50}s / p99 {args.llm_p99}s, "
+          f"エラー率 {args.llm_error_rate * 100:.1f}%")
+    
+    result = run_load_test(
+        args.agents,
+        ticks,
+        args.duration,
+        llm,
+        rag_mode=args.rag,
+        battle_rate=args.battle_rate,
+        friendship_rate=args.friendship_rate,
+        memory_every=args.memory_every,
+        trace_python_heap=args.trace_heap,
+        profile_phases=args.phases,
+        world=world.validate(),
+        seed=args.seed,
+        progress=not args.quiet
+    )
+    print_report(result)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 結果を保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+メモリベンチマーク: PokemonALOs 1体あたりのメモリ使用量
+
+使い方:
+    python benchmarks/memory_pokemon.py [--agents 100000]
+
+__slots__ と共有プロフィールを使う現在の PokemonALOs と、
+以前の __dict__ ベースのレイアウトを同じ個体数で比較します。
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pokemon_alos import PokemonALOs
+
+
+class DictLayoutPokemon:
+    """比較用: 以前の PokemonALOs と同じ属性を __dict__ に持つレイアウト"""
+    
+    def __init__(self, pokemon_key: str, pokemon_data: dict, alos_definition: dict = None):
+        self.key = pokemon_key
+        self.name = pokemon_data['name']
+        self.owner = pokemon_data['owner']
+        self.species = pokemon_data['species']
+        self.type = pokemon_data['type']
+        self.personality = pokemon_data['personality']
+        self.base_abilities = pokemon_data['abilities']
+        self.position = (random.uniform(0, 10), random.uniform(0, 10))
+        self.hp = 100
+        self.energy = 100
+        self.mood = "normal"
+        self.current_abilities = self.base_abilities.copy()
+        self.relationships = {}
+        self.inventory = []
+        self.max_inventory = 3
+        self.alos_definition = alos_definition or {}
+        self.action_history = []
+
+
+def measure(cls, n_agents: int, context: dict) -> float:
+    """n_agents体を生成し、1体あたりの確保バイト数を返す"""
+    species_keys = ['pikachu', 'meowth', 'sprigatito']
+    
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    
+    agents = [
+        cls(f"{species_keys[i % 3]}_{i}", context[species_keys[i % 3]])
+        for i in range(n_agents)
+    ]
+    
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    # キー文字列は両方のレイアウトで同じなので、差分を見るときは含めたままで良い
+    del agents
+    return (after - before) / n_agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PokemonALOsのメモリベンチマーク')
+    parser.add_argument('--agents', type=int, default=100000, help='生成する個体数')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+    args = parser.parse_args()
+    
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, 'pokemon_context.json'), 'r', encoding='utf-8') as f:
+        context = json.load(f)
+    
+    before = measure(DictLayoutPokemon, args.agents, context)
+    after = measure(PokemonALOs, args.agents, context)
+    
+    result = {
+        "agents": args.agents,
+        "dict_layout_bytes_per_agent": round(before, 1),
+        "slots_layout_bytes_per_agent": round(after, 1),
+        "reduction": round(1 - after / before, 3)
+    }
+    
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+    else:
+        print(f"個体数: {args.agents}")
+        print(f"  __dict__レイアウト: {before:8.1f} bytes/体")
+        print(f"  __slots__レイアウト: {after:8.1f} bytes/体")
+        print(f"  削減率: {result['reduction'] * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+マイクロベンチマーク: シミュレーションのホットパスの実行時間
+
+使い方:
+    python benchmarks/run_benchmarks.py [--sizes 3,100,1000,10000] [--filter step]
+                                        [--output result.json] [--baseline benchmarks/baseline.json]
+                                        [--save-baseline] [--threshold 0.25] [--fail-on-regression]
+
+計測対象:
+    step/n=*        SimulationEngine.step（LLMとRAGは使わない, 面積あたりの個体数は一定）
+    spatial/*       近傍ペアの検出（1000×1000のフィールド）
+    pokemon/*       PokemonALOs.distance_to と移動のヘルパー
+    items/*         ItemManager.check_pickup / spawn_item / resolve_pickups
+    rag/*           PokemonRAG.query_context（RAGなし / BM25 / ベクトル検索）
+    embedding_cache/*  EmbeddingCache の読み込み（書き出した全ての埋め込みが読み戻せることも確認する）
+    state/*         to_dict と get_simulation_state
+    render/*        Aggバックエンドでのビジュアライザーの1フレーム
+
+結果はJSONで出力し、ベースラインの中央値と比べて遅くなった項目を表示します。
+ベースラインは計測したマシンに依存するので、比較は同じマシンで行ってください。
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import time
+import warnings
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _common import CONTEXT_FILE, format_time, make_engine, make_pokemons, measure, seed_all
+
+import numpy as np
+
+from world import WorldConfig
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = (3, 100, 1000, 10000)
+
+
+class Skip(Exception):
+    """この環境では計測できないベンチマーク"""
+
+
+# 登録されたベンチマーク [(名前, 関数)]
+BENCHMARKS: List = []
+
+
+def benchmark(name: str):
+    """ベンチマーク関数を登録するデコレーター（関数は measure() の結果を返す）"""
+    def register(fn: Callable[[], Dict]):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return register
+
+
+# ---- PokemonALOs ----
+
+@benchmark("pokemon/distance_to")
+def bench_distance_to() -> Dict:
+    a, b = make_pokemons(2)
+    return measure(lambda: a.distance_to(b), number=1000)
+
+
+@benchmark("pokemon/move_towards")
+def bench_move_towards() -> Dict:
+    a, b = make_pokemons(2)
+    return measure(lambda: a.move_towards(b.position, speed=0.2), number=1000)
+
+
+@benchmark("pokemon/move_away")
+def bench_move_away() -> Dict:
+    a, b = make_pokemons(2)
+    return measure(lambda: a.move_away(b.position, speed=0.1), number=1000)
+
+
+@benchmark("pokemon/random_walk")
+def bench_random_walk() -> Dict:
+    a, = make_pokemons(1)
+    return measure(lambda: a.random_walk(speed=0.15), number=1000)
+
+
+# ---- ItemManager ----
+
+def _manager_with_items(n_items: int = 5):
+    """y >= 2 の範囲にアイテムを並べたアイテムマネージャー（y < 1 には何も置かない）"""
+    from items import ItemManager
+    
+    seed_all(0)
+    manager = ItemManager(field_size=(10.0, 10.0), max_items_on_field=max(n_items, 1))
+    for _ in range(n_items):
+        item = manager.create_random_berry()
+        manager.place_item(item, (random.uniform(0.5, 9.5), random.uniform(2.0, 9.5)))
+    return manager
+
+
+@benchmark("items/check_pickup/miss")
+def bench_check_pickup_miss() -> Dict:
+    manager = _manager_with_items()
+    pokemon, = make_pokemons(1)
+    # どのアイテムからも離れた位置（空振りの判定だけを計測）
+    pokemon.position = (5.0, 0.5)
+    return measure(lambda: manager.check_pickup(pokemon, pickup_distance=0.6), number=1000)
+
+
+@benchmark("items/check_pickup/hit")
+def bench_check_pickup_hit() -> Dict:
+    manager = _manager_with_items()
+    pokemon, = make_pokemons(1)
+    target = manager.items_on_field[0]
+    position = target.position
+    pokemon.position = position
+    
+    def pickup_and_replace():
+        item = manager.check_pickup(pokemon, pickup_distance=0.6)
+        manager.place_item(item, position)
+    
+    return measure(pickup_and_replace, number=1000)
+
+
+@benchmark("items/spawn_item")
+def bench_spawn_item() -> Dict:
+    manager = _manager_with_items(0)
+    manager.spawn_probability = 1.0
+    
+    def spawn_and_remove():
+        manager.remove_item(manager.spawn_item())
+    
+    return measure(spawn_and_remove, number=1000)
+
+
+@benchmark("items/resolve_pickups/n=1000")
+def bench_resolve_pickups() -> Dict:
+    manager = _manager_with_items(50)
+    positions = np.random.default_rng(0).uniform(0, 10, size=(1000, 2))
+    
+    def resolve_and_replace():
+        for _, item in manager.resolve_pickups(positions, pickup_distance=0.6):
+            manager.place_item(item, item.position)
+    
+    return measure(resolve_and_replace, number=10)
+
+
+# ---- PokemonRAG ----
+
+@benchmark("rag/query_context/no_rag")
+def bench_query_no_rag() -> Dict:
+    from rag_system import PokemonRAG
+    
+    rag = PokemonRAG(CONTEXT_FILE, use_rag=False)
+    return measure(lambda: rag.query_context("ピカチュウとニャースのバトル", n_results=3), number=100)
+
+
+@benchmark("rag/query_context/lexical")
+def bench_query_lexical() -> Dict:
+    from rag_system import PokemonRAG
+    
+    # lexicalモードはChromaDBを読み込まない（このベンチマークより前に読み込まれていなければ確認できる）
+    chromadb_loaded = "chromadb" in sys.modules
+    rag = PokemonRAG(CONTEXT_FILE, use_rag=True, retrieval_mode="lexical")
+    rag.query_context("ピカチュウ", n_results=1)
+    if not chromadb_loaded and "chromadb" in sys.modules:
+        raise RuntimeError("lexicalモードでChromaDBが読み込まれました")
+    return measure(lambda: rag.query_context("ピカチュウとニャースのバトル", n_results=3), number=100)
+
+
+@benchmark("rag/query_context/vector")
+def bench_query_vector() -> Dict:
+    try:
+        from rag_system import PokemonRAG
+        rag = PokemonRAG(CONTEXT_FILE, use_rag=True, retrieval_mode="vector")
+        rag.query_context("ピカチュウ", n_results=1)
+    except Exception as e:
+        raise Skip(f"ベクトル検索を初期化できません: {type(e).__name__}: {e}")
+    return measure(lambda: rag.query_context("ピカチュウとニャースのバトル", n_results=3))
+
+
+@benchmark("embedding_cache/reload/n=1000")
+def bench_embedding_cache_reload() -> Dict:
+    import tempfile
+    from embedding_cache import EmbeddingCache
+    
+    # "doc126" の sha256 は \x00 で終わる（ダイジェストの末尾が欠けずに読み戻せるかの確認を兼ねる）
+    documents = [f"doc{i}" for i in range(1000)]
+    assert EmbeddingCache.digest("doc126").endswith(b"\x00")
+    vectors = np.random.default_rng(0).standard_normal((len(documents), 384)).astype(np.float32)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = EmbeddingCache(cache_dir, "bench-model")
+        for doc, vector in zip(documents, vectors):
+            cache.put(doc, vector)
+        cache.flush()
+        
+        reloaded = EmbeddingCache(cache_dir, "bench-model")
+        missing = [doc for doc in documents if reloaded.get(doc) is None]
+        if missing or len(reloaded) != len(documents):
+            raise RuntimeError(f"読み戻せない埋め込みがあります: {missing[:5]}")
+        if not np.array_equal(np.stack([reloaded.get(doc) for doc in documents]), vectors):
+            raise RuntimeError("読み戻した埋め込みが書き出したものと一致しません")
+        
+        # 全て当たるので、2回目の読み込みでレコードが追記されないことも確認
+        size = os.path.getsize(cache.path)
+        reloaded.embed(documents, lambda docs: vectors[:len(docs)])
+        if os.path.getsize(cache.path) != size:
+            raise RuntimeError("キャッシュ済みの埋め込みが再び追記されました")
+        
+        return measure(lambda: EmbeddingCache(cache_dir, "bench-model"), number=10)
+
+
+# ---- 状態の出力 ----
+
+@benchmark("state/to_dict/cached")
+def bench_to_dict_cached() -> Dict:
+    pokemon, = make_pokemons(1)
+    return measure(pokemon.to_dict, number=1000)
+
+
+@benchmark("state/to_dict/dirty")
+def bench_to_dict_dirty() -> Dict:
+    pokemon, = make_pokemons(1)
+    
+    def rebuild():
+        pokemon.mark_dirty()
+        pokemon.to_dict()
+    
+    return measure(rebuild, number=1000)
+
+
+@benchmark("state/get_simulation_state/n=1000")
+def bench_simulation_state() -> Dict:
+    engine = make_engine(1000)
+    pokemons = list(engine.pokemons.values())
+    
+    def state_after_moves():
+        # 1ステップで動いたのと同じように、全員のキャッシュを無効にしてから取得する
+        for pokemon in pokemons:
+            pokemon.mark_dirty()
+        engine.get_simulation_state()
+    
+    return measure(state_after_moves)
+
+
+# ---- 近傍の検出 ----
+
+def _neighbour_pairs_benchmark(boundary: str) -> Dict:
+    from spatial import neighbour_pairs
+    
+    world = WorldConfig(width=1000.0, height=1000.0, boundary=boundary)
+    rng = np.random.default_rng(0)
+    positions = rng.random((10000, 2)) * np.array(world.size)
+    wrap_size = world.size if world.wraps else None
+    return measure(lambda: neighbour_pairs(positions, world.awareness_radius, wrap_size))
+
+
+@benchmark("spatial/neighbour_pairs/clamp/n=10000")
+def bench_neighbour_pairs_clamp() -> Dict:
+    return _neighbour_pairs_benchmark("clamp")
+
+
+@benchmark("spatial/neighbour_pairs/wrap/n=10000")
+def bench_neighbour_pairs_wrap() -> Dict:
+    return _neighbour_pairs_benchmark("wrap")
+
+
+# ---- 描画 ----
+
+def _render_benchmark(layout: str, n_agents: int) -> Dict:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from visualization import PokemonVisualizer, SimplePokemonVisualizer
+    
+    # フォントに無い文字の警告は計測結果の表示を埋めてしまうので出さない
+    warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+    
+    engine = make_engine(n_agents)
+    for _ in range(3):
+        engine.step(include_state=False)
+    
+    if layout == "simple":
+        visualizer = SimplePokemonVisualizer(engine)
+    else:
+        visualizer = PokemonVisualizer(engine)
+    
+    def frame():
+        _, positions, colors = engine.get_render_arrays()
+        visualizer.render(engine.get_simulation_state(), engine.get_recent_events(30), positions, colors)
+        visualizer.fig.canvas.draw()
+    
+    try:
+        return measure(frame, warmup=2)
+    finally:
+        plt.close(visualizer.fig)
+
+
+@benchmark("render/standard_agg/n=3")
+def bench_render_standard() -> Dict:
+    return _render_benchmark("standard", 3)
+
+
+@benchmark("render/simple_agg/n=100")
+def bench_render_simple() -> Dict:
+    return _render_benchmark("simple", 100)
+
+
+# ---- SimulationEngine.step ----
+
+def run_step_benchmarks(sizes: List[int], budget: float) -> Dict[str, Dict]:
+    """
+    エンジンのステップを個体数ごとに計測
+    
+    フィールドは WorldConfig.for_agents で個体数に合わせて広げ、
+    面積あたりの個体数を既定の10×10に3体と同じに保ちます。
+    大きい個体数は、小さい個体数の結果から所要時間を外挿し、
+    1ステップが budget 秒を超えそうならスキップします。
+    """
+    results = {}
+    measured = []  # [(個体数, 1ステップのマイクロ秒)]
+    
+    for n_agents in sorted(sizes):
+        name = f"step/n={n_agents}"
+        if measured:
+            n_prev, t_prev = measured[-1]
+            if len(measured) >= 2:
+                n_prev2, t_prev2 = measured[-2]
+                exponent = math.log(t_prev / t_prev2) / math.log(n_prev / n_prev2)
+            else:
+                exponent = 2.0
+            estimate = t_prev * (n_agents / n_prev) ** max(1.0, exponent)
+            if estimate > budget * 1e6:
+                reason = f"1ステップの見積もり {format_time(estimate)} が予算 {budget:.0f} s を超える"
+                results[name] = {"skipped": reason, "estimated_us": round(estimate, 1)}
+                print(f"  {name:<36} スキップ（{reason}）")
+                continue
+        
+        world = WorldConfig.for_agents(n_agents)
+        engine = make_engine(n_agents, world=world)
+        seed_all(1)
+        stats = measure(lambda: engine.step(include_state=False), min_time=1.0, min_repeats=3, max_repeats=50)
+        stats["agents"] = n_agents
+        stats["field"] = list(world.size)
+        results[name] = stats
+        measured.append((n_agents, stats["median_us"]))
+        print(f"  {name:<36} {format_time(stats['median_us']):>12}  ({stats['repeats']}回)")
+    
+    return results
+
+
+# ---- 実行と比較 ----
+
+def run_benchmarks(sizes: List[int], name_filter: Optional[str], step_budget: float) -> Dict:
+    """全てのベンチマークを実行して結果をまとめる"""
+    results = {}
+    
+    step_sizes = [n for n in sizes if not name_filter or name_filter in f"step/n={n}"]
+    if step_sizes:
+        results.update(run_step_benchmarks(step_sizes, step_budget))
+    
+    for name, fn in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        try:
+            stats = fn()
+        except Skip as e:
+            results[name] = {"skipped": str(e)}
+            print(f"  {name:<36} スキップ（{e}）")
+            continue
+        results[name] = stats
+        print(f"  {name:<36} {format_time(stats['median_us']):>12}  ({stats['repeats']}×{stats['number']}回)")
+    
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine()
+        },
+        "results": results
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """
+    ベースラインと中央値を比較
+    
+    Args:
+        current: 今回の結果
+        baseline: ベースラインの結果
+        threshold: 遅くなったとみなす割合（0.25なら25%以上遅い）
+    
+    Returns:
+        比較結果のリスト（名前, ベースライン, 今回, 比率, 遅くなったかどうか）
+    """
+    rows = []
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "median_us" not in base or "median_us" not in stats:
+            continue
+        ratio = stats["median_us"] / base["median_us"] if base["median_us"] > 0 else float("inf")
+        rows.append({
+            "name": name,
+            "baseline_us": base["median_us"],
+            "current_us": stats["median_us"],
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1.0 + threshold
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='シミュレーションのマイクロベンチマーク')
+    parser.add_argument('--sizes', type=str, default=",".join(map(str, DEFAULT_SIZES)),
+                        help='stepを計測する個体数（カンマ区切り）')
+    parser.add_argument('--filter', type=str, default=None, help='名前にこの文字列を含むベンチマークだけ実行')
+    parser.add_argument('--step-budget', type=float, default=60.0, help='1ステップの見積もりがこの秒数を超える個体数はスキップ')
+    parser.add_argument('--output', type=str, default=None, help='結果を書き出すJSONファイル')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE, help='比較するベースラインのJSONファイル')
+    parser.add_argument('--save-baseline', action='store_true', help='今回の結果をベースラインとして保存')
+    parser.add_argument('--threshold', type=float, default=0.25, help='遅くなったとみなす割合')
+    parser.add_argument('--fail-on-regression', action='store_true', help='遅くなった項目があれば終了コード1で終わる')
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    
+    print("⏱️  ベンチマークを実行中...")
+    current = run_benchmarks(sizes, args.filter, args.step_budget)
+    
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.threshold)
+        current["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "rows": rows}
+        
+        print(f"\n📊 ベースラインとの比較 ({args.baseline})")
+        for row in rows:
+            mark = "🔺" if row["regression"] else ("🟢" if row["ratio"] < 1.0 - args.threshold else "  ")
+            print(f"  {mark} {row['name']:<36} {format_time(row['baseline_us']):>12} → "
+                  f"{format_time(row['current_us']):>12}  ×{row['ratio']:.2f}")
+        regressions = [row for row in rows if row["regression"]]
+        if regressions:
+            print(f"\n⚠️ {len(regressions)}件の項目がベースラインより{args.threshold * 100:.0f}%以上遅くなっています")
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 結果を保存しました: {args.output}")
+    
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\n💾 ベースラインを保存しました: {args.baseline}")
+    
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+チェックポイント: エンジンの全状態を定期的にファイルに保存し、中断した所から再開する
+
+ファイルの形式（リトルエンディアン）:
+    マジック b"PKCK" (4バイト), バージョン (uint16), 予約 (uint16),
+    ペイロードのCRC32 (uint32), ペイロードの長さ (uint64), ペイロード
+
+ペイロードは SimulationEngine.export_state などが出力した組み込み型だけの辞書を
+pickleしてzlibで圧縮したものです。読み込み時はクラスの復元を一切許可しないので、
+組み込み型以外を含むファイルは読み込めません。
+
+書き込みは一時ファイルに書いてから os.replace で置き換えるので、
+書き込み中に異常終了しても前回のチェックポイントは壊れません。
+"""
+import io
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from pokemon_alos import PokemonALOs
+from simulation_engine import SimulationEngine
+from world import WorldConfig
+
+MAGIC = b"PKCK"
+CHECKPOINT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIQ")
+
+
+class CheckpointError(ValueError):
+    """チェックポイントのファイルが読み込めない"""
+
+
+class _BuiltinsOnlyUnpickler(pickle.Unpickler):
+    """組み込み型（dict, list, tuple, str, bytes, 数値など）だけを復元するUnpickler"""
+    
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"チェックポイントに許可されていない型が含まれています: {module}.{name}")
+
+
+def capture_checkpoint(engine: SimulationEngine) -> Dict:
+    """
+    エンジンの全状態を取得（ステップを進めるスレッドで呼ぶ）
+    
+    Args:
+        engine: シミュレーションエンジン
+    
+    Returns:
+        write_checkpoint で書き出せる辞書
+    """
+    state = engine.export_state()
+    state["created"] = time.time()
+    
+    # ALOsシステムの会話履歴（LLMを使わない場合は持っていない）
+    history = getattr(engine.alos_system, "conversation_history", None)
+    state["conversation_history"] = list(history) if history is not None else None
+    return state
+
+
+def encode_checkpoint(state: Dict, level: int = 6) -> bytes:
+    """状態の辞書をチェックポイントのバイト列にエンコード"""
+    payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), level)
+    return _HEADER.pack(MAGIC, CHECKPOINT_VERSION, 0, zlib.crc32(payload), len(payload)) + payload
+
+
+def decode_checkpoint(data: bytes) -> Dict:
+    """チェックポイントのバイト列を状態の辞書にデコード"""
+    if len(data) < _HEADER.size:
+        raise CheckpointError("チェックポイントが短すぎます")
+    magic, version, _, crc, length = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CheckpointError("チェックポイントのファイルではありません")
+    if version != CHECKPOINT_VERSION:
+        raise CheckpointError(f"チェックポイントのバージョン {version} には対応していません（対応: {CHECKPOINT_VERSION}）")
+    
+    payload = data[_HEADER.size:]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise CheckpointError("チェックポイントが壊れています")
+    
+    return _BuiltinsOnlyUnpickler(io.BytesIO(zlib.decompress(payload))).load()
+
+
+def write_checkpoint(path: str, state: Dict, level: int = 6) -> int:
+    """
+    チェックポイントをアトミックに書き出す
+    
+    Args:
+        path: 書き出すファイルのパス
+        state: capture_checkpoint の出力
+        level: zlibの圧縮レベル
+    
+    Returns:
+        書き出したバイト数
+    """
+    data = encode_checkpoint(state, level)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def read_checkpoint(path: str) -> Dict:
+    """チェックポイントを読み込む"""
+    with open(path, "rb") as f:
+        return decode_checkpoint(f.read())
+
+
+def checkpoint_world(state: Dict) -> WorldConfig:
+    """チェックポイントのワールド設定"""
+    return WorldConfig(**state["world"]).validate()
+
+
+def pokemons_from_checkpoint(state: Dict) -> List[PokemonALOs]:
+    """チェックポイントからポケモンを作り直す（ALOs定義は生成し直さない）"""
+    world = checkpoint_world(state)
+    return [PokemonALOs.from_state(pokemon_state, world=world) for pokemon_state in state["pokemons"]]
+
+
+def restore_checkpoint(engine: SimulationEngine, state: Dict):
+    """
+    エンジンをチェックポイントの状態に戻す
+    
+    エンジンは pokemons_from_checkpoint のポケモンと checkpoint_world のワールドで作っておきます。
+    
+    Args:
+        engine: シミュレーションエンジン
+        state: read_checkpoint の出力
+    """
+    engine.restore_state(state)
+    history = state.get("conversation_history")
+    if history is not None and hasattr(engine.alos_system, "conversation_history"):
+        engine.alos_system.conversation_history = list(history)
+
+
+def load_engine(path: str, alos_system, rag_system, **engine_kwargs) -> SimulationEngine:
+    """
+    チェックポイントからエンジンを作り直す
+    
+    Args:
+        path: チェックポイントのパス
+        alos_system: 続きで使うALOsシステム
+        rag_system: 続きで使うRAGシステム
+        **engine_kwargs: SimulationEngine に渡すその他の引数（echo_events, profiler など）
+    
+    Returns:
+        チェックポイントの状態に戻したエンジン
+    """
+    state = read_checkpoint(path)
+    engine = SimulationEngine(
+        pokemons_from_checkpoint(state),
+        alos_system,
+        rag_system,
+        world=checkpoint_world(state),
+        seed=state["seed"],
+        **engine_kwargs
+    )
+    restore_checkpoint(engine, state)
+    return engine
+
+
+class CheckpointWriter:
+    """一定のステップごとにチェックポイントをバックグラウンドで書き出す
+    
+    状態の取得はステップの終わりにエンジンのスレッドで行い、
+    圧縮と書き込みは書き込みスレッドで行います。
+    書き込みが追いつかない場合は、まだ書いていない古い状態を捨てて最新の状態だけを書きます。
+    """
+    
+    def __init__(self, path: str, every: int = 100, level: int = 6):
+        """
+        Args:
+            path: 書き出すファイルのパス（毎回同じファイルを置き換える）
+            every: このステップ数ごとに書き出す
+            level: zlibの圧縮レベル
+        """
+        self.path = path
+        self.every = every
+        self.level = level
+        self.written = 0
+        self.last_step: Optional[int] = None
+        self.last_bytes = 0
+        self.error: Optional[Exception] = None
+        
+        self._pending: Optional[Dict] = None
+        self._busy = False
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="CheckpointWriter", daemon=True)
+        self._thread.start()
+    
+    def attach(self, engine: SimulationEngine) -> 'CheckpointWriter':
+        """エンジンのステップの終わりにチェックポイントを取るようにする"""
+        engine.add_step_listener(self._on_step)
+        return self
+    
+    def _on_step(self, engine: SimulationEngine, step_events: List[str]):
+        if self.every and engine.step_count % self.every == 0:
+            self.submit(capture_checkpoint(engine))
+    
+    def submit(self, state: Dict):
+        """状態を書き込みスレッドに渡す（前の状態がまだ書かれていなければ置き換える）"""
+        with self._condition:
+            self._pending = state
+            self._condition.notify()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """渡した状態を書き終えるまで待つ（書き終えたらTrue）"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending is None and not self._busy, timeout)
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._stopping)
+                if self._pending is None:
+                    return
+                state, self._pending = self._pending, None
+                self._busy = True
+            
+            try:
+                size = write_checkpoint(self.path, state, self.level)
+                self.written += 1
+                self.last_step = state["step_count"]
+                self.last_bytes = size
+            except Exception as e:
+                # 書き込みに失敗してもシミュレーションは止めない（次の機会に書き直す）
+                self.error = e
+                print(f"⚠️  チェックポイントの書き込みに失敗: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+    
+    def close(self, engine: Optional[SimulationEngine] = None):
+        """
+        書き込みスレッドを止める
+        
+        Args:
+            engine: 指定すると、止める前にその時点のチェックポイントを書き出す
+        """
+        if engine is not None and engine.step_count != self.last_step:
+            self.submit(capture_checkpoint(engine))
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
@@ -0,0 +1,158 @@
+"""
+埋め込みキャッシュ: ドキュメントの埋め込みベクトルをディスクに保存・再利用
+"""
+import hashlib
+import os
+import re
+import struct
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+
+class EmbeddingCache:
+    """(埋め込みモデル, sha256(ドキュメント)) をキーにした埋め込みベクトルのキャッシュ
+    
+    モデルごとに1つのバイナリファイルを持ち、レコードは追記のみで書き込みます。
+    
+    ファイル形式:
+        ヘッダー: マジック(4バイト) + バージョン(uint16) + 次元数(uint32)
+        レコード: sha256ダイジェスト(32バイト) + float32ベクトル(次元数)
+    """
+    
+    MAGIC = b"EMBC"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHI")
+    
+    def __init__(self, cache_dir: str, model_name: str):
+        """
+        Args:
+            cache_dir: キャッシュファイルを置くディレクトリ
+            model_name: 埋め込みモデル名（キャッシュキーの一部）
+        """
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.path = os.path.join(cache_dir, f"{safe_name}.emb")
+        
+        self.dim = None
+        self._vectors = {}  # {digest: np.ndarray}
+        self._pending = {}  # まだディスクに書き込んでいないベクトル
+        
+        self._load()
+    
+    @staticmethod
+    def digest(document: str) -> bytes:
+        """ドキュメントのsha256ダイジェストを計算"""
+        return hashlib.sha256(document.encode("utf-8")).digest()
+    
+    def _record_dtype(self, dim: int) -> np.dtype:
+        """1レコード分の構造化dtype
+        
+        ダイジェストは "S32" ではなく "V32" で持ちます（"S" は末尾の \x00 を取り除くので、
+        \x00 で終わるダイジェストが31バイト以下になってキャッシュに当たらなくなる）。
+        ファイル上のバイト列はどちらでも同じです。
+        """
+        return np.dtype([("digest", "V32"), ("vector", "<f4", (dim,))])
+    
+    def _load(self):
+        """キャッシュファイルを読み込む（壊れている場合は無視して作り直す）"""
+        if not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, "rb") as f:
+                magic, version, dim = self.HEADER.unpack(f.read(self.HEADER.size))
+                if magic != self.MAGIC or version != self.VERSION:
+                    raise ValueError("unknown cache format")
+                
+                dtype = self._record_dtype(dim)
+                payload = f.read()
+        except (OSError, struct.error, ValueError):
+            # 読めないキャッシュは作り直す
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        
+        # 書き込み途中で切れたレコードは捨てる
+        usable = len(payload) - len(payload) % dtype.itemsize
+        records = np.frombuffer(payload[:usable], dtype=dtype)
+        
+        self.dim = dim
+        for record in records:
+            self._vectors[record["digest"].tobytes()] = record["vector"]
+    
+    def __len__(self) -> int:
+        return len(self._vectors)
+    
+    def get(self, document: str) -> Optional[np.ndarray]:
+        """キャッシュ済みの埋め込みを取得"""
+        return self._vectors.get(self.digest(document))
+    
+    def put(self, document: str, vector):
+        """埋め込みをキャッシュに追加（flushでディスクに書き込む）"""
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        
+        if self.dim is None:
+            self.dim = vector.shape[0]
+        elif vector.shape[0] != self.dim:
+            raise ValueError(
+                f"埋め込みの次元数が一致しません: {vector.shape[0]} != {self.dim}"
+            )
+        
+        key = self.digest(document)
+        if key not in self._vectors:
+            self._pending[key] = vector
+        self._vectors[key] = vector
+    
+    def embed(self, documents: List[str], embed_fn: Callable[[List[str]], List]) -> List[np.ndarray]:
+        """
+        キャッシュを使ってドキュメントを埋め込む
+        
+        新規または変更されたドキュメントだけを embed_fn でまとめて埋め込みます。
+        
+        Args:
+            documents: 埋め込むドキュメントのリスト
+            embed_fn: ドキュメントのリストを受け取り埋め込みのリストを返す関数
+        
+        Returns:
+            documentsと同じ順序の埋め込みベクトルのリスト
+        """
+        missing = []
+        seen = set()
+        for doc in documents:
+            if self.get(doc) is None and doc not in seen:
+                missing.append(doc)
+                seen.add(doc)
+        
+        if missing:
+            for doc, vector in zip(missing, embed_fn(missing)):
+                self.put(doc, vector)
+            self.flush()
+        
+        return [self.get(doc) for doc in documents]
+    
+    def flush(self):
+        """未書き込みのベクトルをキャッシュファイルに追記"""
+        if not self._pending:
+            return
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        
+        dtype = self._record_dtype(self.dim)
+        records = np.empty(len(self._pending), dtype=dtype)
+        records["digest"] = np.frombuffer(b"".join(self._pending.keys()), dtype="V32")
+        records["vector"] = np.stack(list(self._pending.values()))
+        
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "ab") as f:
+            if new_file:
+                f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.dim))
+            f.write(records.tobytes())
+        
+        self._pending.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """キャッシュの統計情報"""
+        return {"entries": len(self._vectors), "dim": self.dim or 0}
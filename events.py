@@ -0,0 +1,143 @@
+"""
+イベントログ: 構造化されたイベントとバックグラウンドで書き出すシンク
+"""
+import json
+import queue
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+
+class SimEvent(NamedTuple):
+    """シミュレーション中に発生した1件のイベント"""
+    seq: int          # 通し番号（0から連番）
+    step: int         # 発生したステップ
+    message: str      # 表示用のメッセージ
+    kind: str         # 種類（battle, friendship, item, narrative, ...）
+    timestamp: float  # 発生時刻（UNIX時間）
+    
+    def __str__(self) -> str:
+        return f"[Step {self.step}] {self.message}"
+    
+    def to_json(self) -> Dict:
+        """JSONに変換できる辞書形式で出力"""
+        return self._asdict()
+
+
+class JsonlEventSink:
+    """イベントをバックグラウンドスレッドでJSONLファイルに追記するシンク
+    
+    submit はキューに積むだけなので、シミュレーションのステップを止めません。
+    書き込みはまとめて行い、close で残りを全て書き出します。
+    ファイルを閉じるのは書き込みスレッド自身です（書き込み中に閉じられることはない）。
+    書き込みに失敗した場合は error に記録し、以降のイベントは捨てて dropped に数えます。
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.5):
+        """
+        Args:
+            path: 書き出すJSONLファイルのパス
+            batch_size: 1回にまとめて書き込む最大件数
+            flush_interval: イベントが少ない時に書き込むまでの最大待ち時間（秒）
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0  # 書き込みに失敗して捨てたイベントの数
+        self.error: Optional[Exception] = None  # 書き込みスレッドで起きた最初のエラー
+        
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="event-sink", daemon=True)
+        self._thread.start()
+    
+    def submit(self, event: SimEvent):
+        """イベントを書き込み待ちのキューに追加（書き込みに失敗した後は捨てる）"""
+        if self.error is not None:
+            self.dropped += 1
+            return
+        self._queue.put(event)
+    
+    def _run(self):
+        """キューからイベントを取り出してまとめて書き込み、終了の合図を受けたらファイルを閉じる"""
+        try:
+            self._write_until_stopped()
+        finally:
+            try:
+                self._file.close()
+            except OSError as e:
+                self._fail(e, 0)
+    
+    def _fail(self, error: Exception, lost: int):
+        """書き込みの失敗を記録（最初の失敗だけ警告を出す）"""
+        self.dropped += lost
+        if self.error is None:
+            self.error = error
+            print(f"⚠️  イベントログの書き込みに失敗しました（以降のイベントは捨てます）: {self.path}: {error}")
+    
+    def _write_until_stopped(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            
+            while True:
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            
+            if not batch:
+                continue
+            if self.error is not None:
+                # 失敗した後もキューは空にし続ける（溜め込まない）
+                self.dropped += len(batch)
+                continue
+            try:
+                self._file.write("".join(
+                    json.dumps(event.to_json(), ensure_ascii=False) + "\n" for event in batch
+                ))
+                self._file.flush()
+                self.written += len(batch)
+            except (OSError, ValueError) as e:
+                self._fail(e, len(batch))
+    
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        残りのイベントを書き出してファイルを閉じる
+        
+        Args:
+            timeout: 書き込みスレッドの終了を待つ最大時間（秒, Noneなら終わるまで待つ）
+        
+        Returns:
+            全て書き出して閉じたらTrue。時間内に終わらなければFalse
+            （書き込みはバックグラウンドで続き、終わったらスレッドがファイルを閉じる）。
+            書き込みに失敗していた場合もFalse（error と dropped に内容が残る）
+        """
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print(f"⚠️  イベントログの書き込みが終わっていません（バックグラウンドで続けます）: {self.path}")
+                return False
+        if self.error is not None:
+            print(f"⚠️  イベントログは不完全です: {self.path}（書き出せなかったイベント {self.dropped}件）: {self.error}")
+            return False
+        return True
+
+
+def read_events(path: str) -> List[SimEvent]:
+    """JSONLファイルからイベントを読み込む"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [SimEvent(**json.loads(line)) for line in f if line.strip()]
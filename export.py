@@ -0,0 +1,216 @@
+"""
+エクスポート: 記録したスナップショットを複数プロセスで描画し、動画や連番画像に書き出す
+
+画面がない環境でも、長時間の実行を録画できます。
+描画はAggバックエンドで行い、ビジュアライザーのレイアウトをそのまま使います。
+"""
+import os
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional, Sequence
+import numpy as np
+
+from sim_runner import SimulationRunner, StateSnapshot
+
+
+# ffmpegで書き出す拡張子（それ以外はPNG連番のディレクトリとして扱う）
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm", ".gif")
+
+
+def record_snapshots(engine, steps: int, event_lines: int = 30) -> List[StateSnapshot]:
+    """
+    シミュレーションを全速力で進め、各ステップのスナップショットを記録
+    
+    Args:
+        engine: シミュレーションエンジン
+        steps: 進めるステップ数
+        event_lines: スナップショットに含める最近のイベントの数
+    
+    Returns:
+        スナップショットのリスト（先頭は開始時点）
+    """
+    runner = SimulationRunner(engine, tick_rate=0, max_ticks=steps, event_lines=event_lines)
+    snapshots = [runner.latest()]
+    runner.add_tick_listener(snapshots.append)
+    runner.start()
+    runner.join()
+    
+    if runner.error is not None:
+        raise runner.error
+    return snapshots
+
+
+# ワーカープロセスごとに1つだけ作るビジュアライザー
+_worker_visualizer = None
+
+
+def _init_worker(layout: str, grid_size: int, world=None):
+    """ワーカープロセスの初期化（Aggバックエンドでビジュアライザーを作る）"""
+    global _worker_visualizer
+    
+    import matplotlib
+    matplotlib.use("Agg")
+    from visualization import PokemonVisualizer, SimplePokemonVisualizer
+    
+    if layout == "simple":
+        _worker_visualizer = SimplePokemonVisualizer(None, grid_size=grid_size, world=world)
+    else:
+        _worker_visualizer = PokemonVisualizer(None, world=world)
+
+
+def _render_frame(snapshot: StateSnapshot) -> np.ndarray:
+    """スナップショットを1フレーム描画し、RGBの配列 (H, W, 3) を返す"""
+    visualizer = _worker_visualizer
+    visualizer.render(snapshot.state, snapshot.events, snapshot.positions, snapshot.colors)
+    
+    canvas = visualizer.fig.canvas
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba())[:, :, :3].copy()
+
+
+def _render_chunk(start: int, snapshots: Sequence[StateSnapshot], png_dir: Optional[str]):
+    """
+    連続するフレームをまとめて描画
+    
+    Args:
+        start: 最初のフレーム番号
+        snapshots: 描画するスナップショット
+        png_dir: PNGを書き出すディレクトリ（Noneならフレームの生データを返す）
+    
+    Returns:
+        (フレームの高さ, 幅, フレームのバイト列のリスト)。PNGの場合はリストは空
+    """
+    import matplotlib.pyplot as plt
+    
+    frames = []
+    height = width = 0
+    for offset, snapshot in enumerate(snapshots):
+        rgb = _render_frame(snapshot)
+        height, width = rgb.shape[:2]
+        if png_dir is not None:
+            plt.imsave(os.path.join(png_dir, f"frame_{start + offset:06d}.png"), rgb)
+        else:
+            frames.append(rgb.tobytes())
+    return height, width, frames
+
+
+class _FfmpegWriter:
+    """RGBの生データをffmpegの標準入力に流し込んで動画にする"""
+    
+    def __init__(self, output: str, fps: int):
+        self.output = output
+        self.fps = fps
+        self.process: Optional[subprocess.Popen] = None
+        
+        self.ffmpeg = shutil.which("ffmpeg")
+        if self.ffmpeg is None:
+            raise RuntimeError("ffmpegが見つかりません。インストールするか、出力先にディレクトリを指定してPNG連番で書き出してください")
+    
+    def write(self, height: int, width: int, frame: bytes):
+        """1フレームを書き込む（最初のフレームでffmpegを起動する）"""
+        if self.process is None:
+            command = [
+                self.ffmpeg, "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgb24",
+                "-s", f"{width}x{height}", "-r", str(self.fps),
+                "-i", "-",
+                # yuv420pは幅と高さが偶数である必要がある
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"
+            ]
+            if not self.output.lower().endswith(".gif"):
+                command += ["-pix_fmt", "yuv420p"]
+            command.append(self.output)
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        
+        self.process.stdin.write(frame)
+    
+    def close(self):
+        """入力を閉じてエンコードの完了を待つ"""
+        if self.process is None:
+            return
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpegが異常終了しました (終了コード: {self.process.returncode})")
+
+
+def export_frames(
+    snapshots: Sequence[StateSnapshot],
+    output: str,
+    layout: str = "standard",
+    fps: int = 10,
+    workers: Optional[int] = None,
+    chunk_size: int = 8,
+    grid_size: int = 50,
+    world=None
+) -> int:
+    """
+    スナップショットを複数プロセスで描画して書き出す
+    
+    フレームは順番通りに受け取り、ffmpegのパイプかPNG連番に書き出します。
+    処理中のチャンク数はワーカー数の2倍までに抑えるので、
+    長い録画でもメモリ使用量は増え続けません。
+    
+    Args:
+        snapshots: 描画するスナップショット
+        output: 出力先（動画の拡張子ならffmpegで動画に、それ以外はPNGのディレクトリ）
+        layout: ビジュアライザーのレイアウト (standard/simple)
+        fps: 動画のフレームレート
+        workers: 描画するプロセス数（省略時はCPUコア数）
+        chunk_size: 1回のタスクで描画するフレーム数
+        grid_size: simpleレイアウトのグリッドのサイズ
+        world: 描画するワールドの設定（省略時は既定の10×10）
+    
+    Returns:
+        書き出したフレーム数
+    """
+    workers = workers or os.cpu_count() or 1
+    to_video = output.lower().endswith(VIDEO_EXTENSIONS)
+    
+    png_dir = None
+    writer = None
+    if to_video:
+        writer = _FfmpegWriter(output, fps)
+    else:
+        png_dir = output
+        os.makedirs(png_dir, exist_ok=True)
+    
+    starts = iter(range(0, len(snapshots), chunk_size))
+    written = 0
+    
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(layout, grid_size, world)
+    ) as pool:
+        pending: deque = deque()
+        
+        def submit_next() -> bool:
+            start = next(starts, None)
+            if start is None:
+                return False
+            chunk = snapshots[start:start + chunk_size]
+            pending.append((len(chunk), pool.submit(_render_chunk, start, chunk, png_dir)))
+            return True
+        
+        for _ in range(workers * 2):
+            if not submit_next():
+                break
+        
+        try:
+            while pending:
+                count, future = pending.popleft()
+                height, width, frames = future.result()
+                if writer is not None:
+                    for frame in frames:
+                        writer.write(height, width, frame)
+                written += count
+                submit_next()
+        finally:
+            if writer is not None:
+                writer.close()
+    
+    return written
@@ -1,12 +1,119 @@
 """
 アイテムシステム: きのみなどのアイテム管理
 """
-from typing import Dict, Tuple, Optional
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Optional
+import heapq
+import math
 import random
+import numpy as np
+
+from spatial import radius_pairs
+
+
+# 効果タイプごとの表示色（RGB, 0-1の範囲）と絵文字
+EFFECT_COLORS = {
+    "hp": (1.0, 0.4, 0.4),      # 赤系（HP回復）
+    "energy": (0.4, 0.8, 1.0),  # 青系（Energy回復）
+    "mood": (1.0, 0.8, 0.4),    # 黄系（気分改善）
+    "mixed": (0.8, 0.4, 1.0)    # 紫系（複合効果）
+}
+
+EFFECT_EMOJIS = {
+    "hp": "🍎",
+    "energy": "🍇",
+    "mood": "🍌",
+    "mixed": "🍊"
+}
+
+
+class ItemKind(NamedTuple):
+    """アイテムの種類（同じ種類のアイテム全てで共有される不変データ）"""
+    kind_id: int
+    name: str
+    item_type: str
+    effect_type: str
+    effect_value: int
+    description: str
+    color: Tuple[float, float, float]
+    emoji: str
+
+
+class ItemState(NamedTuple):
+    """描画用のフィールド上のアイテムの状態（ItemManager.get_items_state の要素）"""
+    name: str
+    position: Tuple[float, float]
+    color: Tuple[float, float, float]
+    emoji: str
+    effect_type: str
+
+
+# 登録済みのアイテムの種類（kind_id順）。登録するのはモジュールで定義した固定の種類だけ
+ITEM_KINDS: List[ItemKind] = []
+_ITEM_KIND_INDEX: Dict[Tuple[str, str, str, int], ItemKind] = {}
+
+
+def _make_item_kind(
+    kind_id: int,
+    name: str,
+    item_type: str,
+    effect_type: str,
+    effect_value: int,
+    description: str
+) -> ItemKind:
+    return ItemKind(
+        kind_id=kind_id,
+        name=name,
+        item_type=item_type,
+        effect_type=effect_type,
+        effect_value=effect_value,
+        description=description,
+        color=EFFECT_COLORS.get(effect_type, (0.5, 0.5, 0.5)),
+        emoji=EFFECT_EMOJIS.get(effect_type, "🍓")
+    )
+
+
+def _register_item_kind(
+    name: str,
+    item_type: str,
+    effect_type: str,
+    effect_value: int,
+    description: str = ""
+) -> ItemKind:
+    """固定のアイテムの種類を登録（モジュールの読み込み時にだけ呼ぶ）"""
+    kind = _make_item_kind(len(ITEM_KINDS), name, item_type, effect_type, effect_value, description)
+    ITEM_KINDS.append(kind)
+    _ITEM_KIND_INDEX[(name, item_type, effect_type, effect_value)] = kind
+    return kind
+
+
+def intern_item_kind(
+    name: str,
+    item_type: str,
+    effect_type: str,
+    effect_value: int,
+    description: str = ""
+) -> ItemKind:
+    """
+    アイテムの種類の共有インスタンスを返す
+    
+    登録済みの固定の種類（BERRY_KINDS）と同じ内容なら共有インスタンスを返します。
+    それ以外の種類は登録せずにその都度作るので（kind_id は -1）、
+    任意の種類を作り続けても登録が増え続けることはありません。
+    """
+    kind = _ITEM_KIND_INDEX.get((name, item_type, effect_type, effect_value))
+    if kind is None:
+        kind = _make_item_kind(-1, name, item_type, effect_type, effect_value, description)
+    return kind
 
 
 class Item:
-    """アイテムの基本クラス"""
+    """アイテムの基本クラス
+    
+    名前や効果などの不変データは共有の ItemKind が持ち、
+    各アイテムは種類への参照と位置だけを持ちます。
+    """
+    
+    __slots__ = ("kind", "position", "item_id")
     
     def __init__(self, name: str, item_type: str, effect_type: str, effect_value: int):
         """
@@ -16,32 +123,57 @@ class Item:
             effect_type: 効果のタイプ（hp, energy, mood）
             effect_value: 効果の値
         """
-        self.name = name
-        self.item_type = item_type
-        self.effect_type = effect_type
-        self.effect_value = effect_value
+        self.kind = intern_item_kind(name, item_type, effect_type, effect_value)
         self.position = None
+        self.item_id = None  # フィールドに置かれた時にItemManagerが割り当てる
+    
+    @classmethod
+    def from_kind(cls, kind: ItemKind) -> 'Item':
+        """登録済みの種類からアイテムを作成"""
+        item = cls.__new__(cls)
+        item.kind = kind
+        item.position = None
+        item.item_id = None
+        return item
+    
+    def to_record(self) -> Tuple:
+        """チェックポイント用に、種類と位置を組み込み型だけのタプルで出力"""
+        kind = self.kind
+        return (kind.name, kind.item_type, kind.effect_type, kind.effect_value, kind.description,
+                self.position, self.item_id)
+    
+    @classmethod
+    def from_record(cls, record: Tuple) -> 'Item':
+        """to_record の出力からアイテムを作り直す"""
+        name, item_type, effect_type, effect_value, description, position, item_id = record
+        item = cls.from_kind(intern_item_kind(name, item_type, effect_type, effect_value, description))
+        item.position = tuple(position) if position is not None else None
+        item.item_id = item_id
+        return item
+    
+    @property
+    def name(self) -> str:
+        return self.kind.name
+    
+    @property
+    def item_type(self) -> str:
+        return self.kind.item_type
+    
+    @property
+    def effect_type(self) -> str:
+        return self.kind.effect_type
+    
+    @property
+    def effect_value(self) -> int:
+        return self.kind.effect_value
     
     def get_color(self) -> Tuple[float, float, float]:
         """アイテムの色を返す（RGB, 0-1の範囲）"""
-        # アイテムタイプに応じた色
-        colors = {
-            "hp": (1.0, 0.4, 0.4),      # 赤系（HP回復）
-            "energy": (0.4, 0.8, 1.0),  # 青系（Energy回復）
-            "mood": (1.0, 0.8, 0.4),    # 黄系（気分改善）
-            "mixed": (0.8, 0.4, 1.0)    # 紫系（複合効果）
-        }
-        return colors.get(self.effect_type, (0.5, 0.5, 0.5))
+        return self.kind.color
     
     def get_emoji(self) -> str:
         """アイテムの絵文字を返す"""
-        emojis = {
-            "hp": "🍎",
-            "energy": "🍇",
-            "mood": "🍌",
-            "mixed": "🍊"
-        }
-        return emojis.get(self.effect_type, "🍓")
+        return self.kind.emoji
     
     def use(self, pokemon) -> str:
         """
@@ -128,50 +260,350 @@ BERRY_TYPES = {
     }
 }
 
+# きのみの種類（共有インスタンス）
+BERRY_KINDS = tuple(
+    _register_item_kind(
+        name,
+        berry_data["type"],
+        berry_data["effect_type"],
+        berry_data["effect_value"],
+        berry_data["description"]
+    )
+    for name, berry_data in BERRY_TYPES.items()
+)
+
+
+class SpawnScheduler:
+    """広いフィールド向けのアイテム出現スケジューラー
+    
+    フィールドを領域のグリッドに分け、ステップごとに各領域の出現数を
+    ポアソン分布からまとめて引きます。領域ごとに出現率と上限を持ち、
+    アイテムの寿命（消えるステップ）はヒープで管理します。
+    """
+    
+    def __init__(
+        self,
+        field_size: Tuple[float, float],
+        regions: Tuple[int, int] = (1, 1),
+        spawn_rate: float = 0.03,
+        region_cap: int = 5,
+        lifetime: Optional[int] = None,
+        margin: float = 0.5,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            field_size: フィールドのサイズ (width, height)
+            regions: 領域の分割数 (横, 縦)
+            spawn_rate: 領域あたりの1ステップの平均出現数（初期値）
+            region_cap: 領域あたりの最大アイテム数（初期値）
+            lifetime: アイテムの寿命（ステップ数）。Noneなら消えない
+            margin: フィールドの端からの余白
+            seed: 乱数のシード
+        """
+        self.field_size = field_size
+        self.regions = regions
+        self.lifetime = lifetime
+        self.margin = margin
+        self.rng = np.random.default_rng(seed)
+        
+        n_regions = regions[0] * regions[1]
+        self.rates = np.full(n_regions, spawn_rate, dtype=float)
+        self.caps = np.full(n_regions, region_cap, dtype=np.int64)
+        self.counts = np.zeros(n_regions, dtype=np.int64)  # 領域ごとの現在のアイテム数
+        
+        self._region_size = (field_size[0] / regions[0], field_size[1] / regions[1])
+        self._item_regions: Dict[int, int] = {}  # {item_id: 領域のインデックス}
+        self._expiry: List[Tuple[int, int]] = []  # [(消えるステップ, item_id)] のヒープ
+    
+    def region_index(self, rx: int, ry: int) -> int:
+        """領域の座標から領域のインデックスを求める"""
+        return rx * self.regions[1] + ry
+    
+    def set_region_rate(self, rx: int, ry: int, rate: float):
+        """領域の出現率を設定"""
+        self.rates[self.region_index(rx, ry)] = rate
+    
+    def set_region_cap(self, rx: int, ry: int, cap: int):
+        """領域の最大アイテム数を設定"""
+        self.caps[self.region_index(rx, ry)] = cap
+    
+    def spawn(self, manager: 'ItemManager', step: int) -> List[Item]:
+        """
+        全領域のアイテムをまとめて出現させる
+        
+        Args:
+            manager: アイテムを配置するItemManager
+            step: 現在のステップ数
+            
+        Returns:
+            出現したアイテムのリスト
+        """
+        counts = self.rng.poisson(self.rates)
+        counts = np.minimum(counts, np.maximum(self.caps - self.counts, 0))
+        
+        # フィールド全体の上限も守る
+        room = manager.max_items_on_field - len(manager)
+        total = int(counts.sum())
+        if total > room:
+            if room <= 0:
+                return []
+            keep = np.zeros(total, dtype=bool)
+            keep[self.rng.choice(total, size=room, replace=False)] = True
+            region_ids = np.repeat(np.arange(len(counts)), counts)[keep]
+        else:
+            region_ids = np.repeat(np.arange(len(counts)), counts)
+        
+        if len(region_ids) == 0:
+            return []
+        
+        # 領域内の一様な位置をまとめて生成
+        width, height = self._region_size
+        x0 = (region_ids // self.regions[1]) * width
+        y0 = (region_ids % self.regions[1]) * height
+        xs = x0 + self.rng.random(len(region_ids)) * width
+        ys = y0 + self.rng.random(len(region_ids)) * height
+        xs = np.clip(xs, self.margin, self.field_size[0] - self.margin)
+        ys = np.clip(ys, self.margin, self.field_size[1] - self.margin)
+        kinds = self.rng.integers(len(BERRY_KINDS), size=len(region_ids))
+        
+        spawned = []
+        for region, x, y, kind in zip(region_ids.tolist(), xs.tolist(), ys.tolist(), kinds.tolist()):
+            item = manager.place_item(Item.from_kind(BERRY_KINDS[kind]), (x, y))
+            self._item_regions[item.item_id] = region
+            if self.lifetime is not None:
+                heapq.heappush(self._expiry, (step + self.lifetime, item.item_id))
+            spawned.append(item)
+        
+        np.add.at(self.counts, region_ids, 1)
+        return spawned
+    
+    def expire(self, manager: 'ItemManager', step: int) -> List[Item]:
+        """寿命が尽きたアイテムを取り除く"""
+        expired = []
+        while self._expiry and self._expiry[0][0] <= step:
+            _, item_id = heapq.heappop(self._expiry)
+            item = manager.get_item(item_id)
+            # 既に拾われたアイテムはヒープに残っているだけなので無視する
+            if item is not None and manager.remove_item(item):
+                expired.append(item)
+        return expired
+    
+    def forget(self, item: Item):
+        """フィールドから取り除かれたアイテムを領域の集計から外す"""
+        region = self._item_regions.pop(item.item_id, None)
+        if region is not None:
+            self.counts[region] -= 1
+    
+    def export_state(self) -> Dict:
+        """チェックポイント用に、乱数と領域ごとの集計を組み込み型だけの辞書で出力"""
+        return {
+            "rng": self.rng.bit_generator.state,
+            "rates": self.rates.tolist(),
+            "caps": self.caps.tolist(),
+            "counts": self.counts.tolist(),
+            "item_regions": dict(self._item_regions),
+            "expiry": list(self._expiry)
+        }
+    
+    def restore_state(self, state: Dict):
+        """export_state の出力から状態を戻す"""
+        self.rng.bit_generator.state = state["rng"]
+        self.rates = np.array(state["rates"], dtype=float)
+        self.caps = np.array(state["caps"], dtype=np.int64)
+        self.counts = np.array(state["counts"], dtype=np.int64)
+        self._item_regions = dict(state["item_regions"])
+        self._expiry = list(state["expiry"])
+        heapq.heapify(self._expiry)
+
 
 class ItemManager:
-    """アイテムを管理するクラス"""
+    """アイテムを管理するクラス
     
-    def __init__(self, field_size: Tuple[float, float] = (10.0, 10.0)):
+    フィールド上のアイテムはセル単位のグリッドに登録され、
+    拾えるかどうかの判定では周辺のセルだけを調べます。
+    """
+    
+    def __init__(
+        self,
+        field_size: Tuple[float, float] = (10.0, 10.0),
+        max_items_on_field: int = 5,
+        cell_size: float = 1.0,
+        scheduler: Optional[SpawnScheduler] = None,
+        rng: Optional[random.Random] = None,
+        wrap: bool = False
+    ):
         """
         Args:
             field_size: フィールドのサイズ (width, height)
+            max_items_on_field: フィールド上の最大アイテム数
+            cell_size: 空間インデックスのセルの大きさ
+            scheduler: 出現スケジューラー（Noneならステップごとに1回の確率判定）
+            rng: 出現の判定に使う乱数（省略時はrandomモジュール）
+            wrap: フィールドの端がつながっているかどうか（拾える距離を端をまたいで判定する）
         """
         self.field_size = field_size
-        self.items_on_field = []  # フィールド上のアイテム
+        self.cell_size = cell_size
+        self.wrap = wrap
+        # wrapの時にセルの番号を折り返すためのセル数
+        self._grid_shape = (
+            max(1, math.ceil(field_size[0] / cell_size)),
+            max(1, math.ceil(field_size[1] / cell_size))
+        )
         self.spawn_probability = 0.03  # アイテム出現確率（ステップあたり）
-        self.max_items_on_field = 5  # フィールド上の最大アイテム数
+        self.max_items_on_field = max_items_on_field  # フィールド上の最大アイテム数
+        self.scheduler = scheduler
+        self.rng = rng if rng is not None else random
+        
+        self._items: Dict[int, Item] = {}  # {item_id: Item}（出現順）
+        self._grid: Dict[Tuple[int, int], Dict[int, Item]] = {}  # {セル: {item_id: Item}}
+        self._next_id = 0
+        self._arrays = None  # resolve_pickups用の配列キャッシュ（アイテムの増減で破棄）
+        self._items_state = None  # get_items_stateのキャッシュ（アイテムの増減で破棄）
+    
+    @property
+    def items_on_field(self) -> List[Item]:
+        """フィールド上のアイテム（出現順）"""
+        return list(self._items.values())
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def get_item(self, item_id: int) -> Optional[Item]:
+        """IDからフィールド上のアイテムを取得"""
+        return self._items.get(item_id)
+    
+    def _cell_of(self, x: float, y: float) -> Tuple[int, int]:
+        """座標が属するセル（wrapならフィールド内に折り返したセル）"""
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        if self.wrap:
+            return (cell[0] % self._grid_shape[0], cell[1] % self._grid_shape[1])
+        return cell
+    
+    def place_item(self, item: Item, position: Tuple[float, float]) -> Item:
+        """アイテムをフィールドに配置"""
+        item.item_id = self._next_id
+        self._next_id += 1
+        item.position = position
+        return self._insert(item)
+    
+    def _insert(self, item: Item) -> Item:
+        """IDと位置が決まっているアイテムを登録"""
+        self._items[item.item_id] = item
+        self._grid.setdefault(self._cell_of(*item.position), {})[item.item_id] = item
+        self._arrays = None
+        self._items_state = None
+        return item
+    
+    def export_state(self) -> Dict:
+        """
+        チェックポイント用に、フィールドのアイテムと出現の状態を組み込み型だけの辞書で出力
+        
+        Returns:
+            restore_state で復元できる辞書
+        """
+        return {
+            "items": [item.to_record() for item in self._items.values()],
+            "next_id": self._next_id,
+            "spawn_probability": self.spawn_probability,
+            "max_items_on_field": self.max_items_on_field,
+            "scheduler": self.scheduler.export_state() if self.scheduler is not None else None
+        }
+    
+    def restore_state(self, state: Dict):
+        """export_state の出力からフィールドのアイテムと出現の状態を戻す"""
+        self._items.clear()
+        self._grid.clear()
+        for record in state["items"]:
+            self._insert(Item.from_record(record))
+        self._next_id = state["next_id"]
+        self.spawn_probability = state["spawn_probability"]
+        self.max_items_on_field = state["max_items_on_field"]
+        self._arrays = None
+        self._items_state = None
+        if self.scheduler is not None and state["scheduler"] is not None:
+            self.scheduler.restore_state(state["scheduler"])
+    
+    def remove_item(self, item: Item) -> bool:
+        """アイテムをフィールドから取り除く（O(1)）"""
+        if self._items.pop(item.item_id, None) is None:
+            return False
+        
+        cell = self._cell_of(*item.position)
+        bucket = self._grid[cell]
+        del bucket[item.item_id]
+        if not bucket:
+            del self._grid[cell]
+        self._arrays = None
+        self._items_state = None
+        
+        if self.scheduler is not None:
+            self.scheduler.forget(item)
+        return True
+    
+    def items_near(self, position: Tuple[float, float], radius: float) -> Iterator[Item]:
+        """指定位置から半径radiusの円と重なるセルにあるアイテムを列挙（wrapなら端の反対側のセルも含む）"""
+        x, y = position
+        cell_size = self.cell_size
+        min_cx, min_cy = int((x - radius) // cell_size), int((y - radius) // cell_size)
+        max_cx, max_cy = int((x + radius) // cell_size), int((y + radius) // cell_size)
+        
+        if not self.wrap:
+            for cx in range(min_cx, max_cx + 1):
+                for cy in range(min_cy, max_cy + 1):
+                    bucket = self._grid.get((cx, cy))
+                    if bucket:
+                        yield from bucket.values()
+            return
+        
+        # 折り返すと同じセルに何度も当たることがあるので、1度ずつ調べる
+        n_x, n_y = self._grid_shape
+        cells = {
+            (cx % n_x, cy % n_y)
+            for cx in range(min_cx, max_cx + 1)
+            for cy in range(min_cy, max_cy + 1)
+        }
+        for cell in cells:
+            bucket = self._grid.get(cell)
+            if bucket:
+                yield from bucket.values()
     
     def create_random_berry(self) -> Item:
         """ランダムなきのみを生成"""
-        berry_name = random.choice(list(BERRY_TYPES.keys()))
-        berry_data = BERRY_TYPES[berry_name]
-        
-        item = Item(
-            name=berry_name,
-            item_type=berry_data["type"],
-            effect_type=berry_data["effect_type"],
-            effect_value=berry_data["effect_value"]
-        )
-        
-        return item
+        return Item.from_kind(self.rng.choice(BERRY_KINDS))
     
     def spawn_item(self):
         """フィールドにアイテムを出現させる"""
-        if len(self.items_on_field) >= self.max_items_on_field:
+        if len(self._items) >= self.max_items_on_field:
             return None
         
-        if random.random() < self.spawn_probability:
+        if self.rng.random() < self.spawn_probability:
             item = self.create_random_berry()
             # ランダムな位置に配置
-            x = random.uniform(0.5, self.field_size[0] - 0.5)
-            y = random.uniform(0.5, self.field_size[1] - 0.5)
-            item.position = (x, y)
-            self.items_on_field.append(item)
-            return item
+            x = self.rng.uniform(0.5, self.field_size[0] - 0.5)
+            y = self.rng.uniform(0.5, self.field_size[1] - 0.5)
+            return self.place_item(item, (x, y))
         
         return None
     
+    def update_field(self, step: int) -> Tuple[List[Item], List[Item]]:
+        """
+        1ステップ分のアイテムの出現と消滅を処理
+        
+        Args:
+            step: 現在のステップ数
+            
+        Returns:
+            (出現したアイテムのリスト, 消えたアイテムのリスト)
+        """
+        if self.scheduler is None:
+            item = self.spawn_item()
+            return ([item] if item else []), []
+        
+        expired = self.scheduler.expire(self, step)
+        spawned = self.scheduler.spawn(self, step)
+        return spawned, expired
+    
     def check_pickup(self, pokemon, pickup_distance: float = 0.5) -> Optional[Item]:
         """
         ポケモンがアイテムを拾えるかチェック
@@ -184,33 +616,101 @@ class ItemManager:
             拾ったアイテム、なければNone
         """
         px, py = pokemon.position
+        limit = pickup_distance * pickup_distance
+        width, height = self.field_size
         
-        for item in self.items_on_field[:]:
-            if item.position:
-                ix, iy = item.position
-                distance = ((px - ix) ** 2 + (py - iy) ** 2) ** 0.5
-                
-                if distance < pickup_distance:
-                    # アイテムを拾う
-                    self.items_on_field.remove(item)
-                    return item
+        # 範囲内のアイテムのうち、最も早く出現したものを拾う
+        picked = None
+        for item in self.items_near((px, py), pickup_distance):
+            dx = item.position[0] - px
+            dy = item.position[1] - py
+            if self.wrap:
+                dx -= width * round(dx / width)
+                dy -= height * round(dy / height)
+            if dx * dx + dy * dy < limit:
+                if picked is None or item.item_id < picked.item_id:
+                    picked = item
         
-        return None
+        if picked is not None:
+            self.remove_item(picked)
+        
+        return picked
+    
+    def _item_arrays(self) -> Tuple[List[Item], np.ndarray, np.ndarray]:
+        """フィールド上のアイテム、ID、座標を配列で取得（変化がなければキャッシュを返す）"""
+        if self._arrays is None:
+            items = list(self._items.values())
+            ids = np.fromiter((item.item_id for item in items), dtype=np.int64, count=len(items))
+            positions = np.array([item.position for item in items], dtype=float).reshape(-1, 2)
+            self._arrays = (items, ids, positions)
+        return self._arrays
+    
+    def resolve_pickups(self, positions, pickup_distance: float = 0.5) -> List[Tuple[int, Item]]:
+        """
+        全ポケモンのアイテム取得をまとめて判定
+        
+        各ポケモンは最大1個、各アイテムは1匹だけが拾えます。
+        複数のポケモンが同じアイテムに届く場合は、距離が近い方が拾います
+        （同じ距離ならインデックスが小さいポケモン、出現が早いアイテムを優先）。
+        
+        Args:
+            positions: 全ポケモンの座標の配列 (N, 2)
+            pickup_distance: 拾える距離
+            
+        Returns:
+            (ポケモンのインデックス, 拾ったアイテム) のリスト（インデックス順）
+        """
+        if not self._items:
+            return []
+        
+        items, ids, item_positions = self._item_arrays()
+        pokemon_index, item_index, dist2 = radius_pairs(
+            positions, item_positions, pickup_distance, self.cell_size,
+            wrap_size=self.field_size if self.wrap else None
+        )
+        if len(pokemon_index) == 0:
+            return []
+        
+        # 距離 → ポケモンのインデックス → アイテムの出現順 で優先順位を決める
+        order = np.lexsort((ids[item_index], pokemon_index, dist2))
+        
+        picked = {}
+        taken_items = set()
+        for k in order:
+            p, i = int(pokemon_index[k]), int(item_index[k])
+            if p in picked or i in taken_items:
+                continue
+            picked[p] = items[i]
+            taken_items.add(i)
+        
+        for item in picked.values():
+            self.remove_item(item)
+        
+        return sorted(picked.items())
     
-    def get_items_state(self) -> list:
-        """フィールド上のアイテムの状態を取得"""
-        return [
-            {
-                "name": item.name,
-                "position": item.position,
-                "color": item.get_color(),
-                "emoji": item.get_emoji(),
-                "effect_type": item.effect_type
-            }
-            for item in self.items_on_field
-        ]
+    def get_items_state(self) -> Tuple[ItemState, ...]:
+        """
+        フィールド上のアイテムの状態を取得
+        
+        アイテムが変化するまで同じタプルを返します（要素も不変なので、読む側で変更されることはない）。
+        
+        Returns:
+            ItemState のタプル（出現順）
+        """
+        if self._items_state is None:
+            self._items_state = tuple(
+                ItemState(
+                    name=item.kind.name,
+                    position=item.position,
+                    color=item.kind.color,
+                    emoji=item.kind.emoji,
+                    effect_type=item.kind.effect_type
+                )
+                for item in self._items.values()
+            )
+        return self._items_state
     
     def clear_all_items(self):
         """全てのアイテムをクリア"""
-        self.items_on_field.clear()
-
+        for item in list(self._items.values()):
+            self.remove_item(item)
@@ -0,0 +1,103 @@
+"""
+語彙インデックス: 文字バイグラムの転置インデックスとBM25スコアリング
+
+日本語のように空白で区切られないテキスト向けの軽量な検索器です。
+埋め込みモデルを読み込まずに検索できます。
+"""
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+
+def char_ngrams(text: str, n: int = 2) -> List[str]:
+    """
+    テキストを文字n-gramに分割
+    
+    空白は区切りとして扱い、n文字未満の断片はそのまま1トークンにします。
+    
+    Args:
+        text: 分割するテキスト
+        n: n-gramの長さ
+    
+    Returns:
+        n-gramのリスト
+    """
+    grams = []
+    for chunk in text.lower().split():
+        if len(chunk) < n:
+            grams.append(chunk)
+            continue
+        grams.extend(chunk[i:i + n] for i in range(len(chunk) - n + 1))
+    return grams
+
+
+class BigramBM25Index:
+    """文字バイグラムの転置インデックスによるBM25検索"""
+    
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75, ngram: int = 2):
+        """
+        Args:
+            documents: インデックス化するドキュメントのリスト
+            k1: BM25の単語頻度の飽和パラメータ
+            b: BM25の文書長の正規化パラメータ
+            ngram: n-gramの長さ
+        """
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.ngram = ngram
+        
+        # 転置インデックス {term: [(doc_index, term_frequency), ...]}
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths = []
+        
+        for doc_index, doc in enumerate(documents):
+            grams = char_ngrams(doc, ngram)
+            self.doc_lengths.append(len(grams))
+            for term, tf in Counter(grams).items():
+                self.postings.setdefault(term, []).append((doc_index, tf))
+        
+        n_docs = len(documents)
+        self.avg_doc_length = (sum(self.doc_lengths) / n_docs) if n_docs else 0.0
+        
+        # IDFは文書集合が固定なので事前計算しておく
+        self.idf = {
+            term: math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+        
+        # 文書長の正規化項も事前計算
+        self._length_norm = [
+            self.k1 * (1 - self.b + self.b * length / self.avg_doc_length) if self.avg_doc_length else self.k1
+            for length in self.doc_lengths
+        ]
+    
+    def search(self, query: str, n_results: int = 5) -> List[Tuple[int, float]]:
+        """
+        クエリに対するBM25スコアの上位ドキュメントを取得
+        
+        Args:
+            query: 検索クエリ
+            n_results: 取得する結果の数
+        
+        Returns:
+            (ドキュメントのインデックス, スコア) のリスト（スコアの降順）
+        """
+        scores: Dict[int, float] = {}
+        
+        for term, qtf in Counter(char_ngrams(query, self.ngram)).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for doc_index, tf in posting:
+                score = idf * tf * (self.k1 + 1) / (tf + self._length_norm[doc_index])
+                scores[doc_index] = scores.get(doc_index, 0.0) + score * qtf
+        
+        # 同点の場合はインデックス順で安定させる
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n_results]
+    
+    def query(self, query: str, n_results: int = 5) -> List[str]:
+        """クエリに関連するドキュメントの本文を取得"""
+        return [self.documents[i] for i, _ in self.search(query, n_results)]
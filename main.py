@@ -9,17 +9,101 @@
     --visualizer: ビジュアライザーのタイプ (standard/simple) デフォルト: standard
     --interval: 更新間隔（ミリ秒） デフォルト: 500
     --no-openai: OpenAI APIを使わない（ローカルシミュレーションのみ）
+    --retrieval: RAGの検索モード (vector/lexical/hybrid) デフォルト: vector
+    --headless: ビジュアライザーを起動せずにシミュレーションのみ実行
+    --steps: ヘッドレス実行時のステップ数 デフォルト: 100
+    --profile-startup: 起動時間の内訳（import/初期化）を表示
+    --startup-budget: 起動時間の予算（ミリ秒）。超えた場合は警告を表示
+    --alos-workers: ALOs生成の同時実行数 デフォルト: 4
+    --event-log: 全イベントをJSONLファイルに書き出す
+    --quiet: イベントをコンソールに表示しない
+    --tick-rate: シミュレーションを描画とは別スレッドで進める（ステップ/秒, 0で全速力）
+    --interpolate: --tick-rate使用時にステップ間の移動を補間して描画する
+    --lod-threshold: この数を超えるとマップを密度のヒートマップで表示する デフォルト: 300
+    --focus: 名前とステータスを表示するポケモンのキー（カンマ区切り）
+    --grid-size: simpleビジュアライザーのグリッドのサイズ デフォルト: 50
+    --blend: simpleビジュアライザーで重なったポケモンの色を足し合わせる
+    --export: 画面を使わずに--stepsステップ分を録画する（動画の拡張子ならffmpegで動画、それ以外はPNG連番のディレクトリ）
+    --fps: 録画のフレームレート デフォルト: 10
+    --workers: 録画のフレームを描画するプロセス数 デフォルト: CPUコア数
+    --web-viewer: matplotlibの代わりにブラウザで表示する（状態の差分をWebSocketで配信）
+    --web-port: Webビューアーのポート デフォルト: 8765
+    --profile-phases: ステップのフェーズごとの所要時間を計測し、終了時に表示
+    --phase-report-every: このステップ数ごとにフェーズ別のレポートを表示 デフォルト: 0（終了時のみ）
+    --phase-report-json: フェーズ別のレポートをJSONLファイルに追記
+    --cprofile-steps: このステップ数の間をcProfileで計測して書き出す
+    --cprofile-start: cProfileで計測を始めるステップ デフォルト: 1
+    --cprofile-output: cProfileの結果の出力先 デフォルト: step_profile.prof
+    --field-size: フィールドの大きさ（"幅x高さ" または1辺の長さ） デフォルト: 10x10
+    --boundary: フィールドの端の扱い (clamp/wrap) デフォルト: clamp
+    --interaction-radius: バトルや交流が起きる距離 デフォルト: 1.5
+    --awareness-radius: 互いに気づいて近づく/離れる距離 デフォルト: 3.0
+    --seed: 初期位置とシミュレーションの乱数シード（省略時はランダム）
+    --record: 実行をログに記録する（replay.py でLLMを呼ばずに再生できる）
+    --checkpoint: エンジンの全状態を定期的に保存するファイル
+    --checkpoint-every: チェックポイントを保存する間隔（ステップ） デフォルト: 100
+    --resume: チェックポイントから再開する（ALOsは生成し直さない）
+
+重いモジュール（chromadb, openai, matplotlib）は必要になった時点でimportします。
 """
+import time
+
+_MAIN_START = time.perf_counter()
+
 import os
+import random
 import sys
 import argparse
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
-from rag_system import PokemonRAG
-from alos_system import ALOsSystem
 from pokemon_alos import PokemonALOs
 from simulation_engine import SimulationEngine
-from visualization import PokemonVisualizer, SimplePokemonVisualizer
+from world import WorldConfig
+
+_BASE_IMPORT_TIME = time.perf_counter() - _MAIN_START
+
+
+class StartupProfiler:
+    """起動時間をサブシステムごとに計測するクラス"""
+    
+    def __init__(self, enabled: bool = False):
+        """
+        Args:
+            enabled: 計測結果を表示するかどうか
+        """
+        self.enabled = enabled
+        self.records = [("main", "import", _BASE_IMPORT_TIME)]  # [(サブシステム, 種類, 秒)]
+    
+    @contextmanager
+    def measure(self, subsystem: str, kind: str):
+        """ブロックの実行時間を記録"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.records.append((subsystem, kind, time.perf_counter() - start))
+    
+    def report(self, budget_ms: float = None):
+        """計測結果を表示"""
+        if not self.enabled:
+            return
+        
+        total_ms = (time.perf_counter() - _MAIN_START) * 1000
+        
+        print("\n⏱️  起動時間の内訳:")
+        for subsystem, kind, seconds in self.records:
+            label = f"{subsystem} ({kind})"
+            print(f"   {label:<28}{seconds * 1000:>9.1f} ms")
+        
+        for kind in ("import", "init"):
+            kind_ms = sum(sec for _, k, sec in self.records if k == kind) * 1000
+            print(f"   {'合計 ' + kind:<26}{kind_ms:>9.1f} ms")
+        print(f"   {'全体':<26}{total_ms:>9.1f} ms")
+        
+        if budget_ms is not None and total_ms > budget_ms:
+            print(f"   ⚠️  起動時間が予算を超えています: {total_ms:.0f}ms > {budget_ms:.0f}ms")
+        print()
 
 
 def main():
@@ -30,11 +114,65 @@ def main():
                        choices=['standard', 'simple'], help='ビジュアライザーのタイプ')
     parser.add_argument('--interval', type=int, default=500, help='更新間隔（ミリ秒）')
     parser.add_argument('--no-openai', action='store_true', help='OpenAI APIを使わない')
+    parser.add_argument('--retrieval', type=str, default='vector',
+                       choices=['vector', 'lexical', 'hybrid'], help='RAGの検索モード')
+    parser.add_argument('--headless', action='store_true', help='ビジュアライザーなしで実行')
+    parser.add_argument('--steps', type=int, default=100, help='ヘッドレス実行時のステップ数')
+    parser.add_argument('--profile-startup', action='store_true', help='起動時間の内訳を表示')
+    parser.add_argument('--startup-budget', type=float, default=None, help='起動時間の予算（ミリ秒）')
+    parser.add_argument('--alos-workers', type=int, default=4, help='ALOs生成の同時実行数')
+    parser.add_argument('--event-log', type=str, default=None, help='全イベントを書き出すJSONLファイル')
+    parser.add_argument('--quiet', action='store_true', help='イベントをコンソールに表示しない')
+    parser.add_argument('--tick-rate', type=float, default=None,
+                        help='シミュレーションを描画とは別スレッドで進める（ステップ/秒, 0で全速力）')
+    parser.add_argument('--interpolate', action='store_true', help='--tick-rate使用時にステップ間の移動を補間して描画する')
+    parser.add_argument('--lod-threshold', type=int, default=300, help='この数を超えるとマップを密度のヒートマップで表示する')
+    parser.add_argument('--focus', type=str, default=None, help='名前とステータスを表示するポケモンのキー（カンマ区切り）')
+    parser.add_argument('--grid-size', type=int, default=50, help='simpleビジュアライザーのグリッドのサイズ')
+    parser.add_argument('--blend', action='store_true', help='simpleビジュアライザーで重なったポケモンの色を足し合わせる')
+    parser.add_argument('--export', type=str, default=None,
+                        help='画面を使わずに録画する出力先（.mp4などはffmpegで動画、それ以外はPNG連番のディレクトリ）')
+    parser.add_argument('--fps', type=int, default=10, help='録画のフレームレート')
+    parser.add_argument('--workers', type=int, default=None, help='録画のフレームを描画するプロセス数')
+    parser.add_argument('--web-viewer', action='store_true', help='ブラウザで表示する（localhostのみ）')
+    parser.add_argument('--web-port', type=int, default=8765, help='Webビューアーのポート')
+    parser.add_argument('--profile-phases', action='store_true', help='ステップのフェーズごとの所要時間を計測')
+    parser.add_argument('--phase-report-every', type=int, default=0, help='このステップ数ごとにフェーズ別のレポートを表示')
+    parser.add_argument('--phase-report-json', type=str, default=None, help='フェーズ別のレポートを追記するJSONLファイル')
+    parser.add_argument('--cprofile-steps', type=int, default=0, help='このステップ数の間をcProfileで計測')
+    parser.add_argument('--cprofile-start', type=int, default=1, help='cProfileで計測を始めるステップ')
+    parser.add_argument('--cprofile-output', type=str, default='step_profile.prof', help='cProfileの結果の出力先')
+    parser.add_argument('--field-size', type=str, default='10x10', help='フィールドの大きさ（"幅x高さ" または1辺の長さ）')
+    parser.add_argument('--boundary', type=str, default='clamp', choices=['clamp', 'wrap'], help='フィールドの端の扱い')
+    parser.add_argument('--interaction-radius', type=float, default=1.5, help='バトルや交流が起きる距離')
+    parser.add_argument('--awareness-radius', type=float, default=3.0, help='互いに気づいて近づく/離れる距離')
+    parser.add_argument('--seed', type=int, default=None, help='シミュレーションの乱数シード')
+    parser.add_argument('--record', type=str, default=None, help='実行を記録するログファイル（.jsonl.gz）')
+    parser.add_argument('--checkpoint', type=str, default=None, help='エンジンの全状態を定期的に保存するファイル')
+    parser.add_argument('--checkpoint-every', type=int, default=100, help='チェックポイントを保存する間隔（ステップ）')
+    parser.add_argument('--resume', type=str, default=None, help='再開するチェックポイントのファイル')
     
     args = parser.parse_args()
+    if args.record and args.resume:
+        parser.error("--record は最初から実行する場合にしか使えません（--resume と同時に指定できません）")
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    
+    # ワールド設定（全てのサブシステムがこれを参照する）
+    try:
+        width, _, height = args.field_size.lower().partition('x')
+        world = WorldConfig(
+            width=float(width),
+            height=float(height or width),
+            boundary=args.boundary,
+            interaction_radius=args.interaction_radius,
+            awareness_radius=args.awareness_radius
+        ).validate()
+    except ValueError as e:
+        parser.error(f"ワールド設定が不正です: {e}")
     
     # 環境変数の読み込み
-    load_dotenv()
+    with profiler.measure("dotenv", "init"):
+        load_dotenv()
     
     print("=" * 60)
     print("🎮 ポケモンALOsシミュレーション")
@@ -55,12 +193,17 @@ def main():
     # RAGシステムの初期化
     print("📚 RAGシステムを初期化中...")
     use_rag = not args.no_rag
+    with profiler.measure("rag_system", "import"):
+        from rag_system import PokemonRAG
     try:
-        rag_system = PokemonRAG(
-            context_file="pokemon_context.json",
-            use_rag=use_rag
-        )
-        print(f"   ✅ RAGシステム初期化完了 (モード: {'RAG有効' if use_rag else 'RAG無効'})")
+        with profiler.measure("rag_system", "init"):
+            rag_system = PokemonRAG(
+                context_file="pokemon_context.json",
+                use_rag=use_rag,
+                retrieval_mode=args.retrieval
+            )
+        mode = f"RAG有効, 検索: {args.retrieval}" if use_rag else "RAG無効"
+        print(f"   ✅ RAGシステム初期化完了 (モード: {mode})")
     except Exception as e:
         print(f"   ⚠️  RAGシステムの初期化に失敗: {e}")
         print("   RAG無効モードで続行します")
@@ -71,10 +214,13 @@ def main():
     if use_openai:
         print("🤖 ALOsシステムを初期化中...")
         try:
-            alos_system = ALOsSystem(
-                api_key=api_key,
-                model="gpt-4-turbo-2024-04-09"  # ユーザーが指定したモデルに近いもの
-            )
+            with profiler.measure("alos_system", "import"):
+                from alos_system import ALOsSystem
+            with profiler.measure("alos_system", "init"):
+                alos_system = ALOsSystem(
+                    api_key=api_key,
+                    model="gpt-4-turbo-2024-04-09"  # ユーザーが指定したモデルに近いもの
+                )
             print("   ✅ ALOsシステム初期化完了")
         except Exception as e:
             print(f"   ⚠️  ALOsシステムの初期化に失敗: {e}")
@@ -85,29 +231,59 @@ def main():
         print("ℹ️  OpenAI APIを使用しないモードで実行します")
         print("   シンプルなローカルシミュレーションが動作します")
     
-    # ポケモンALOsの作成
-    print("\n🎯 ポケモンを作成中...")
-    
-    pokemons = []
-    pokemon_keys = ['pikachu', 'meowth', 'sprigatito']
-    
-    for key in pokemon_keys:
-        pokemon_data = rag_system.get_pokemon_data(key)
+    # ポケモンALOsの作成（再開時はチェックポイントから作り直し、ALOsは生成し直さない）
+    checkpoint_state = None
+    if args.resume:
+        from checkpoint import CheckpointError, checkpoint_world, pokemons_from_checkpoint, read_checkpoint
+        print(f"\n♻️  チェックポイントから再開します: {args.resume}")
+        try:
+            with profiler.measure("checkpoint", "load"):
+                checkpoint_state = read_checkpoint(args.resume)
+                pokemons = pokemons_from_checkpoint(checkpoint_state)
+                world = checkpoint_world(checkpoint_state)
+        except (OSError, CheckpointError) as e:
+            print(f"   ❌ チェックポイントを読み込めません: {e}")
+            return
+        print(f"   ✅ ステップ {checkpoint_state['step_count']} の状態を読み込みました（{len(pokemons)}体）")
+    else:
+        print("\n🎯 ポケモンを作成中...")
         
-        # ALOs定義を生成（OpenAI使用時のみ）
-        alos_definition = None
-        if use_openai and alos_system:
-            try:
-                context = rag_system.query_context(f"{pokemon_data['name']}の特徴", n_results=3)
-                alos_definition = alos_system.create_alos(key, pokemon_data, context)
-                print(f"   ✅ {pokemon_data['name']} のALOs生成完了")
-            except Exception as e:
-                print(f"   ⚠️  {pokemon_data['name']} のALOs生成に失敗: {e}")
-        else:
-            print(f"   ✅ {pokemon_data['name']} を作成")
+        pokemons = []
+        pokemon_keys = ['pikachu', 'meowth', 'sprigatito']
+        # 初期位置もシードから決める（エンジンの乱数とは別の系列にする）
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+        placement_rng = random.Random(f"positions:{seed}")
         
-        pokemon = PokemonALOs(key, pokemon_data, alos_definition)
-        pokemons.append(pokemon)
+        with profiler.measure("pokemons", "init"):
+            # ALOs定義を並行して生成（OpenAI使用時のみ）
+            alos_definitions = {}
+            if use_openai and alos_system:
+                requests = []
+                for key in pokemon_keys:
+                    pokemon_data = rag_system.get_pokemon_data(key)
+                    try:
+                        context = rag_system.query_context(f"{pokemon_data['name']}の特徴", n_results=3)
+                    except Exception as e:
+                        print(f"   ⚠️  {pokemon_data['name']} のコンテクスト取得に失敗: {e}")
+                        context = []
+                    requests.append((key, pokemon_data, context))
+                
+                results = alos_system.create_alos_concurrently(requests, max_workers=args.alos_workers)
+                for key, pokemon_data, _ in requests:
+                    result = results.get(key)
+                    if isinstance(result, Exception):
+                        print(f"   ⚠️  {pokemon_data['name']} のALOs生成に失敗: {result}")
+                    else:
+                        alos_definitions[key] = result
+                        print(f"   ✅ {pokemon_data['name']} のALOs生成完了")
+            
+            for key in pokemon_keys:
+                pokemon_data = rag_system.get_pokemon_data(key)
+                if not (use_openai and alos_system):
+                    print(f"   ✅ {pokemon_data['name']} を作成")
+                
+                pokemon = PokemonALOs(key, pokemon_data, alos_definitions.get(key), world=world, rng=placement_rng)
+                pokemons.append(pokemon)
     
     # シミュレーションエンジンの初期化
     print("\n⚙️  シミュレーションエンジンを初期化中...")
@@ -120,32 +296,137 @@ def main():
         
         alos_system = DummyALOsSystem()
     
-    engine = SimulationEngine(pokemons, alos_system, rag_system)
+    with profiler.measure("engine", "init"):
+        from profiling import PhaseProfiler
+        phase_profiler = PhaseProfiler(
+            enabled=args.profile_phases or args.phase_report_every > 0 or args.phase_report_json is not None,
+            report_every=args.phase_report_every,
+            report_path=args.phase_report_json
+        )
+        if args.cprofile_steps > 0:
+            phase_profiler.profile_steps(args.cprofile_start, args.cprofile_steps, args.cprofile_output)
+        engine = SimulationEngine(
+            pokemons, alos_system, rag_system,
+            echo_events=not args.quiet,
+            profiler=phase_profiler,
+            world=world,
+            seed=checkpoint_state["seed"] if checkpoint_state is not None else seed
+        )
+        if checkpoint_state is not None:
+            from checkpoint import restore_checkpoint
+            restore_checkpoint(engine, checkpoint_state)
+        if args.event_log:
+            from events import JsonlEventSink
+            engine.add_event_sink(JsonlEventSink(args.event_log))
+        recorder = None
+        if args.record:
+            from replay import RunRecorder
+            recorder = RunRecorder(args.record).attach(engine)
+        checkpoint_writer = None
+        if args.checkpoint:
+            from checkpoint import CheckpointWriter
+            checkpoint_writer = CheckpointWriter(args.checkpoint, every=args.checkpoint_every).attach(engine)
     print("   ✅ シミュレーションエンジン初期化完了")
+    if recorder is not None:
+        print(f"   📼 実行を記録します: {args.record}（シード {engine.seed}）")
+    if checkpoint_writer is not None:
+        print(f"   💾 {args.checkpoint_every}ステップごとにチェックポイントを保存します: {args.checkpoint}")
     
-    # ビジュアライザーの初期化と実行
-    print(f"\n🎨 ビジュアライザーを起動中 (タイプ: {args.visualizer})...")
-    print("   ウィンドウを閉じると終了します\n")
-    
-    print("=" * 60)
-    print("シミュレーション開始！")
-    print("=" * 60)
-    print()
-    
+    runner = None
+    web_viewer = None
     try:
-        if args.visualizer == 'simple':
-            visualizer = SimplePokemonVisualizer(
-                engine,
-                grid_size=50,
-                update_interval=args.interval
+        if args.export:
+            # 録画：シミュレーションを記録してから、複数プロセスで描画する
+            from export import record_snapshots, export_frames
+            
+            profiler.report(args.startup_budget)
+            print(f"\n🎬 {args.steps}ステップを記録中...")
+            snapshots = record_snapshots(engine, args.steps)
+            
+            print(f"🎞️  {len(snapshots)}フレームを描画中 → {args.export}")
+            frames = export_frames(
+                snapshots,
+                args.export,
+                layout=args.visualizer,
+                fps=args.fps,
+                workers=args.workers,
+                grid_size=args.grid_size,
+                world=engine.world
             )
+            print(f"   ✅ {frames}フレームを書き出しました")
+        elif args.web_viewer:
+            # Webビューアー：描画はブラウザに任せ、このプロセスは差分を配信するだけ
+            from sim_runner import SimulationRunner
+            from web_viewer import WebViewerServer
+            
+            tick_rate = args.tick_rate if args.tick_rate is not None else 1000.0 / args.interval
+            runner = SimulationRunner(engine, tick_rate=tick_rate)
+            web_viewer = WebViewerServer(runner, port=args.web_port)
+            web_viewer.start()
+            
+            profiler.report(args.startup_budget)
+            print(f"\n🌐 Webビューアー: {web_viewer.url}")
+            print("   Ctrl+Cで終了します\n")
+            print("=" * 60)
+            print("シミュレーション開始！")
+            print("=" * 60)
+            print()
+            
+            runner.start()
+            while runner.running:
+                runner.join(timeout=0.5)
+        elif args.headless:
+            # ヘッドレス実行：matplotlibは読み込まない
+            profiler.report(args.startup_budget)
+            print(f"\n🖥️  ヘッドレスモードで{args.steps}ステップ実行します\n")
+            print("=" * 60)
+            print("シミュレーション開始！")
+            print("=" * 60)
+            print()
+            
+            for _ in range(args.steps):
+                engine.step()
         else:
-            visualizer = PokemonVisualizer(
-                engine,
-                update_interval=args.interval
-            )
-        
-        visualizer.run()
+            # ビジュアライザーの初期化と実行
+            print(f"\n🎨 ビジュアライザーを起動中 (タイプ: {args.visualizer})...")
+            
+            with profiler.measure("visualization", "import"):
+                from visualization import PokemonVisualizer, SimplePokemonVisualizer
+            
+            if args.tick_rate is not None:
+                from sim_runner import SimulationRunner
+                runner = SimulationRunner(engine, tick_rate=args.tick_rate)
+            
+            with profiler.measure("visualization", "init"):
+                if args.visualizer == 'simple':
+                    visualizer = SimplePokemonVisualizer(
+                        engine,
+                        grid_size=args.grid_size,
+                        update_interval=args.interval,
+                        runner=runner,
+                        blend=args.blend
+                    )
+                else:
+                    visualizer = PokemonVisualizer(
+                        engine,
+                        update_interval=args.interval,
+                        runner=runner,
+                        interpolate=args.interpolate,
+                        lod_threshold=args.lod_threshold,
+                        focus_keys=args.focus.split(',') if args.focus else None
+                    )
+            
+            profiler.report(args.startup_budget)
+            print("   ウィンドウを閉じると終了します\n")
+            
+            print("=" * 60)
+            print("シミュレーション開始！")
+            print("=" * 60)
+            print()
+            
+            if runner is not None:
+                runner.start()
+            visualizer.run()
         
     except KeyboardInterrupt:
         print("\n\nシミュレーションを終了します...")
@@ -154,10 +435,24 @@ def main():
         import traceback
         traceback.print_exc()
     finally:
+        if runner is not None:
+            runner.stop()
+        if web_viewer is not None:
+            web_viewer.stop()
+        engine.close()
+        if recorder is not None:
+            recorder.close()
+        if checkpoint_writer is not None:
+            checkpoint_writer.close(engine)
+            print(f"\n💾 チェックポイントを保存しました: {args.checkpoint}（ステップ {checkpoint_writer.last_step}）")
+        if phase_profiler.enabled and phase_profiler.steps > 0:
+            phase_profiler.report()
         print("\n" + "=" * 60)
         print(f"シミュレーション統計:")
         print(f"  総ステップ数: {engine.step_count}")
-        print(f"  イベント数: {len(engine.event_log)}")
+        print(f"  イベント数: {engine.event_count}")
+        relationship_stats = engine.get_relationship_stats()
+        print(f"  敵対的な組: {relationship_stats['hostile_pairs']}  友好的な組: {relationship_stats['friendly_pairs']}")
         print("\nポケモンの最終状態:")
         for key, pokemon in engine.pokemons.items():
             print(f"  {pokemon.name}:")
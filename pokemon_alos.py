@@ -1,64 +1,242 @@
 """
 ポケモンALOsクラス: 各ポケモンのALOs表現とシミュレーション
 """
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, NamedTuple, Tuple, Optional
+from collections import deque
+import math
 import random
-import numpy as np
+from items import Item
+from world import WorldConfig, DEFAULT_WORLD
+
+
+# ポケモンごとの基本色（RGB, 0-1の範囲）
+POKEMON_COLORS = {
+    "pikachu": (1.0, 0.9, 0.0),      # 黄色（ピカチュウ）
+    "meowth": (0.7, 0.7, 0.7),       # 灰色（ニャース）
+    "sprigatito": (0.2, 0.8, 0.3)    # 緑（ニャオハ）
+}
+
+# タイプごとの色（可視化用）
+TYPE_COLORS = {
+    "でんき": "yellow",
+    "ノーマル": "gray",
+    "くさ": "green"
+}
+
+
+class SpeciesProfile(NamedTuple):
+    """同じポケモンデータを持つ個体全てで共有される不変のプロフィール"""
+    name: str
+    owner: str
+    species: str
+    type: str
+    personality: str
+    abilities: Tuple[str, ...]
+
+
+_PROFILES: Dict[SpeciesProfile, SpeciesProfile] = {}
+
+
+def intern_profile(pokemon_data: Dict) -> SpeciesProfile:
+    """
+    ポケモンデータからプロフィールを作成（同じ内容なら共有インスタンスを返す）
+    
+    Args:
+        pokemon_data: ポケモンの基本データ
+        
+    Returns:
+        共有されたプロフィール
+    """
+    profile = SpeciesProfile(
+        name=pokemon_data['name'],
+        owner=pokemon_data['owner'],
+        species=pokemon_data['species'],
+        type=pokemon_data['type'],
+        personality=pokemon_data['personality'],
+        abilities=tuple(pokemon_data['abilities'])
+    )
+    return _PROFILES.setdefault(profile, profile)
 
 
 class PokemonALOs:
-    """個別のポケモンALOsを表現するクラス"""
+    """個別のポケモンALOsを表現するクラス
+    
+    名前や性格などの不変データは SpeciesProfile として種族ごとに共有し、
+    個体ごとには位置や状態だけを __slots__ で保持します。
+    
+    状態が変わるたびに _version を進め、to_dict / to_state の結果は
+    バージョンが変わるまでキャッシュして使い回します。
+    """
+    
+    __slots__ = (
+        "key", "profile", "world", "x", "y", "_hp", "_energy", "_mood",
+        "_abilities", "relationships", "inventory", "_alos_definition", "_action_history",
+        "max_inventory", "_version", "_dict_cache", "_state_cache"
+    )
     
-    def __init__(self, pokemon_key: str, pokemon_data: Dict, alos_definition: Dict = None):
+    def __init__(
+        self,
+        pokemon_key: str,
+        pokemon_data: Dict,
+        alos_definition: Dict = None,
+        world: Optional[WorldConfig] = None,
+        rng: Optional[random.Random] = None
+    ):
         """
         Args:
             pokemon_key: ポケモンの識別キー (pikachu, meowth, sprigatito)
             pokemon_data: ポケモンの基本データ
             alos_definition: ALOsシステムから生成された定義
+            world: 移動できる範囲や境界の扱い（省略時は既定の10×10）
+            rng: 初期位置を決める乱数（省略時はrandomモジュール）
         """
         self.key = pokemon_key
-        self.name = pokemon_data['name']
-        self.owner = pokemon_data['owner']
-        self.species = pokemon_data['species']
-        self.type = pokemon_data['type']
-        self.personality = pokemon_data['personality']
-        self.base_abilities = pokemon_data['abilities']
+        self.profile = intern_profile(pokemon_data)
+        self.world = world or DEFAULT_WORLD
+        
+        # シリアライズ結果のキャッシュ（(バージョン, 結果) の組）
+        self._version = 0
+        self._dict_cache = None
+        self._state_cache = None
         
         # 状態管理
-        self.position = self._random_position()
-        self.hp = 100
-        self.energy = 100
-        self.mood = "normal"  # normal, happy, angry, tired, excited
-        self.current_abilities = self.base_abilities.copy()
-        self.relationships = {}  # {pokemon_key: friendship_level (-100 to 100)}
+        self.x, self.y = self._random_position(rng)
+        self._hp = 100
+        self._energy = 100
+        self._mood = "normal"  # normal, happy, angry, tired, excited
+        self._abilities = self.profile.abilities  # 新しい技を覚えるまではプロフィールと共有
+        self.relationships = {}  # {pokemon_key: friendship_level (-100 to 100)}（エンジンに参加すると行列のビューになる）
         self.inventory = []  # 持っているアイテム
-        self.max_inventory = 3  # 最大所持数
+        self.max_inventory = 3  # 最大所持数（個体ごとに変更できる）
         
         # ALOs定義
-        self.alos_definition = alos_definition or {}
+        self._alos_definition = alos_definition
         
-        # 履歴
-        self.action_history = []
+        # 履歴（最初の行動を記録するまで作らない）
+        self._action_history = None
+    
+    @property
+    def name(self) -> str:
+        return self.profile.name
+    
+    @property
+    def owner(self) -> str:
+        return self.profile.owner
+    
+    @property
+    def species(self) -> str:
+        return self.profile.species
+    
+    @property
+    def type(self) -> str:
+        return self.profile.type
+    
+    @property
+    def personality(self) -> str:
+        return self.profile.personality
+    
+    @property
+    def base_abilities(self) -> Tuple[str, ...]:
+        return self.profile.abilities
+    
+    @property
+    def current_abilities(self) -> Tuple[str, ...]:
+        """現在覚えている技（読み取り専用のタプル。技を増やす場合は learn_move を使う）"""
+        return self._abilities
+    
+    @property
+    def alos_definition(self) -> Dict:
+        """ALOsシステムから生成された定義
         
-    def _random_position(self) -> Tuple[float, float]:
-        """ランダムな初期位置を生成 (0-10の範囲)"""
-        return (random.uniform(0, 10), random.uniform(0, 10))
+        未設定の個体は最初に参照した時に空の辞書を作って保持するので、
+        返した辞書への書き込みは失われません（参照されるまでは辞書を持たない）。
+        """
+        if self._alos_definition is None:
+            self._alos_definition = {}
+        return self._alos_definition
+    
+    @alos_definition.setter
+    def alos_definition(self, value: Optional[Dict]):
+        self._alos_definition = value
+        self._version += 1
+    
+    @property
+    def position(self) -> Tuple[float, float]:
+        """現在の位置 (x, y)"""
+        return (self.x, self.y)
+    
+    @position.setter
+    def position(self, value: Tuple[float, float]):
+        self.x, self.y = value
+        self._version += 1
+    
+    @property
+    def hp(self) -> int:
+        return self._hp
+    
+    @hp.setter
+    def hp(self, value: int):
+        if value != self._hp:
+            self._hp = value
+            self._version += 1
+    
+    @property
+    def energy(self) -> int:
+        return self._energy
+    
+    @energy.setter
+    def energy(self, value: int):
+        if value != self._energy:
+            self._energy = value
+            self._version += 1
+    
+    @property
+    def mood(self) -> str:
+        return self._mood
+    
+    @mood.setter
+    def mood(self, value: str):
+        if value != self._mood:
+            self._mood = value
+            self._version += 1
+    
+    def mark_dirty(self):
+        """状態が変わったことを記録し、キャッシュ済みの出力を無効にする"""
+        self._version += 1
+    
+    def _random_position(self, rng: Optional[random.Random] = None) -> Tuple[float, float]:
+        """ワールド内のランダムな初期位置を生成"""
+        return self.world.random_position(rng)
+    
+    def attach_world(self, world: WorldConfig, rng: Optional[random.Random] = None):
+        """
+        ワールドを切り替える
+        
+        範囲が変わる場合は、新しいワールド内のランダムな位置に置き直します。
+        
+        Args:
+            world: 新しいワールドの設定
+            rng: 置き直す位置を決める乱数（省略時はrandomモジュール）
+        """
+        if world.size != self.world.size:
+            self.world = world
+            self.x, self.y = self._random_position(rng)
+        else:
+            self.world = world
+            self.x, self.y = world.confine(self.x, self.y)
+        self._version += 1
     
     def update_position(self, dx: float, dy: float):
-        """位置を更新（境界チェック付き）"""
-        x, y = self.position
-        x = max(0, min(10, x + dx))
-        y = max(0, min(10, y + dy))
-        self.position = (x, y)
+        """位置を更新（境界の扱いはワールドの設定に従う）"""
+        self.x, self.y = self.world.confine(self.x + dx, self.y + dy)
+        self._version += 1
     
     def move_towards(self, target_pos: Tuple[float, float], speed: float = 0.3):
         """ターゲット位置に向かって移動"""
-        x, y = self.position
         tx, ty = target_pos
         
-        dx = tx - x
-        dy = ty - y
-        dist = np.sqrt(dx**2 + dy**2)
+        dx, dy = self.world.delta(self.x, self.y, tx, ty)
+        dist = math.hypot(dx, dy)
         
         if dist > 0:
             dx = (dx / dist) * speed
@@ -67,29 +245,26 @@ class PokemonALOs:
     
     def move_away(self, target_pos: Tuple[float, float], speed: float = 0.3):
         """ターゲット位置から離れる"""
-        x, y = self.position
         tx, ty = target_pos
         
-        dx = x - tx
-        dy = y - ty
-        dist = np.sqrt(dx**2 + dy**2)
+        dx, dy = self.world.delta(tx, ty, self.x, self.y)
+        dist = math.hypot(dx, dy)
         
         if dist > 0:
             dx = (dx / dist) * speed
             dy = (dy / dist) * speed
             self.update_position(dx, dy)
     
-    def random_walk(self, speed: float = 0.2):
-        """ランダムに移動"""
-        dx = random.uniform(-speed, speed)
-        dy = random.uniform(-speed, speed)
+    def random_walk(self, speed: float = 0.2, rng: Optional[random.Random] = None):
+        """ランダムに移動（rng を省略するとrandomモジュールを使う）"""
+        rng = rng or random
+        dx = rng.uniform(-speed, speed)
+        dy = rng.uniform(-speed, speed)
         self.update_position(dx, dy)
     
     def distance_to(self, other: 'PokemonALOs') -> float:
         """他のポケモンまでの距離を計算"""
-        x1, y1 = self.position
-        x2, y2 = other.position
-        return np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
+        return self.world.distance(self.x, self.y, other.x, other.y)
     
     def take_damage(self, damage: int):
         """ダメージを受ける"""
@@ -115,25 +290,46 @@ class PokemonALOs:
     
     def learn_move(self, move_name: str):
         """新しい技を覚える"""
-        if move_name not in self.current_abilities:
-            self.current_abilities.append(move_name)
+        if move_name not in self._abilities:
+            self._abilities = self._abilities + (move_name,)
             self.mood = "excited"
+            self._version += 1
     
     def update_relationship(self, other_key: str, change: int):
         """他のポケモンとの関係性を更新"""
         current = self.relationships.get(other_key, 0)
         self.relationships[other_key] = max(-100, min(100, current + change))
+        self._version += 1
+    
+    def attach_relationships(self, view):
+        """
+        関係性の保存先を外部の行列のビューに切り替える
+        
+        これまでの関係性はビューにコピーされます。
+        
+        Args:
+            view: {相手のキー: 関係性} として使えるビュー（RelationshipView）
+        """
+        for other_key, value in self.relationships.items():
+            view[other_key] = value
+        self.relationships = view
+        self._version += 1
     
     def get_relationship(self, other_key: str) -> int:
         """他のポケモンとの関係性を取得"""
         return self.relationships.get(other_key, 0)
     
+    @property
+    def action_history(self):
+        """行動履歴（古い順）"""
+        return self._action_history if self._action_history is not None else ()
+    
     def add_action(self, action: Dict):
         """行動履歴に追加"""
-        self.action_history.append(action)
-        # 履歴は最大50件まで
-        if len(self.action_history) > 50:
-            self.action_history.pop(0)
+        # 履歴は最大50件まで（リングバッファ）
+        if self._action_history is None:
+            self._action_history = deque(maxlen=50)
+        self._action_history.append(action)
     
     def add_item(self, item) -> bool:
         """
@@ -147,6 +343,7 @@ class PokemonALOs:
         """
         if len(self.inventory) < self.max_inventory:
             self.inventory.append(item)
+            self._version += 1
             return True
         return False
     
@@ -162,6 +359,7 @@ class PokemonALOs:
         """
         if 0 <= item_index < len(self.inventory):
             item = self.inventory.pop(item_index)
+            self._version += 1
             return item.use(self)
         return None
     
@@ -192,9 +390,59 @@ class PokemonALOs:
         
         return None
     
-    def to_dict(self) -> Dict:
-        """ALOsを辞書形式で出力"""
+    def export_state(self) -> Dict:
+        """
+        チェックポイント用に、個体の状態を組み込み型だけの辞書で出力
+        
+        関係性はエンジンの RelationshipMatrix がまとめて保存するので含みません。
+        
+        Returns:
+            from_state / restore_state で復元できる辞書
+        """
         return {
+            "key": self.key,
+            "profile": self.profile._asdict(),
+            "alos_definition": self._alos_definition,
+            "position": (self.x, self.y),
+            "hp": self._hp,
+            "energy": self._energy,
+            "mood": self._mood,
+            "abilities": self._abilities,
+            "inventory": [item.to_record() for item in self.inventory],
+            "max_inventory": self.max_inventory,
+            "action_history": list(self._action_history) if self._action_history is not None else None
+        }
+    
+    @classmethod
+    def from_state(cls, state: Dict, world: Optional[WorldConfig] = None) -> 'PokemonALOs':
+        """export_state の出力から個体を作り直す（ALOs定義は生成し直さない）"""
+        pokemon = cls(state["key"], state["profile"], state["alos_definition"], world=world)
+        pokemon.restore_state(state)
+        return pokemon
+    
+    def restore_state(self, state: Dict):
+        """export_state の出力から位置や状態を戻す"""
+        self.x, self.y = state["position"]
+        self._hp = state["hp"]
+        self._energy = state["energy"]
+        self._mood = state["mood"]
+        abilities = tuple(state["abilities"])
+        self._abilities = self.profile.abilities if abilities == self.profile.abilities else abilities
+        self.inventory = [Item.from_record(record) for record in state["inventory"]]
+        self.max_inventory = state["max_inventory"]
+        history = state["action_history"]
+        self._action_history = deque(history, maxlen=50) if history is not None else None
+        self._version += 1
+    
+    def to_dict(self) -> Dict:
+        """ALOsを辞書形式で出力
+        
+        状態が変わるまでは同じ辞書を返すので、呼び出し側で変更しないこと。
+        """
+        if self._dict_cache is not None and self._dict_cache[0] == self._version:
+            return self._dict_cache[1]
+        
+        result = {
             "mainObj": self.name,
             "key": self.key,
             "subObjList": {
@@ -205,43 +453,56 @@ class PokemonALOs:
                 },
                 "behavior": {
                     "personality": self.personality,
-                    "mood": self.mood
+                    "mood": self._mood
                 },
                 "skills": {
-                    "abilities": self.current_abilities
+                    "abilities": self._abilities
                 },
                 "state": {
-                    "hp": self.hp,
-                    "energy": self.energy,
-                    "position": self.position
+                    "hp": self._hp,
+                    "energy": self._energy,
+                    "position": (self.x, self.y)
                 },
-                "relationships": self.relationships
+                "relationships": dict(self.relationships)
             },
             "alos_definition": self.alos_definition
         }
+        self._dict_cache = (self._version, result)
+        return result
+    
+    def to_state(self) -> Dict:
+        """可視化用の状態を辞書形式で出力（to_dictと同様にキャッシュされる）"""
+        if self._state_cache is not None and self._state_cache[0] == self._version:
+            return self._state_cache[1]
+        
+        result = {
+            "name": self.name,
+            "species": self.species,
+            "position": (self.x, self.y),
+            "hp": self._hp,
+            "energy": self._energy,
+            "mood": self._mood,
+            "color": self.get_mood_color(),
+            "relationships": dict(self.relationships),
+            "abilities": self._abilities,
+            "inventory": [
+                {"name": item.name, "emoji": item.get_emoji()}
+                for item in self.inventory
+            ]
+        }
+        self._state_cache = (self._version, result)
+        return result
     
     def get_color(self) -> str:
         """ポケモンのタイプに基づいた色を返す（可視化用）"""
-        type_colors = {
-            "でんき": "yellow",
-            "ノーマル": "gray",
-            "くさ": "green"
-        }
-        return type_colors.get(self.type, "gray")
+        return TYPE_COLORS.get(self.type, "gray")
     
     def get_mood_color(self) -> Tuple[float, float, float]:
         """ポケモンごとの固定色を返す（RGB, 0-1の範囲）
         
         HPに応じて明度が変化します
         """
-        # ポケモンごとの基本色（RGB, 0-1の範囲）
-        pokemon_colors = {
-            "pikachu": (1.0, 0.9, 0.0),      # 黄色（ピカチュウ）
-            "meowth": (0.7, 0.7, 0.7),       # 灰色（ニャース）
-            "sprigatito": (0.2, 0.8, 0.3)    # 緑（ニャオハ）
-        }
-        
-        base_color = pokemon_colors.get(self.key, (0.5, 0.5, 0.5))
+        base_color = POKEMON_COLORS.get(self.key, (0.5, 0.5, 0.5))
         
         # HPに基づいて明度を調整（HPが低いと暗くなる）
         hp_factor = max(0.3, self.hp / 100.0)  # 最低でも30%の明度を保つ
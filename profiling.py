@@ -0,0 +1,272 @@
+"""
+プロファイラー: シミュレーションのステップをフェーズごとに計測する
+"""
+import cProfile
+import io
+import json
+import math
+import pstats
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+# ステップのフェーズ（表示順）
+PHASES = ("spawn", "pairs", "rag", "llm", "individual", "pickups", "random_events")
+
+# 無効時に返す何もしないコンテキスト（使い回す）
+_NULL_CONTEXT = nullcontext()
+
+
+class PhaseHistogram:
+    """1ステップあたりの所要時間を2のべき乗のバケットで数えるヒストグラム
+    
+    バケット k には 2^(k-1) 以上 2^k 未満マイクロ秒の値が入ります。
+    """
+    
+    __slots__ = ("buckets", "count", "total", "max", "calls")
+    
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0       # 記録したステップ数
+        self.total = 0.0     # 合計時間（秒）
+        self.max = 0.0       # 最大時間（秒）
+        self.calls = 0       # フェーズに入った回数の合計
+    
+    def add(self, seconds: float, calls: int = 1):
+        """1ステップ分の時間を記録"""
+        bucket = math.frexp(seconds * 1e6)[1]
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.calls += calls
+        if seconds > self.max:
+            self.max = seconds
+    
+    def percentile(self, p: float) -> float:
+        """パーセンタイルの近似値（バケットの上限, マイクロ秒）"""
+        if self.count == 0:
+            return 0.0
+        rank = self.count * p / 100.0
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(float(2 ** bucket), self.max * 1e6)
+        return self.max * 1e6
+    
+    def to_dict(self) -> Dict:
+        """統計を辞書形式で出力"""
+        return {
+            "steps": self.count,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_us": round(self.total / self.count * 1e6, 1) if self.count else 0.0,
+            "p50_us": round(self.percentile(50), 1),
+            "p90_us": round(self.percentile(90), 1),
+            "p99_us": round(self.percentile(99), 1),
+            "max_us": round(self.max * 1e6, 1),
+            "histogram_us": {f"<{2 ** k}": n for k, n in sorted(self.buckets.items())}
+        }
+
+
+class PhaseProfiler:
+    """ステップをフェーズごとに計測するプロファイラー
+    
+    フェーズは入れ子にでき、各フェーズには自分自身の時間だけを計上します
+    （バトル中のRAGやLLMの時間は pairs ではなく rag / llm に入る）。
+    無効の間は phase() が何もしないコンテキストを返すだけなので、
+    実行中にいつでも有効・無効を切り替えられます。
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = False,
+        report_every: int = 0,
+        report_path: Optional[str] = None,
+        echo: bool = True
+    ):
+        """
+        Args:
+            enabled: 計測を有効にするかどうか
+            report_every: このステップ数ごとにレポートを出す（0なら出さない）
+            report_path: レポートをJSONLで追記するファイル（Noneならコンソールのみ）
+            echo: 定期レポートをコンソールに表示するかどうか
+        """
+        self.enabled = enabled
+        self.report_every = report_every
+        self.report_path = report_path
+        self.echo = echo
+        
+        self.histograms: Dict[str, PhaseHistogram] = {}
+        self.step_histogram = PhaseHistogram()
+        self.steps = 0
+        
+        self._stack: List[List] = []  # [フェーズ名, 開始時刻, 子フェーズの時間]
+        self._step_times: Dict[str, float] = {}
+        self._step_calls: Dict[str, int] = {}
+        self._step_start: Optional[float] = None
+        
+        # cProfileで計測するステップの範囲
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._cprofile_window: Optional[tuple] = None  # (開始ステップ, 終了ステップ, 出力先)
+    
+    def reset(self):
+        """これまでの統計を捨てる"""
+        self.histograms.clear()
+        self.step_histogram = PhaseHistogram()
+        self.steps = 0
+    
+    def phase(self, name: str):
+        """
+        フェーズを計測するコンテキスト
+        
+        Args:
+            name: フェーズ名（PHASES のいずれか）
+        
+        Returns:
+            with 文で使うコンテキスト
+        """
+        if not self.enabled or self._step_start is None:
+            return _NULL_CONTEXT
+        return _PhaseTimer(self, name)
+    
+    def _enter(self, name: str):
+        self._stack.append([name, time.perf_counter(), 0.0])
+    
+    def _exit(self):
+        name, start, children = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self._step_times[name] = self._step_times.get(name, 0.0) + (elapsed - children)
+        self._step_calls[name] = self._step_calls.get(name, 0) + 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+    
+    def profile_steps(self, start_step: int, n_steps: int, output: str):
+        """
+        指定したステップの範囲をcProfileで計測し、終わったら結果を書き出す
+        
+        Args:
+            start_step: 計測を始めるステップ（1始まりのステップ数）
+            n_steps: 計測するステップ数
+            output: pstats形式で書き出すファイル（snakevizなどで開ける）
+        """
+        self._cprofile_window = (start_step, start_step + n_steps - 1, output)
+    
+    def begin_step(self, step: int):
+        """ステップの開始（SimulationEngine.step から呼ばれる）"""
+        window = self._cprofile_window
+        if window is not None and self._cprofile is None and window[0] <= step <= window[1]:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        
+        if not self.enabled:
+            self._step_start = None
+            return
+        self._stack.clear()
+        self._step_times.clear()
+        self._step_calls.clear()
+        self._step_start = time.perf_counter()
+    
+    def end_step(self, step: int):
+        """ステップの終了（SimulationEngine.step から呼ばれる）"""
+        if self._step_start is not None:
+            self.step_histogram.add(time.perf_counter() - self._step_start)
+            for name, seconds in self._step_times.items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = PhaseHistogram()
+                histogram.add(seconds, self._step_calls.get(name, 1))
+            self._step_start = None
+            self.steps += 1
+            
+            if self.report_every and self.steps % self.report_every == 0:
+                self.report(step)
+        
+        window = self._cprofile_window
+        if self._cprofile is not None and step >= window[1]:
+            self._cprofile.disable()
+            self._dump_cprofile(self._cprofile, window)
+            self._cprofile = None
+            self._cprofile_window = None
+    
+    def _dump_cprofile(self, profile: cProfile.Profile, window: tuple):
+        """cProfileの結果を書き出し、累積時間の上位を表示"""
+        start, end, output = window
+        profile.dump_stats(output)
+        buffer = io.StringIO()
+        pstats.Stats(profile, stream=buffer).sort_stats("cumulative").print_stats(15)
+        print(f"\n🔬 ステップ {start}〜{end} のプロファイルを保存しました: {output}")
+        print(buffer.getvalue())
+    
+    def get_stats(self) -> Dict:
+        """
+        フェーズごとの統計を取得
+        
+        Returns:
+            計測したステップ数、ステップ全体の統計、フェーズごとの統計と時間の割合
+        """
+        step_total = self.step_histogram.total
+        phases = {}
+        names = [name for name in PHASES if name in self.histograms]
+        names += [name for name in self.histograms if name not in PHASES]
+        for name in names:
+            stats = self.histograms[name].to_dict()
+            stats["share"] = round(self.histograms[name].total / step_total, 4) if step_total > 0 else 0.0
+            phases[name] = stats
+        
+        accounted = sum(h.total for h in self.histograms.values())
+        return {
+            "steps": self.steps,
+            "step": self.step_histogram.to_dict(),
+            "phases": phases,
+            # どのフェーズにも入らない時間（ループのオーバーヘッドやイベントの記録など）
+            "other_share": round(1.0 - accounted / step_total, 4) if step_total > 0 else 0.0
+        }
+    
+    def report(self, step: Optional[int] = None):
+        """統計をコンソールに表示し、設定されていればJSONLに追記"""
+        stats = self.get_stats()
+        if self.report_path:
+            with open(self.report_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"step": step, "time": time.time(), **stats}, ensure_ascii=False) + "\n")
+        if self.echo:
+            print(format_phase_stats(stats, step))
+
+
+class _PhaseTimer:
+    """PhaseProfiler.phase() が返す計測用のコンテキスト"""
+    
+    __slots__ = ("profiler", "name")
+    
+    def __init__(self, profiler: PhaseProfiler, name: str):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.profiler._enter(self.name)
+        return self
+    
+    def __exit__(self, *exc):
+        self.profiler._exit()
+        return False
+
+
+def format_phase_stats(stats: Dict, step: Optional[int] = None) -> str:
+    """get_stats() の結果を表形式の文字列にする"""
+    step_stats = stats["step"]
+    title = f"ステップ {step} 時点" if step is not None else "最終"
+    lines = [
+        f"\n⏱️  フェーズ別の所要時間（{title}, {stats['steps']}ステップ, "
+        f"平均 {step_stats['mean_us'] / 1000:.2f} ms/ステップ）"
+    ]
+    # 全角文字を含むと桁がずれるので、表の見出しは半角にする
+    lines.append(f"  {'phase':<14}{'share':>7}{'mean':>11}{'p50':>11}{'p99':>11}{'max':>11}{'calls/step':>14}")
+    for name, phase in stats["phases"].items():
+        calls = phase["calls"] / phase["steps"] if phase["steps"] else 0.0
+        lines.append(
+            f"  {name:<14}{phase['share'] * 100:>6.1f}%"
+            f"{phase['mean_us'] / 1000:>9.2f}ms{phase['p50_us'] / 1000:>9.2f}ms"
+            f"{phase['p99_us'] / 1000:>9.2f}ms{phase['max_us'] / 1000:>9.2f}ms{calls:>14.1f}"
+        )
+    lines.append(f"  {'(other)':<14}{stats['other_share'] * 100:>6.1f}%")
+    return "\n".join(lines)
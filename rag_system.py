@@ -3,24 +3,71 @@ RAGシステム: ポケモンのコンテクストデータを管理
 """
 import json
 import os
-from typing import List, Dict, Optional
-import chromadb
-from chromadb.config import Settings
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+from lexical_index import BigramBM25Index
+
+# ChromaDBのデフォルト埋め込みモデル（キャッシュキーに使用）
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# 検索モード
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
 
 
 class PokemonRAG:
     """ポケモンのコンテクスト情報をRAGで管理するクラス"""
     
-    def __init__(self, context_file: str = "pokemon_context.json", use_rag: bool = True):
+    def __init__(
+        self,
+        context_file: str = "pokemon_context.json",
+        use_rag: bool = True,
+        embedding_cache_dir: Optional[str] = ".rag_cache",
+        retrieval_mode: str = "vector",
+        hybrid_candidates: int = 20
+    ):
         """
         Args:
             context_file: コンテクストデータのJSONファイルパス
             use_rag: RAGを使用するかどうか
+            embedding_cache_dir: 埋め込みキャッシュの保存先（Noneでキャッシュしない）
+            retrieval_mode: 検索モード
+                vector: ベクトル検索（ChromaDB）
+                lexical: 文字バイグラムのBM25検索（埋め込みモデル不要）
+                hybrid: BM25で候補を絞り込んでからベクトルで並べ替え
+            hybrid_candidates: hybridモードでBM25が残す候補数
         """
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"未知の検索モード: {retrieval_mode}")
+        
         self.use_rag = use_rag
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_candidates = hybrid_candidates
         self.context_data = self._load_context(context_file)
+        self.embedding_cache = None
+        self.lexical_index = None
         
         if self.use_rag:
+            self.documents, self.metadatas, self.ids = self._build_documents()
+            
+            # 語彙インデックス（lexical/hybridモード）
+            if self.retrieval_mode != "vector":
+                self.lexical_index = BigramBM25Index(self.documents)
+        
+        if self.use_rag and self.retrieval_mode != "lexical":
+            # ChromaDBは読み込みが重いので、ベクトル検索を使う場合だけimportする
+            import chromadb
+            from chromadb.config import Settings
+            from chromadb.utils import embedding_functions
+            
+            # 埋め込み関数（クエリ時にも同じものを使う）
+            self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            if embedding_cache_dir:
+                self.embedding_cache = EmbeddingCache(
+                    embedding_cache_dir, DEFAULT_EMBEDDING_MODEL
+                )
+            
             # ChromaDBクライアントの初期化
             self.client = chromadb.Client(Settings(
                 anonymized_telemetry=False,
@@ -35,7 +82,8 @@ class PokemonRAG:
             
             self.collection = self.client.create_collection(
                 name="pokemon_context",
-                metadata={"description": "Pokemon context data"}
+                metadata={"description": "Pokemon context data"},
+                embedding_function=self.embedding_function
             )
             
             # コンテクストデータをベクトルDBに追加
@@ -46,8 +94,8 @@ class PokemonRAG:
         with open(context_file, 'r', encoding='utf-8') as f:
             return json.load(f)
     
-    def _index_context(self):
-        """コンテクストデータをベクトルDBにインデックス化"""
+    def _build_documents(self) -> Tuple[List[str], List[Dict], List[str]]:
+        """インデックス対象のドキュメント、メタデータ、IDを構築"""
         documents = []
         metadatas = []
         ids = []
@@ -109,13 +157,36 @@ class PokemonRAG:
             ids.append(f"scenario_{idx}")
             idx += 1
         
-        # ベクトルDBに追加
+        return documents, metadatas, ids
+    
+    def _embed_documents(self, documents: List[str]) -> List:
+        """ドキュメントを埋め込む（キャッシュ済みのものは再計算しない）"""
+        if self.embedding_cache is None:
+            return self.embedding_function(documents)
+        return self.embedding_cache.embed(documents, self.embedding_function)
+    
+    def _index_context(self):
+        """コンテクストデータをベクトルDBにインデックス化"""
+        embeddings = self._embed_documents(self.documents)
+        
+        # hybridモードの並べ替え用に正規化した埋め込みを保持
+        if self.retrieval_mode == "hybrid":
+            self.doc_embeddings = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        
+        # ベクトルDBに追加（埋め込みは事前に計算して渡す）
         self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
+            documents=self.documents,
+            embeddings=embeddings,
+            metadatas=self.metadatas,
+            ids=self.ids
         )
     
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """ベクトルをL2正規化"""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+    
     def query_context(self, query: str, n_results: int = 5) -> List[str]:
         """
         クエリに関連するコンテクスト情報を取得
@@ -131,6 +202,14 @@ class PokemonRAG:
             # RAGを使わない場合は、全てのコンテクストを返す（簡略版）
             return self._get_all_context_summary()
         
+        if self.retrieval_mode == "lexical":
+            return self.lexical_index.query(query, n_results)
+        
+        if self.retrieval_mode == "hybrid":
+            candidates = self.lexical_index.search(query, max(n_results, self.hybrid_candidates))
+            if candidates:
+                return self._rerank(query, [i for i, _ in candidates], n_results)
+        
         results = self.collection.query(
             query_texts=[query],
             n_results=n_results
@@ -138,6 +217,15 @@ class PokemonRAG:
         
         return results['documents'][0] if results['documents'] else []
     
+    def _rerank(self, query: str, candidates: List[int], n_results: int) -> List[str]:
+        """BM25の候補をクエリとのコサイン類似度で並べ替え"""
+        query_vec = self._normalize(
+            np.asarray(self.embedding_function([query]), dtype=np.float32)
+        )[0]
+        similarities = self.doc_embeddings[candidates] @ query_vec
+        order = np.argsort(-similarities, kind="stable")[:n_results]
+        return [self.documents[candidates[i]] for i in order]
+    
     def _get_all_context_summary(self) -> List[str]:
         """RAGを使わない場合の簡易コンテクスト情報"""
         summary = []
@@ -0,0 +1,85 @@
+"""
+ラスタライザー: ポケモンの座標と色の配列をグリッド画像に描き込む
+"""
+from typing import Tuple
+import numpy as np
+
+
+class GridRasterizer:
+    """座標と色の配列から、各ポケモンを正方形のスタンプとしてグリッドに描くクラス
+    
+    バッファは1つだけ確保して毎フレーム使い回し、
+    全ポケモンのスタンプをまとめてファンシーインデックスで書き込みます。
+    """
+    
+    def __init__(
+        self,
+        grid_size: int,
+        field_size: Tuple[float, float] = (10.0, 10.0),
+        stamp_radius: int = 1,
+        accumulate: bool = False,
+        alpha: float = 0.5
+    ):
+        """
+        Args:
+            grid_size: グリッドの1辺のセル数
+            field_size: フィールドの大きさ (幅, 高さ)
+            stamp_radius: スタンプの半径（1なら3×3）
+            accumulate: 重なったスタンプの色を足し合わせるかどうか（Falseなら後のポケモンで上書き）
+            alpha: accumulate時に1つのスタンプが加える色の割合
+        """
+        self.grid_size = grid_size
+        self.field_size = field_size
+        self.accumulate = accumulate
+        self.alpha = alpha
+        
+        self.buffer = np.zeros((grid_size, grid_size, 3), dtype=np.float32)
+        self._flat = self.buffer.reshape(-1, 3)
+        
+        # スタンプ内のオフセット（ポケモンごとに dx の外側、dy の内側の順）
+        offsets = np.arange(-stamp_radius, stamp_radius + 1)
+        self._dx = np.repeat(offsets, len(offsets))
+        self._dy = np.tile(offsets, len(offsets))
+    
+    def to_cells(self, positions) -> Tuple[np.ndarray, np.ndarray]:
+        """フィールドの座標をグリッドのセル座標 (x, y) に変換"""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        scale = self.grid_size / np.asarray(self.field_size, dtype=float)
+        cells = (positions * scale).astype(np.int64)
+        np.clip(cells, 0, self.grid_size - 1, out=cells)
+        return cells[:, 0], cells[:, 1]
+    
+    def rasterize(self, positions, colors) -> np.ndarray:
+        """
+        ポケモンをグリッドに描き込む
+        
+        Args:
+            positions: 座標の配列 (N, 2)
+            colors: RGB (0-1) の配列 (N, 3)
+        
+        Returns:
+            描き込んだバッファ (grid_size, grid_size, 3)（次の呼び出しで上書きされる）
+        """
+        self.buffer.fill(0.0)
+        
+        x, y = self.to_cells(positions)
+        if len(x) == 0:
+            return self.buffer
+        colors = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+        
+        # 全ポケモン×スタンプ内の全セル (N, K)
+        nx = x[:, None] + self._dx[None, :]
+        ny = y[:, None] + self._dy[None, :]
+        inside = (nx >= 0) & (nx < self.grid_size) & (ny >= 0) & (ny < self.grid_size)
+        
+        flat_index = (ny * self.grid_size + nx)[inside]
+        stamp_colors = np.broadcast_to(colors[:, None, :], nx.shape + (3,))[inside]
+        
+        if self.accumulate:
+            np.add.at(self._flat, flat_index, stamp_colors * self.alpha)
+            np.minimum(self.buffer, 1.0, out=self.buffer)
+        else:
+            # 同じセルへの書き込みは後のものが残る
+            self._flat[flat_index] = stamp_colors
+        
+        return self.buffer
@@ -0,0 +1,251 @@
+"""
+関係性マトリクス: 全ポケモン間の関係性をN×Nの行列で管理
+"""
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+
+
+# 関係性のしきい値
+HOSTILE_THRESHOLD = -30     # これ未満なら敵対的
+FRIENDLY_THRESHOLD = 30     # これより大きければ友好的
+CLOSE_FRIEND_THRESHOLD = 50  # これより大きければとても友好的
+
+# 組の関係の分類（interaction_attitudes / awareness_attitudes の値）
+NEUTRAL = 0
+HOSTILE = 1
+FRIENDLY = 2
+CLOSE_FRIEND = 3
+
+
+class RelationshipMatrix:
+    """全ポケモンの関係性をN×Nの行列で保持するクラス
+    
+    values[i, j] は i から見た j への関係性 (-100〜100) です。
+    一度も変化していない組は known[i, j] が False になり、
+    各ポケモンの関係性の辞書には現れません。
+    """
+    
+    MIN = -100
+    MAX = 100
+    
+    def __init__(self, keys: List[str], dtype=np.int8):
+        """
+        Args:
+            keys: ポケモンの識別キーのリスト（行列の並び順）
+            dtype: 関係性の値の型（-100〜100が入る整数型）
+        """
+        self.keys = list(keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        
+        n = len(self.keys)
+        self.values = np.zeros((n, n), dtype=dtype)
+        self.known = np.zeros((n, n), dtype=bool)
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def get(self, i: int, j: int) -> int:
+        """i から見た j への関係性"""
+        return int(self.values[i, j])
+    
+    def set(self, i: int, j: int, value: int):
+        """i から見た j への関係性を設定（範囲内に丸める）"""
+        self.values[i, j] = max(self.MIN, min(self.MAX, value))
+        self.known[i, j] = True
+    
+    def adjust(self, i: int, j: int, change: int):
+        """i から見た j への関係性を変化させる"""
+        self.set(i, j, int(self.values[i, j]) + change)
+    
+    def adjust_pair(self, i: int, j: int, change: int):
+        """i と j の関係性を双方向に同じだけ変化させる"""
+        rows = [i, j]
+        cols = [j, i]
+        updated = self.values[rows, cols].astype(np.int16) + change
+        self.values[rows, cols] = np.clip(updated, self.MIN, self.MAX)
+        self.known[rows, cols] = True
+    
+    def adjust_pairs(self, i, j, change):
+        """複数の組の関係性を双方向にまとめて変化させる（各組は1回だけ含めること）"""
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        rows = np.concatenate([i, j])
+        cols = np.concatenate([j, i])
+        change = np.concatenate([np.broadcast_to(change, i.shape)] * 2)
+        updated = self.values[rows, cols].astype(np.int16) + change
+        self.values[rows, cols] = np.clip(updated, self.MIN, self.MAX)
+        self.known[rows, cols] = True
+    
+    def row(self, i: int) -> 'RelationshipView':
+        """i 番目のポケモンから見た関係性のビュー"""
+        return RelationshipView(self, i)
+    
+    def hostile_mask(self) -> np.ndarray:
+        """どちらかが敵対的な組のマスク"""
+        hostile = self.values < HOSTILE_THRESHOLD
+        return hostile | hostile.T
+    
+    def friendly_mask(self, threshold: int = FRIENDLY_THRESHOLD) -> np.ndarray:
+        """どちらかが threshold より友好的な組のマスク"""
+        friendly = self.values > threshold
+        return friendly | friendly.T
+    
+    def interaction_attitudes(self, i, j) -> np.ndarray:
+        """
+        近接した組ごとの関係をまとめて分類
+        
+        どちらかが敵対的なら HOSTILE、そうでなくどちらかが友好的なら FRIENDLY、
+        それ以外は NEUTRAL になります。
+        
+        Args:
+            i: 組の片方のインデックスの配列
+            j: 組のもう片方のインデックスの配列
+        
+        Returns:
+            組ごとの分類の配列
+        """
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        forward = self.values[i, j]
+        backward = self.values[j, i]
+        hostile = (forward < HOSTILE_THRESHOLD) | (backward < HOSTILE_THRESHOLD)
+        friendly = (forward > FRIENDLY_THRESHOLD) | (backward > FRIENDLY_THRESHOLD)
+        return np.select([hostile, friendly], [HOSTILE, FRIENDLY], NEUTRAL).astype(np.int8)
+    
+    def awareness_attitudes(self, i, j) -> np.ndarray:
+        """
+        中距離の組ごとに、i から見た j への関係をまとめて分類
+        
+        敵対的なら HOSTILE、とても友好的なら CLOSE_FRIEND、それ以外は NEUTRAL になります。
+        
+        Args:
+            i: 見る側のインデックスの配列
+            j: 見られる側のインデックスの配列
+        
+        Returns:
+            組ごとの分類の配列
+        """
+        forward = self.values[np.asarray(i, dtype=np.int64), np.asarray(j, dtype=np.int64)]
+        return np.select(
+            [forward < HOSTILE_THRESHOLD, forward > CLOSE_FRIEND_THRESHOLD],
+            [HOSTILE, CLOSE_FRIEND],
+            NEUTRAL
+        ).astype(np.int8)
+    
+    def most_hostile_pairs(self, k: int = 5) -> List[Tuple[str, str, int]]:
+        """
+        最も敵対的な組を取得
+        
+        Args:
+            k: 取得する組の数
+        
+        Returns:
+            (キー, キー, 双方向の関係性の合計) のリスト（合計の昇順）
+        """
+        # 関係性が一度でも変化した組だけを調べる
+        i, j = np.nonzero(np.triu(self.known | self.known.T, k=1))
+        scores = self.values[i, j].astype(np.int16) + self.values[j, i]
+        candidates = np.nonzero(scores < 0)[0]
+        if len(candidates) == 0:
+            return []
+        
+        top = candidates[np.argsort(scores[candidates], kind="stable")[:k]]
+        return [(self.keys[i[t]], self.keys[j[t]], int(scores[t])) for t in top]
+    
+    def friendship_clusters(self, threshold: int = CLOSE_FRIEND_THRESHOLD) -> List[List[str]]:
+        """
+        友好関係でつながったグループ（2匹以上）を取得
+        
+        友好的な組の辺のリストに対して、ラベルの付け替えとポインタの飛ばしで
+        連結成分を求めます（N×Nの作業配列は作らない）。
+        
+        Args:
+            threshold: 友好関係とみなすしきい値
+        
+        Returns:
+            キーのリストのリスト（大きいグループ順）
+        """
+        n = len(self.keys)
+        if n == 0:
+            return []
+        
+        # どちらかが threshold より友好的なら辺でつなぐ（向きは連結成分に関係しない）
+        i, j = np.nonzero(self.values > threshold)
+        labels = np.arange(n)
+        
+        while len(i):
+            li = labels[i]
+            lj = labels[j]
+            differs = li != lj
+            if not differs.any():
+                break
+            # 辺の両端の根を、小さい方のラベルに付け替える
+            li, lj = li[differs], lj[differs]
+            low = np.minimum(li, lj)
+            np.minimum.at(labels, li, low)
+            np.minimum.at(labels, lj, low)
+            # 各ラベルを根まで飛ばす
+            while True:
+                jumped = labels[labels]
+                if np.array_equal(jumped, labels):
+                    break
+                labels = jumped
+            i, j = i[differs], j[differs]
+        
+        clusters: Dict[int, List[str]] = {}
+        for i, label in enumerate(labels.tolist()):
+            clusters.setdefault(label, []).append(self.keys[i])
+        
+        groups = [members for members in clusters.values() if len(members) > 1]
+        return sorted(groups, key=len, reverse=True)
+    
+    def stats(self) -> Dict[str, int]:
+        """関係性の集計（マスクは対称で対角成分は常にFalseなので、組の数は合計の半分）"""
+        return {
+            "hostile_pairs": int(self.hostile_mask().sum()) // 2,
+            "friendly_pairs": int(self.friendly_mask().sum()) // 2,
+            "close_friend_pairs": int(self.friendly_mask(CLOSE_FRIEND_THRESHOLD).sum()) // 2
+        }
+
+
+class RelationshipView(MutableMapping):
+    """RelationshipMatrix の1行を {相手のキー: 関係性} の辞書として見せるビュー"""
+    
+    __slots__ = ("matrix", "i")
+    
+    def __init__(self, matrix: RelationshipMatrix, i: int):
+        self.matrix = matrix
+        self.i = i
+    
+    def __getitem__(self, key: str) -> int:
+        j = self.matrix.index[key]
+        if not self.matrix.known[self.i, j]:
+            raise KeyError(key)
+        return int(self.matrix.values[self.i, j])
+    
+    def __setitem__(self, key: str, value: int):
+        self.matrix.set(self.i, self.matrix.index[key], value)
+    
+    def __delitem__(self, key: str):
+        j = self.matrix.index[key]
+        if not self.matrix.known[self.i, j]:
+            raise KeyError(key)
+        self.matrix.known[self.i, j] = False
+        self.matrix.values[self.i, j] = 0
+    
+    def __iter__(self) -> Iterator[str]:
+        keys = self.matrix.keys
+        return (keys[j] for j in np.flatnonzero(self.matrix.known[self.i]))
+    
+    def __len__(self) -> int:
+        return int(self.matrix.known[self.i].sum())
+    
+    def get(self, key: str, default=None):
+        j = self.matrix.index.get(key)
+        if j is None or not self.matrix.known[self.i, j]:
+            return default
+        return int(self.matrix.values[self.i, j])
+    
+    def __repr__(self):
+        return f"RelationshipView({dict(self.items())})"
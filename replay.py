@@ -0,0 +1,445 @@
+"""
+記録と再生: 実行をログに記録し、LLMやRAGを呼ばずに全速力で再生する
+
+使い方:
+    python main.py --record run.jsonl.gz [--seed 42] ...    # 記録
+    python replay.py run.jsonl.gz [--steps 500] [--event-log events.jsonl]
+                     [--export replay.mp4 --visualizer simple] [--no-verify]
+
+記録するのはエンジンの乱数シード、ワールドと確率の設定、開始時のポケモン、
+全てのLLMとRAGの応答、ステップごとの判断（インタラクション）と状態のダイジェストです。
+ログはgzipで圧縮したJSONLで、1行が1レコードです。
+
+再生では同じシードでエンジンを作り直し、LLMとRAGの代わりに記録した応答を順番に返します。
+エンジンの判断は全て engine.rng を使うので、同じ応答を返せば同じ実行になります。
+ステップごとにダイジェストを照合し、食い違ったら ReplayDivergence を送出します。
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+from pokemon_alos import PokemonALOs
+from simulation_engine import SimulationEngine
+from world import WorldConfig
+
+# ログの形式のバージョン（互換性のない変更をしたら上げる）
+LOG_VERSION = 1
+
+# 記録して再生時に戻すエンジンの設定
+ENGINE_PARAMS = ("battle_probability", "friendship_probability", "learn_probability", "random_event_probability")
+
+
+class ReplayDivergence(RuntimeError):
+    """再生した実行が記録と食い違った"""
+
+
+class ReplayedLLMError(RuntimeError):
+    """記録時に失敗したLLM呼び出しを再生したときのエラー（エンジンは記録時と同じフォールバックをとる）"""
+
+
+def state_digest(engine: SimulationEngine) -> str:
+    """
+    エンジンの状態のダイジェスト（再生が記録と一致しているかの照合用）
+    
+    位置・HP・エネルギー・気分・技と持ち物の数・関係性・フィールドのアイテム・イベント数から計算します。
+    
+    Args:
+        engine: シミュレーションエンジン
+    
+    Returns:
+        16桁の16進数の文字列
+    """
+    pokemons = list(engine.pokemons.values())
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(np.array([(p.x, p.y, p.hp, p.energy) for p in pokemons], dtype=float).tobytes())
+    digest.update("|".join(
+        f"{p.mood},{len(p.current_abilities)},{len(p.inventory)}" for p in pokemons
+    ).encode("utf-8"))
+    digest.update(engine.relationships.values.tobytes())
+    items = engine.item_manager.items_on_field
+    digest.update(np.array([item.position for item in items], dtype=float).tobytes())
+    digest.update(str(engine.event_count).encode("ascii"))
+    return digest.hexdigest()
+
+
+class RunRecorder:
+    """シミュレーションの実行をgzip圧縮のJSONLに記録する
+    
+    attach するとエンジンのALOsシステムとRAGシステムを記録用のプロキシに差し替え、
+    ステップの終わりに判断と状態のダイジェストを書き出します。
+    """
+    
+    def __init__(self, path: str, flush_every: int = 100):
+        """
+        Args:
+            path: 書き出すログのパス（.jsonl.gz）
+            flush_every: このステップ数ごとにファイルに書き出す（異常終了しても、そこまでは再生できる）
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.engine: Optional[SimulationEngine] = None
+        self.records = 0
+        self._file = None
+    
+    def attach(self, engine: SimulationEngine) -> 'RunRecorder':
+        """
+        エンジンの記録を始める（最初のステップを進める前に呼ぶ）
+        
+        Args:
+            engine: 記録するシミュレーションエンジン
+        
+        Returns:
+            自身
+        """
+        if engine.step_count != 0:
+            raise ValueError("記録はステップを進める前のエンジンにしか付けられません")
+        
+        self.engine = engine
+        self._file = gzip.open(self.path, "wt", encoding="utf-8")
+        self.write({
+            "type": "header",
+            "version": LOG_VERSION,
+            "created": time.time(),
+            "seed": engine.seed,
+            "world": engine.world._asdict(),
+            "params": {name: getattr(engine, name) for name in ENGINE_PARAMS},
+            "spawn_probability": engine.item_manager.spawn_probability,
+            "pokemons": [
+                {
+                    "key": pokemon.key,
+                    "profile": pokemon.profile._asdict(),
+                    "alos_definition": pokemon.alos_definition,
+                    "position": pokemon.position
+                }
+                for pokemon in engine.pokemons.values()
+            ]
+        })
+        
+        engine.alos_system = _RecordingALOsSystem(engine.alos_system, self)
+        engine.rag_system = _RecordingRAG(engine.rag_system, self)
+        engine.add_step_listener(self._on_step)
+        return self
+    
+    def write(self, record: Dict):
+        """1レコードを書き出す"""
+        if self._file is None:
+            return
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.records += 1
+    
+    def _on_step(self, engine: SimulationEngine, step_events: List[str]):
+        """ステップの終わりに判断と状態のダイジェストを書き出す"""
+        self.write({
+            "type": "step",
+            "step": engine.step_count,
+            "decisions": step_events,
+            "events": engine.event_count,
+            "digest": state_digest(engine)
+        })
+        if self.flush_every and engine.step_count % self.flush_every == 0:
+            self._file.flush()
+    
+    def close(self):
+        """終わりのレコードを書き出してファイルを閉じる"""
+        if self._file is None:
+            return
+        self.write({"type": "end", "steps": self.engine.step_count})
+        self._file.close()
+        self._file = None
+
+
+class _RecordingALOsSystem:
+    """ALOsシステムの応答を記録するプロキシ（それ以外の属性は元のシステムに委ねる）"""
+    
+    def __init__(self, inner, recorder: RunRecorder):
+        self.inner = inner
+        self.recorder = recorder
+    
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+    
+    def simulate_interaction(self, pokemons, scenario, context):
+        record = {"type": "llm", "step": self.recorder.engine.step_count, "scenario": scenario}
+        try:
+            result = self.inner.simulate_interaction(pokemons, scenario, context)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            self.recorder.write(record)
+            raise
+        record["result"] = result
+        self.recorder.write(record)
+        return result
+
+
+class _RecordingRAG:
+    """RAGシステムの検索結果を記録するプロキシ（それ以外の属性は元のシステムに委ねる）"""
+    
+    def __init__(self, inner, recorder: RunRecorder):
+        self.inner = inner
+        self.recorder = recorder
+    
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+    
+    def query_context(self, query: str, n_results: int = 5) -> List[str]:
+        result = self.inner.query_context(query, n_results=n_results)
+        self.recorder.write({
+            "type": "rag",
+            "step": self.recorder.engine.step_count,
+            "method": "query_context",
+            "query": query,
+            "result": result
+        })
+        return result
+    
+    def get_interaction_scenarios(self) -> List[str]:
+        result = self.inner.get_interaction_scenarios()
+        self.recorder.write({
+            "type": "rag",
+            "step": self.recorder.engine.step_count,
+            "method": "get_interaction_scenarios",
+            "result": result
+        })
+        return result
+
+
+class RunReplayer:
+    """RunRecorder のログからエンジンを作り直し、記録した応答で再生する
+    
+    ログは先頭から順に1レコードずつ読むので、長い記録でもメモリ使用量は増えません。
+    """
+    
+    def __init__(self, path: str, verify: bool = True):
+        """
+        Args:
+            path: RunRecorder が書き出したログのパス
+            verify: ステップごとに状態のダイジェストを照合するかどうか
+        """
+        self.path = path
+        self.verify = verify
+        self.engine: Optional[SimulationEngine] = None
+        self.failure: Optional[ReplayDivergence] = None
+        
+        self._file = gzip.open(path, "rt", encoding="utf-8")
+        self.header = self._read()
+        if self.header is None or self.header.get("type") != "header":
+            raise ValueError(f"記録のログではありません: {path}")
+        if self.header["version"] != LOG_VERSION:
+            raise ValueError(f"ログのバージョン {self.header['version']} には対応していません（対応: {LOG_VERSION}）")
+        self._next = self._read()
+    
+    def _read(self) -> Optional[Dict]:
+        """次のレコードを読む（ファイルの終わりならNone）"""
+        try:
+            for line in self._file:
+                if line.strip():
+                    return json.loads(line)
+        except (EOFError, json.JSONDecodeError):
+            # 記録中に異常終了したログは途中で切れている（書き出せた所までを再生する）
+            pass
+        return None
+    
+    @property
+    def finished(self) -> bool:
+        """記録したステップを全て再生したかどうか"""
+        return self._next is None or self._next["type"] == "end"
+    
+    def build_engine(self, **engine_kwargs) -> SimulationEngine:
+        """
+        記録した設定とポケモンでエンジンを作る
+        
+        Args:
+            **engine_kwargs: SimulationEngine に渡すその他の引数（echo_events, profiler など）
+        
+        Returns:
+            再生用のシミュレーションエンジン
+        """
+        header = self.header
+        world = WorldConfig(**header["world"]).validate()
+        pokemons = []
+        for entry in header["pokemons"]:
+            pokemon = PokemonALOs(entry["key"], entry["profile"], entry["alos_definition"] or None, world=world)
+            pokemon.position = tuple(entry["position"])
+            pokemons.append(pokemon)
+        
+        engine = SimulationEngine(
+            pokemons,
+            _ReplayALOsSystem(self),
+            _ReplayRAG(self),
+            world=world,
+            seed=header["seed"],
+            **engine_kwargs
+        )
+        for name, value in header["params"].items():
+            setattr(engine, name, value)
+        engine.item_manager.spawn_probability = header["spawn_probability"]
+        engine.add_step_listener(self._on_step)
+        self.engine = engine
+        return engine
+    
+    def take(self, record_type: str, **expected) -> Dict:
+        """
+        次のレコードを取り出す（種類や内容が期待と違えば ReplayDivergence）
+        
+        Args:
+            record_type: 期待するレコードの種類
+            **expected: 一致するはずのフィールドの値
+        
+        Returns:
+            レコード
+        """
+        record = self._next
+        step = self.engine.step_count if self.engine is not None else 0
+        if record is None or record["type"] == "end":
+            raise self._fail(f"ステップ {step}: 記録が終わっているのに {record_type} の呼び出しがありました")
+        if record["type"] != record_type:
+            raise self._fail(f"ステップ {step}: {record['type']} の記録に対して {record_type} の呼び出しがありました")
+        for field, value in expected.items():
+            if record.get(field) != value:
+                raise self._fail(f"ステップ {step}: {field} が記録と違います: {value!r} != {record.get(field)!r}")
+        self._next = self._read()
+        return record
+    
+    def _fail(self, message: str) -> ReplayDivergence:
+        """食い違いを記録して例外を返す（エンジンが握りつぶしても、ステップの終わりに送出し直す）"""
+        error = ReplayDivergence(message)
+        if self.failure is None:
+            self.failure = error
+        return error
+    
+    def _on_step(self, engine: SimulationEngine, step_events: List[str]):
+        """ステップの終わりに記録と照合する"""
+        if self.failure is not None:
+            raise self.failure
+        record = self.take("step", step=engine.step_count)
+        if self.verify and record["digest"] != state_digest(engine):
+            raise self._fail(f"ステップ {engine.step_count}: 状態が記録と食い違いました")
+    
+    def run(self, max_steps: Optional[int] = None, progress_every: int = 0) -> int:
+        """
+        記録の終わり（または max_steps）まで全速力で再生
+        
+        Args:
+            max_steps: 再生する最大のステップ数（Noneなら記録の終わりまで）
+            progress_every: このステップ数ごとに途中経過を表示（0なら表示しない）
+        
+        Returns:
+            再生したステップ数
+        """
+        engine = self.engine or self.build_engine(echo_events=False)
+        steps = 0
+        while not self.finished and (max_steps is None or steps < max_steps):
+            engine.step(include_state=False)
+            steps += 1
+            if progress_every and steps % progress_every == 0:
+                print(f"  ステップ {engine.step_count} を再生")
+        return steps
+    
+    def close(self):
+        """ログを閉じる"""
+        self._file.close()
+
+
+class _ReplayALOsSystem:
+    """記録したLLMの応答を順番に返すALOsシステム"""
+    
+    def __init__(self, replayer: RunReplayer):
+        self.replayer = replayer
+        self.conversation_history = []
+    
+    def simulate_interaction(self, pokemons, scenario, context):
+        record = self.replayer.take("llm", scenario=scenario)
+        if "error" in record:
+            raise ReplayedLLMError(record["error"])
+        return record["result"]
+
+
+class _ReplayRAG:
+    """記録したRAGの検索結果を順番に返すRAGシステム"""
+    
+    def __init__(self, replayer: RunReplayer):
+        self.replayer = replayer
+        self.use_rag = False
+    
+    def query_context(self, query: str, n_results: int = 5) -> List[str]:
+        return self.replayer.take("rag", method="query_context", query=query)["result"]
+    
+    def get_interaction_scenarios(self) -> List[str]:
+        return self.replayer.take("rag", method="get_interaction_scenarios")["result"]
+
+
+def count_recorded_steps(path: str) -> int:
+    """ログに記録されているステップ数（ファイル全体を読む）"""
+    steps = 0
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith('{"type":"step"'):
+                steps += 1
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='記録したシミュレーションを全速力で再生')
+    parser.add_argument('log', type=str, help='main.py --record で記録したログ')
+    parser.add_argument('--steps', type=int, default=None, help='再生する最大のステップ数')
+    parser.add_argument('--no-verify', action='store_true', help='ステップごとの状態の照合をしない')
+    parser.add_argument('--event-log', type=str, default=None, help='再生中の全イベントを書き出すJSONLファイル')
+    parser.add_argument('--export', type=str, default=None,
+                        help='再生を録画する出力先（.mp4などはffmpegで動画、それ以外はPNG連番のディレクトリ）')
+    parser.add_argument('--visualizer', type=str, default='standard', choices=['standard', 'simple'],
+                        help='録画のレイアウト')
+    parser.add_argument('--fps', type=int, default=10, help='録画のフレームレート')
+    parser.add_argument('--workers', type=int, default=None, help='録画のフレームを描画するプロセス数')
+    parser.add_argument('--profile-phases', action='store_true', help='ステップのフェーズごとの所要時間を計測')
+    args = parser.parse_args()
+    
+    replayer = RunReplayer(args.log, verify=not args.no_verify)
+    header = replayer.header
+    world = WorldConfig(**header["world"])
+    print(f"▶️  再生: {args.log}（{len(header['pokemons'])}体, シード {header['seed']}, "
+          f"{world.width:g}×{world.height:g} {world.boundary}）")
+    
+    engine = replayer.build_engine(echo_events=False)
+    engine.set_profiling(args.profile_phases)
+    if args.event_log:
+        from events import JsonlEventSink
+        engine.add_event_sink(JsonlEventSink(args.event_log))
+    
+    started = time.perf_counter()
+    try:
+        if args.export:
+            from export import record_snapshots, export_frames
+            
+            steps = count_recorded_steps(args.log)
+            if args.steps is not None:
+                steps = min(steps, args.steps)
+            snapshots = record_snapshots(engine, steps)
+            elapsed = time.perf_counter() - started
+            print(f"🎞️  {len(snapshots)}フレームを描画中 → {args.export}")
+            frames = export_frames(snapshots, args.export, layout=args.visualizer, fps=args.fps,
+                                   workers=args.workers, world=engine.world)
+            print(f"   ✅ {frames}フレームを書き出しました")
+        else:
+            replayer.run(args.steps, progress_every=0 if args.profile_phases else 1000)
+            elapsed = time.perf_counter() - started
+    except ReplayDivergence as e:
+        print(f"❌ 再生が記録と食い違いました: {e}")
+        sys.exit(1)
+    finally:
+        engine.close()
+        replayer.close()
+    
+    rate = engine.step_count / elapsed if elapsed > 0 else float("inf")
+    print(f"✅ {engine.step_count}ステップを{elapsed:.2f}秒で再生しました（{rate:.0f} ステップ/秒, イベント {engine.event_count}件）")
+    if args.profile_phases:
+        from profiling import format_phase_stats
+        print(format_phase_stats(engine.get_phase_stats()))
+
+
+if __name__ == "__main__":
+    main()
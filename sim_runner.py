@@ -0,0 +1,181 @@
+"""
+シミュレーションランナー: 描画とは独立したスレッドでシミュレーションを進める
+"""
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+from events import SimEvent
+
+
+class StateSnapshot(NamedTuple):
+    """あるステップ終了時点のシミュレーション状態（読み取り専用として扱う）"""
+    step: int                    # ステップ数
+    state: Dict                  # get_simulation_state() の結果
+    events: Tuple[SimEvent, ...]  # 最近のイベント
+    keys: Tuple[str, ...]        # ポケモンのキー（positions の並び順）
+    positions: np.ndarray        # ポケモンの座標 (N, 2)
+    colors: np.ndarray           # ポケモンの色 (N, 3)
+    timestamp: float             # 公開した時刻（time.perf_counter）
+    
+    @property
+    def logs(self) -> List[str]:
+        """表示用のログの行"""
+        return [str(event) for event in self.events]
+
+
+class SimulationRunner:
+    """シミュレーションを固定のティックレートで進め、スナップショットを公開するクラス
+    
+    エンジンを操作するのはランナーのスレッドだけです。
+    ビジュアライザーは latest() や sample() で最新のスナップショットを
+    自分のフレームレートで読み取るので、LLMの応答や描画が遅くても
+    お互いを止めません。
+    """
+    
+    def __init__(
+        self,
+        engine,
+        tick_rate: float = 2.0,
+        max_ticks: Optional[int] = None,
+        event_lines: int = 30
+    ):
+        """
+        Args:
+            engine: シミュレーションエンジン
+            tick_rate: 1秒あたりのステップ数（0なら待たずに全速力で進める）
+            max_ticks: 実行するステップ数の上限（Noneなら stop() まで続ける）
+            event_lines: スナップショットに含める最近のイベントの数
+        """
+        self.engine = engine
+        self.tick_rate = tick_rate
+        self.max_ticks = max_ticks
+        self.event_lines = event_lines
+        self.ticks = 0
+        self.error: Optional[BaseException] = None
+        
+        self._tick_listeners: List[Callable[[StateSnapshot], None]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        # (1つ前, 最新) の組を1回の代入で差し替えるので、読む側はロック不要
+        initial = self._capture()
+        self._snapshots: Tuple[StateSnapshot, StateSnapshot] = (initial, initial)
+    
+    @property
+    def tick_interval(self) -> float:
+        """1ステップあたりの秒数（全速力なら0）"""
+        return 1.0 / self.tick_rate if self.tick_rate > 0 else 0.0
+    
+    @property
+    def running(self) -> bool:
+        """ランナーのスレッドが動いているかどうか"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def add_tick_listener(self, listener: Callable[[StateSnapshot], None]):
+        """
+        ステップごとに呼ばれる関数を追加
+        
+        ランナーのスレッドから呼ばれるので、重い処理は別スレッドに渡すこと。
+        """
+        self._tick_listeners.append(listener)
+    
+    def _capture(self) -> StateSnapshot:
+        """エンジンの現在の状態からスナップショットを作成"""
+        keys, positions, colors = self.engine.get_render_arrays()
+        positions.setflags(write=False)
+        colors.setflags(write=False)
+        
+        return StateSnapshot(
+            step=self.engine.step_count,
+            state=self.engine.get_simulation_state(),
+            events=tuple(self.engine.get_recent_events(self.event_lines)),
+            keys=tuple(keys),
+            positions=positions,
+            colors=colors,
+            timestamp=time.perf_counter()
+        )
+    
+    def start(self):
+        """別スレッドでシミュレーションを開始"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="simulation-runner", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = 5.0):
+        """シミュレーションを止めてスレッドの終了を待つ"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def join(self, timeout: Optional[float] = None):
+        """max_ticks に達するまで待つ"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _run(self):
+        """固定のティックレートでステップを進める"""
+        next_tick = time.perf_counter()
+        
+        while not self._stop_event.is_set():
+            if self.max_ticks is not None and self.ticks >= self.max_ticks:
+                break
+            
+            try:
+                self.engine.step(include_state=False)
+                snapshot = self._capture()
+            except Exception as e:
+                self.error = e
+                print(f"⚠️ シミュレーションが停止しました: {e}")
+                break
+            
+            self._snapshots = (self._snapshots[1], snapshot)
+            self.ticks += 1
+            
+            for listener in self._tick_listeners:
+                listener(snapshot)
+            
+            interval = self.tick_interval
+            if interval > 0:
+                next_tick += interval
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    self._stop_event.wait(delay)
+                else:
+                    # 処理が間に合わなかった分は取り戻そうとせず、今から数え直す
+                    next_tick = time.perf_counter()
+    
+    def latest(self) -> StateSnapshot:
+        """最新のスナップショット"""
+        return self._snapshots[1]
+    
+    def sample(self, interpolate: bool = False, now: Optional[float] = None) -> StateSnapshot:
+        """
+        描画用のスナップショットを取得
+        
+        Args:
+            interpolate: 1つ前と最新のスナップショットの間で座標を補間するかどうか
+                （描画は最大1ステップ分遅れる代わりに、動きが滑らかになる。
+                wrapのフィールドでは端をまたいだ最短の経路で補間する）
+            now: 現在時刻（省略時は time.perf_counter()）
+        
+        Returns:
+            スナップショット（補間した場合は positions だけが差し替わる）
+        """
+        previous, latest = self._snapshots
+        interval = self.tick_interval
+        if not interpolate or previous is latest or interval <= 0:
+            return latest
+        if previous.keys != latest.keys:
+            return latest
+        
+        now = time.perf_counter() if now is None else now
+        t = min(1.0, max(0.0, (now - latest.timestamp) / interval))
+        # wrapのフィールドでは端をまたいだ短い方の向きに補間する（フィールドを横切らない）
+        world = self.engine.world
+        delta = world.delta_array(previous.positions, latest.positions)
+        positions = world.confine_array(previous.positions + delta * t)
+        return latest._replace(positions=positions)
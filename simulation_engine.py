@@ -1,12 +1,24 @@
 """
 シミュレーションエンジン: ポケモンのインタラクションとイベント管理
 """
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
+from collections import deque
+import itertools
 import random
+import time
+import numpy as np
 from pokemon_alos import PokemonALOs
-from alos_system import ALOsSystem
-from rag_system import PokemonRAG
-from items import ItemManager
+from items import ItemManager, SpawnScheduler
+from relationships import RelationshipMatrix, HOSTILE, FRIENDLY, CLOSE_FRIEND
+from events import SimEvent
+from profiling import PhaseProfiler
+from spatial import neighbour_pairs
+from world import WorldConfig, DEFAULT_WORLD
+
+if TYPE_CHECKING:
+    # 型ヒントのためだけに使う（openai/chromadbの読み込みを避ける）
+    from alos_system import ALOsSystem
+    from rag_system import PokemonRAG
 
 
 class SimulationEngine:
@@ -15,25 +27,70 @@ class SimulationEngine:
     def __init__(
         self,
         pokemons: List[PokemonALOs],
-        alos_system: ALOsSystem,
-        rag_system: PokemonRAG
+        alos_system: 'ALOsSystem',
+        rag_system: 'PokemonRAG',
+        echo_events: bool = True,
+        event_log_capacity: int = 200,
+        profiler: Optional[PhaseProfiler] = None,
+        world: Optional[WorldConfig] = None,
+        seed: Optional[int] = None
     ):
         """
         Args:
             pokemons: シミュレーションに参加するポケモンのリスト
             alos_system: ALOsシステム
             rag_system: RAGシステム
+            echo_events: イベントをコンソールに表示するかどうか
+            event_log_capacity: メモリ上に保持するイベントの最大数
+            profiler: ステップのフェーズごとの計測に使うプロファイラー（省略時は無効のものを作る）
+            world: フィールドの大きさ、境界の扱い、インタラクションの距離（省略時は既定の10×10）
+            seed: エンジンの乱数シード（省略時はrandomモジュールから引く）。
+                同じシードと同じLLM/RAGの応答なら、同じ実行が再現される
         """
+        self.world = (world or DEFAULT_WORLD).validate()
+        
+        # エンジン内の判断は全てこの乱数を使う（グローバルなrandomの状態に依存しない）
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        
         self.pokemons = {p.key: p for p in pokemons}
+        for pokemon in self.pokemons.values():
+            if pokemon.world != self.world:
+                pokemon.attach_world(self.world, self.rng)
         self.alos_system = alos_system
         self.rag_system = rag_system
         
         self.step_count = 0
-        self.event_log = []
+        self.event_log = deque(maxlen=event_log_capacity)  # 最近のイベント（SimEvent）のリングバッファ
+        self.echo_events = echo_events
+        self.event_sinks = []  # イベントを受け取るシンク（submit/closeを持つオブジェクト）
+        self.step_listeners = []  # ステップの終わりに listener(engine, step_events) で呼ばれる関数
+        self._event_seq = itertools.count()
         self.current_scenario = None
+        self.profiler = profiler or PhaseProfiler(enabled=False)
         
-        # アイテムマネージャー
-        self.item_manager = ItemManager(field_size=(10.0, 10.0))
+        # 関係性マトリクス（各ポケモンのrelationshipsはこの行列のビューになる）
+        self.relationships = RelationshipMatrix(list(self.pokemons.keys()))
+        for i, pokemon in enumerate(self.pokemons.values()):
+            pokemon.attach_relationships(self.relationships.row(i))
+        
+        # アイテムマネージャー（既定より広いフィールドでは、10×10ごとの領域で同じ密度に出現させる）
+        regions = self.world.item_regions
+        if regions == (1, 1):
+            self.item_manager = ItemManager(field_size=self.world.size, rng=self.rng, wrap=self.world.wraps)
+        else:
+            n_regions = regions[0] * regions[1]
+            scheduler = SpawnScheduler(
+                self.world.size, regions=regions, spawn_rate=0.03, region_cap=5,
+                seed=self.rng.getrandbits(32)
+            )
+            self.item_manager = ItemManager(
+                field_size=self.world.size,
+                max_items_on_field=5 * n_regions,
+                scheduler=scheduler,
+                rng=self.rng,
+                wrap=self.world.wraps
+            )
         
         # イベント確率
         self.battle_probability = 0.15
@@ -41,94 +98,288 @@ class SimulationEngine:
         self.learn_probability = 0.1
         self.random_event_probability = 0.1
     
-    def log_event(self, event: str):
-        """イベントをログに記録"""
-        log_entry = f"[Step {self.step_count}] {event}"
-        self.event_log.append(log_entry)
-        print(log_entry)
-        
-        # ログは最大200件まで
-        if len(self.event_log) > 200:
-            self.event_log.pop(0)
+    def log_event(self, event: str, kind: str = "info") -> SimEvent:
+        """
+        イベントをログに記録
+        
+        Args:
+            event: イベントのメッセージ
+            kind: イベントの種類
+            
+        Returns:
+            記録したイベント
+        """
+        entry = SimEvent(
+            seq=next(self._event_seq),
+            step=self.step_count,
+            message=event,
+            kind=kind,
+            timestamp=time.time()
+        )
+        self.event_log.append(entry)
+        
+        if self.echo_events:
+            print(entry)
+        
+        for sink in self.event_sinks:
+            sink.submit(entry)
+        
+        return entry
+    
+    @property
+    def event_count(self) -> int:
+        """これまでに記録したイベントの総数"""
+        return self.event_log[-1].seq + 1 if self.event_log else 0
+    
+    def add_event_sink(self, sink):
+        """イベントのシンクを追加（JsonlEventSinkなど）"""
+        self.event_sinks.append(sink)
+    
+    def add_step_listener(self, listener):
+        """ステップの終わりに呼ばれる関数を追加（RunRecorderなど）"""
+        self.step_listeners.append(listener)
+    
+    def close(self):
+        """シンクを閉じて残りのイベントを書き出す"""
+        for sink in self.event_sinks:
+            sink.close()
+        self.event_sinks.clear()
+    
+    def get_recent_events(self, n: int = 10) -> List[SimEvent]:
+        """最近のイベントを取得"""
+        start = max(0, len(self.event_log) - n)
+        return list(itertools.islice(self.event_log, start, None))
+    
+    def set_profiling(self, enabled: bool):
+        """ステップのフェーズごとの計測を有効/無効にする（実行中でも切り替え可能）"""
+        self.profiler.enabled = enabled
+    
+    def get_phase_stats(self) -> Dict:
+        """
+        ステップのフェーズごとの所要時間の統計を取得
+        
+        Returns:
+            計測したステップ数、ステップ全体とフェーズごとの統計（PhaseProfiler.get_stats）
+        """
+        return self.profiler.get_stats()
+    
+    def export_state(self) -> Dict:
+        """
+        チェックポイント用に、エンジンの状態を組み込み型だけの辞書で出力
+        
+        ポケモン、関係性、フィールドのアイテム、イベントログ、乱数の状態を含みます。
+        返す値は全てコピーなので、別スレッドで書き出している間にステップを進めても構いません。
+        
+        Returns:
+            restore_state で復元できる辞書
+        """
+        relationships = self.relationships
+        return {
+            "step_count": self.step_count,
+            "seed": self.seed,
+            "rng": self.rng.getstate(),
+            "world": self.world._asdict(),
+            "params": {
+                "battle_probability": self.battle_probability,
+                "friendship_probability": self.friendship_probability,
+                "learn_probability": self.learn_probability,
+                "random_event_probability": self.random_event_probability
+            },
+            "pokemons": [pokemon.export_state() for pokemon in self.pokemons.values()],
+            "relationships": {
+                "keys": list(relationships.keys),
+                "dtype": relationships.values.dtype.str,
+                "values": relationships.values.tobytes(),
+                "known": relationships.known.tobytes()
+            },
+            "items": self.item_manager.export_state(),
+            "events": [tuple(event) for event in self.event_log],
+            "next_event_seq": self.event_count,
+            "current_scenario": self.current_scenario
+        }
+    
+    def restore_state(self, state: Dict):
+        """
+        export_state の出力からエンジンの状態を戻す
+        
+        エンジンは同じポケモン（キーと並び順）とワールドで作っておく必要があります。
+        
+        Args:
+            state: export_state の出力
+        """
+        relationships = state["relationships"]
+        if relationships["keys"] != self.relationships.keys:
+            raise ValueError("チェックポイントとエンジンのポケモンが一致しません")
+        
+        self.step_count = state["step_count"]
+        self.seed = state["seed"]
+        self.rng.setstate(state["rng"])
+        for name, value in state["params"].items():
+            setattr(self, name, value)
+        
+        for pokemon_state in state["pokemons"]:
+            self.pokemons[pokemon_state["key"]].restore_state(pokemon_state)
+        
+        shape = self.relationships.values.shape
+        self.relationships.values[...] = np.frombuffer(relationships["values"], dtype=relationships["dtype"]).reshape(shape)
+        self.relationships.known[...] = np.frombuffer(relationships["known"], dtype=bool).reshape(shape)
+        for pokemon in self.pokemons.values():
+            pokemon.mark_dirty()
+        
+        self.item_manager.restore_state(state["items"])
+        
+        self.event_log.clear()
+        self.event_log.extend(SimEvent(*event) for event in state["events"])
+        self._event_seq = itertools.count(state["next_event_seq"])
+        self.current_scenario = state["current_scenario"]
     
     def get_recent_logs(self, n: int = 10) -> List[str]:
         """最近のログを取得"""
-        return self.event_log[-n:]
+        return [str(entry) for entry in self.get_recent_events(n)]
     
-    def step(self) -> Dict:
-        """シミュレーションの1ステップを実行"""
+    def step(self, include_state: bool = True) -> Dict:
+        """
+        シミュレーションの1ステップを実行
+        
+        Args:
+            include_state: 戻り値に全ポケモンの状態 (pokemons_state) を含めるかどうか
+            
+        Returns:
+            ステップ数、イベント、（include_stateがTrueなら）全ポケモンの状態
+        """
         self.step_count += 1
         step_events = []
+        profiler = self.profiler
+        profiler.begin_step(self.step_count)
         
-        # アイテムの出現
-        new_item = self.item_manager.spawn_item()
-        if new_item:
-            self.log_event(f"🍓 {new_item.name}が出現した！")
+        # アイテムの出現と消滅
+        with profiler.phase("spawn"):
+            spawned_items, expired_items = self.item_manager.update_field(self.step_count)
+            if len(spawned_items) == 1:
+                self.log_event(f"🍓 {spawned_items[0].name}が出現した！", "item")
+            elif spawned_items:
+                self.log_event(f"🍓 きのみが{len(spawned_items)}個出現した！", "item")
+            if len(expired_items) == 1:
+                self.log_event(f"🍂 {expired_items[0].name}が消えてしまった", "item")
+            elif expired_items:
+                self.log_event(f"🍂 きのみが{len(expired_items)}個消えてしまった", "item")
         
-        # 全てのポケモンのペアをチェック
+        # 近くにいるポケモンのペアをチェック（ステップ開始時の位置で、i < j の順に処理）
         pokemon_list = list(self.pokemons.values())
+        world = self.world
         
-        for i, pokemon1 in enumerate(pokemon_list):
-            for pokemon2 in pokemon_list[i+1:]:
-                distance = pokemon1.distance_to(pokemon2)
+        with profiler.phase("pairs"):
+            positions = np.array([(p.x, p.y) for p in pokemon_list], dtype=float).reshape(-1, 2)
+            first, second, dist2 = neighbour_pairs(
+                positions, world.awareness_radius, world.size if world.wraps else None
+            )
+            close = dist2 < world.interaction_radius ** 2
+            
+            # 関係性のしきい値による分類は行列でまとめて行う
+            # （各組の関係性を変えるのはその組自身のインタラクションだけなので、ステップ開始時の値で判定できる）
+            attitudes = np.empty(len(first), dtype=np.int8)
+            attitudes[close] = self.relationships.interaction_attitudes(first[close], second[close])
+            attitudes[~close] = self.relationships.awareness_attitudes(first[~close], second[~close])
+            
+            for i, j, is_close, attitude in zip(first.tolist(), second.tolist(), close.tolist(), attitudes.tolist()):
+                pokemon1 = pokemon_list[i]
+                pokemon2 = pokemon_list[j]
                 
                 # 近接時のインタラクション
-                if distance < 1.5:
-                    event = self._handle_interaction(pokemon1, pokemon2)
+                if is_close:
+                    event = self._handle_interaction(pokemon1, pokemon2, attitude)
                     if event:
                         step_events.append(event)
-                elif distance < 3.0:
+                else:
                     # 中距離：互いに気づいている
-                    self._handle_awareness(pokemon1, pokemon2)
+                    self._handle_awareness(pokemon1, pokemon2, attitude)
         
         # 個別の行動
-        for pokemon in pokemon_list:
-            self._handle_individual_action(pokemon)
-            
-            # アイテムを拾う
-            picked_item = self.item_manager.check_pickup(pokemon, pickup_distance=0.6)
-            if picked_item:
+        with profiler.phase("individual"):
+            for pokemon in pokemon_list:
+                self._handle_individual_action(pokemon)
+        
+        with profiler.phase("pickups"):
+            # アイテムを拾う（全ポケモン分をまとめて判定）
+            positions = np.array([p.position for p in pokemon_list], dtype=float)
+            for index, picked_item in self.item_manager.resolve_pickups(positions, pickup_distance=world.pickup_radius):
+                pokemon = pokemon_list[index]
                 if pokemon.add_item(picked_item):
-                    self.log_event(f"📦 {pokemon.name}は{picked_item.name}を拾った！")
+                    self.log_event(f"📦 {pokemon.name}は{picked_item.name}を拾った！", "item")
                 else:
                     # インベントリがいっぱいなら自動使用
                     result = picked_item.use(pokemon)
-                    self.log_event(f"💊 {result}")
+                    self.log_event(f"💊 {result}", "item")
             
             # 自動でアイテムを使用
-            auto_use_result = pokemon.auto_use_item()
-            if auto_use_result:
-                self.log_event(f"💊 {auto_use_result}")
+            for pokemon in pokemon_list:
+                auto_use_result = pokemon.auto_use_item()
+                if auto_use_result:
+                    self.log_event(f"💊 {auto_use_result}", "item")
         
         # ランダムイベント
-        if random.random() < self.random_event_probability:
-            event = self._trigger_random_event()
-            if event:
-                step_events.append(event)
+        with profiler.phase("random_events"):
+            if self.rng.random() < self.random_event_probability:
+                event = self._trigger_random_event()
+                if event:
+                    step_events.append(event)
         
-        return {
+        profiler.end_step(self.step_count)
+        
+        for listener in self.step_listeners:
+            listener(self, step_events)
+        
+        result = {
             "step": self.step_count,
-            "events": step_events,
-            "pokemons_state": {k: v.to_dict() for k, v in self.pokemons.items()}
+            "events": step_events
         }
+        if include_state:
+            result["pokemons_state"] = {k: v.to_dict() for k, v in self.pokemons.items()}
+        return result
+    
+    def _adjust_relationship(self, pokemon1: PokemonALOs, pokemon2: PokemonALOs, change: int):
+        """2匹の関係性を双方向に変化させる"""
+        index = self.relationships.index
+        self.relationships.adjust_pair(index[pokemon1.key], index[pokemon2.key], change)
+        pokemon1.mark_dirty()
+        pokemon2.mark_dirty()
     
-    def _handle_interaction(self, pokemon1: PokemonALOs, pokemon2: PokemonALOs) -> Optional[str]:
-        """2匹のポケモン間のインタラクションを処理"""
-        relationship1 = pokemon1.get_relationship(pokemon2.key)
-        relationship2 = pokemon2.get_relationship(pokemon1.key)
+    def get_relationship_stats(self, top_k: int = 5) -> Dict:
+        """
+        集団全体の関係性の統計を取得
         
+        Args:
+            top_k: 取得する最も敵対的な組の数
+            
+        Returns:
+            敵対的/友好的な組の数、最も敵対的な組、友好グループ
+        """
+        stats = self.relationships.stats()
+        stats["most_hostile_pairs"] = self.relationships.most_hostile_pairs(top_k)
+        stats["friendship_clusters"] = self.relationships.friendship_clusters()
+        return stats
+    
+    def _handle_interaction(self, pokemon1: PokemonALOs, pokemon2: PokemonALOs, attitude: int) -> Optional[str]:
+        """
+        2匹のポケモン間のインタラクションを処理
+        
+        Args:
+            pokemon1: ポケモン
+            pokemon2: 相手のポケモン
+            attitude: RelationshipMatrix.interaction_attitudes による組の分類
+        """
         # 関係性に基づいてインタラクションタイプを決定
-        if relationship1 < -30 or relationship2 < -30:
+        if attitude == HOSTILE:
             # 敵対的：バトルの可能性が高い
-            if random.random() < self.battle_probability * 2:
+            if self.rng.random() < self.battle_probability * 2:
                 return self._simulate_battle(pokemon1, pokemon2)
-        elif relationship1 > 30 or relationship2 > 30:
+        elif attitude == FRIENDLY:
             # 友好的：友情イベント
-            if random.random() < self.friendship_probability * 2:
+            if self.rng.random() < self.friendship_probability * 2:
                 return self._simulate_friendship(pokemon1, pokemon2)
         else:
             # 中立：ランダムなインタラクション
-            r = random.random()
+            r = self.rng.random()
             if r < self.battle_probability:
                 return self._simulate_battle(pokemon1, pokemon2)
             elif r < self.battle_probability + self.friendship_probability:
@@ -136,14 +387,19 @@ class SimulationEngine:
         
         return None
     
-    def _handle_awareness(self, pokemon1: PokemonALOs, pokemon2: PokemonALOs):
-        """中距離での認識を処理（移動など）"""
-        relationship = pokemon1.get_relationship(pokemon2.key)
+    def _handle_awareness(self, pokemon1: PokemonALOs, pokemon2: PokemonALOs, attitude: int):
+        """
+        中距離での認識を処理（移動など）
         
-        if relationship < -30:
+        Args:
+            pokemon1: 動くポケモン
+            pokemon2: 相手のポケモン
+            attitude: RelationshipMatrix.awareness_attitudes による pokemon1 から見た分類
+        """
+        if attitude == HOSTILE:
             # 敵対的：近づく
             pokemon1.move_towards(pokemon2.position, speed=0.2)
-        elif relationship > 50:
+        elif attitude == CLOSE_FRIEND:
             # とても友好的：近づく
             pokemon1.move_towards(pokemon2.position, speed=0.15)
         elif pokemon1.mood == "tired":
@@ -155,82 +411,77 @@ class SimulationEngine:
         # エネルギーが低い場合は休憩
         if pokemon.energy < 30:
             pokemon.rest()
-            if random.random() < 0.1:
-                self.log_event(f"{pokemon.name}は休憩している...")
+            if self.rng.random() < 0.1:
+                self.log_event(f"{pokemon.name}は休憩している...", "rest")
         
         # HPが低い場合
         elif pokemon.hp < 40:
             pokemon.rest()
-            if random.random() < 0.15:
-                self.log_event(f"{pokemon.name}は傷を癒やしている...")
+            if self.rng.random() < 0.15:
+                self.log_event(f"{pokemon.name}は傷を癒やしている...", "rest")
         
         # 通常時：ランダムウォーク
         else:
-            pokemon.random_walk(speed=0.15)
+            pokemon.random_walk(speed=0.15, rng=self.rng)
             
             # まれに技を練習
-            if random.random() < self.learn_probability:
+            if self.rng.random() < self.learn_probability:
                 self._practice_move(pokemon)
     
     def _simulate_battle(self, pokemon1: PokemonALOs, pokemon2: PokemonALOs) -> str:
         """バトルをシミュレート"""
         # RAGからコンテクストを取得
         query = f"{pokemon1.name}と{pokemon2.name}のバトル"
-        context = self.rag_system.query_context(query, n_results=3)
+        with self.profiler.phase("rag"):
+            context = self.rag_system.query_context(query, n_results=3)
         
         # ALOsシステムでバトルシミュレーション
         scenario = f"{pokemon1.name}と{pokemon2.name}が戦っている"
         
         try:
-            result = self.alos_system.simulate_interaction(
-                [pokemon1.to_dict(), pokemon2.to_dict()],
-                scenario,
-                context
-            )
+            pokemons_data = [pokemon1.to_dict(), pokemon2.to_dict()]
+            with self.profiler.phase("llm"):
+                result = self.alos_system.simulate_interaction(pokemons_data, scenario, context)
             
             # 結果に基づいて状態を更新
-            damage1 = random.randint(10, 25)
-            damage2 = random.randint(10, 25)
+            damage1 = self.rng.randint(10, 25)
+            damage2 = self.rng.randint(10, 25)
             
             pokemon1.take_damage(damage2)
             pokemon2.take_damage(damage1)
             
             # 関係性を悪化
-            pokemon1.update_relationship(pokemon2.key, -5)
-            pokemon2.update_relationship(pokemon1.key, -5)
+            self._adjust_relationship(pokemon1, pokemon2, -5)
             
-            self.log_event(f"⚔️ {pokemon1.name} vs {pokemon2.name}: バトル発生！")
-            self.log_event(result)
+            self.log_event(f"⚔️ {pokemon1.name} vs {pokemon2.name}: バトル発生！", "battle")
+            self.log_event(result, "narrative")
             
             return f"Battle: {pokemon1.name} vs {pokemon2.name}"
             
         except Exception as e:
             # API呼び出しに失敗した場合のフォールバック
-            self.log_event(f"⚔️ {pokemon1.name}と{pokemon2.name}が戦った！")
+            self.log_event(f"⚔️ {pokemon1.name}と{pokemon2.name}が戦った！", "battle")
             pokemon1.take_damage(15)
             pokemon2.take_damage(15)
-            pokemon1.update_relationship(pokemon2.key, -5)
-            pokemon2.update_relationship(pokemon1.key, -5)
+            self._adjust_relationship(pokemon1, pokemon2, -5)
             return f"Battle: {pokemon1.name} vs {pokemon2.name}"
     
     def _simulate_friendship(self, pokemon1: PokemonALOs, pokemon2: PokemonALOs) -> str:
         """友好的なインタラクションをシミュレート"""
         # RAGからコンテクストを取得
         query = f"{pokemon1.name}と{pokemon2.name}の友情"
-        context = self.rag_system.query_context(query, n_results=3)
+        with self.profiler.phase("rag"):
+            context = self.rag_system.query_context(query, n_results=3)
         
         scenario = f"{pokemon1.name}と{pokemon2.name}が友好的に交流している"
         
         try:
-            result = self.alos_system.simulate_interaction(
-                [pokemon1.to_dict(), pokemon2.to_dict()],
-                scenario,
-                context
-            )
+            pokemons_data = [pokemon1.to_dict(), pokemon2.to_dict()]
+            with self.profiler.phase("llm"):
+                result = self.alos_system.simulate_interaction(pokemons_data, scenario, context)
             
             # 関係性を改善
-            pokemon1.update_relationship(pokemon2.key, 10)
-            pokemon2.update_relationship(pokemon1.key, 10)
+            self._adjust_relationship(pokemon1, pokemon2, 10)
             
             # 気分を良くする
             pokemon1.mood = "happy"
@@ -240,15 +491,14 @@ class SimulationEngine:
             pokemon1.heal(5)
             pokemon2.heal(5)
             
-            self.log_event(f"💚 {pokemon1.name}と{pokemon2.name}が仲良くなった！")
-            self.log_event(result)
+            self.log_event(f"💚 {pokemon1.name}と{pokemon2.name}が仲良くなった！", "friendship")
+            self.log_event(result, "narrative")
             
             return f"Friendship: {pokemon1.name} & {pokemon2.name}"
             
         except Exception as e:
-            self.log_event(f"💚 {pokemon1.name}と{pokemon2.name}が交流した")
-            pokemon1.update_relationship(pokemon2.key, 10)
-            pokemon2.update_relationship(pokemon1.key, 10)
+            self.log_event(f"💚 {pokemon1.name}と{pokemon2.name}が交流した", "friendship")
+            self._adjust_relationship(pokemon1, pokemon2, 10)
             return f"Friendship: {pokemon1.name} & {pokemon2.name}"
     
     def _practice_move(self, pokemon: PokemonALOs):
@@ -266,22 +516,23 @@ class SimulationEngine:
         new_moves = [m for m in potential_moves.get(pokemon.key, []) 
                      if m not in pokemon.current_abilities]
         
-        if new_moves and random.random() < 0.3:
-            new_move = random.choice(new_moves)
+        if new_moves and self.rng.random() < 0.3:
+            new_move = self.rng.choice(new_moves)
             pokemon.learn_move(new_move)
-            self.log_event(f"✨ {pokemon.name}は{new_move}を覚えた！")
+            self.log_event(f"✨ {pokemon.name}は{new_move}を覚えた！", "learn")
     
     def _trigger_random_event(self) -> Optional[str]:
         """ランダムイベントを発生させる"""
-        scenarios = self.rag_system.get_interaction_scenarios()
+        with self.profiler.phase("rag"):
+            scenarios = self.rag_system.get_interaction_scenarios()
         
         if scenarios:
-            scenario = random.choice(scenarios)
-            self.log_event(f"🎲 ランダムイベント: {scenario}")
+            scenario = self.rng.choice(scenarios)
+            self.log_event(f"🎲 ランダムイベント: {scenario}", "random")
             
             # ランダムなポケモンを選択
             pokemon_list = list(self.pokemons.values())
-            selected = random.sample(pokemon_list, min(2, len(pokemon_list)))
+            selected = self.rng.sample(pokemon_list, min(2, len(pokemon_list)))
             
             # 位置を近づける
             if len(selected) == 2:
@@ -292,26 +543,24 @@ class SimulationEngine:
         return None
     
     def get_simulation_state(self) -> Dict:
-        """現在のシミュレーション状態を取得"""
+        """現在のシミュレーション状態を取得
+        
+        各ポケモンの状態は変化があったものだけ作り直されます。
+        """
         return {
             "step": self.step_count,
-            "pokemons": {
-                key: {
-                    "name": p.name,
-                    "position": p.position,
-                    "hp": p.hp,
-                    "energy": p.energy,
-                    "mood": p.mood,
-                    "color": p.get_mood_color(),
-                    "relationships": p.relationships,
-                    "abilities": p.current_abilities,
-                    "inventory": [
-                        {"name": item.name, "emoji": item.get_emoji()}
-                        for item in p.inventory
-                    ]
-                }
-                for key, p in self.pokemons.items()
-            },
+            "pokemons": {key: p.to_state() for key, p in self.pokemons.items()},
             "items": self.item_manager.get_items_state()
         }
-
+    
+    def get_render_arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        描画に必要な配列だけを取得（状態の辞書は作らない）
+        
+        Returns:
+            (ポケモンのキーのリスト, 座標 (N, 2), RGBの色 (N, 3))
+        """
+        pokemons = list(self.pokemons.values())
+        positions = np.array([(p.x, p.y) for p in pokemons], dtype=float).reshape(-1, 2)
+        colors = np.array([p.get_mood_color() for p in pokemons], dtype=float).reshape(-1, 3)
+        return list(self.pokemons.keys()), positions, colors
@@ -0,0 +1,178 @@
+"""
+空間検索: セル分割による近傍ペアのベクトル化検索
+"""
+from typing import Optional, Tuple
+import math
+import numpy as np
+
+
+def radius_pairs(
+    queries,
+    points,
+    radius: float,
+    cell_size: Optional[float] = None,
+    wrap_size: Optional[Tuple[float, float]] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    queriesの各点から半径radius未満にあるpointsの点を全て求める
+    
+    pointsをセルに分けてセル番号でソートし、各クエリの周辺セルの範囲を
+    searchsortedで求めるので、Pythonのループは近傍セルのオフセット分だけです。
+    
+    Args:
+        queries: クエリ点の座標 (N, 2)
+        points: 検索対象の点の座標 (M, 2)
+        radius: 検索半径
+        cell_size: セルの大きさ（省略時はradius）
+        wrap_size: 端がつながったフィールドの大きさ (幅, 高さ)（Noneなら端はつながらない）
+    
+    Returns:
+        (クエリのインデックス, 点のインデックス, 距離の2乗) の配列の組
+        （wrapなら距離は端をまたいだ最短のもの）
+    """
+    queries = np.asarray(queries, dtype=float).reshape(-1, 2)
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+    
+    if len(queries) == 0 or len(points) == 0 or radius <= 0:
+        return empty
+    
+    if wrap_size is not None:
+        return _periodic_radius_pairs(queries, points, radius, cell_size, wrap_size)
+    return _cell_radius_pairs(queries, points, radius, cell_size)
+
+
+def _cell_radius_pairs(queries: np.ndarray, points: np.ndarray, radius: float, cell_size: Optional[float]):
+    """端がつながっていないフィールドで radius_pairs を求める（空でない入力のみ）"""
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+    cell_size = cell_size or radius
+    reach = int(math.ceil(radius / cell_size))
+    
+    point_cells = np.floor(points / cell_size).astype(np.int64)
+    query_cells = np.floor(queries / cell_size).astype(np.int64)
+    
+    # セル座標を0以上にずらし、1次元のキーに変換する
+    origin = np.minimum(point_cells.min(axis=0), query_cells.min(axis=0)) - reach
+    point_cells -= origin
+    query_cells -= origin
+    height = int(max(point_cells[:, 1].max(), query_cells[:, 1].max())) + reach + 1
+    
+    point_keys = point_cells[:, 0] * height + point_cells[:, 1]
+    order = np.argsort(point_keys, kind="stable")
+    sorted_keys = point_keys[order]
+    
+    query_index = []
+    point_index = []
+    for dx in range(-reach, reach + 1):
+        for dy in range(-reach, reach + 1):
+            keys = (query_cells[:, 0] + dx) * height + (query_cells[:, 1] + dy)
+            start = np.searchsorted(sorted_keys, keys, side="left")
+            counts = np.searchsorted(sorted_keys, keys, side="right") - start
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            
+            # 各クエリの [start, start + count) の範囲を1本の配列に展開
+            qi = np.repeat(np.arange(len(queries)), counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            query_index.append(qi)
+            point_index.append(order[np.repeat(start, counts) + offsets])
+    
+    if not query_index:
+        return empty
+    
+    qi = np.concatenate(query_index)
+    pi = np.concatenate(point_index)
+    d2 = ((queries[qi] - points[pi]) ** 2).sum(axis=1)
+    
+    within = d2 < radius * radius
+    return qi[within], pi[within], d2[within]
+
+
+# これ以下の点数なら、セルに分けずに距離行列で求める方が速い
+_BRUTE_FORCE_LIMIT = 64
+
+
+def neighbour_pairs(
+    positions,
+    radius: float,
+    wrap_size: Optional[Tuple[float, float]] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    点の集合の中で、距離が radius 未満の組 (i < j) を全て求める
+    
+    Args:
+        positions: 点の座標 (N, 2)
+        radius: 検索半径
+        wrap_size: 端がつながったフィールドの大きさ (幅, 高さ)（Noneなら端はつながらない）
+    
+    Returns:
+        (i, j, 距離の2乗) の配列の組（i, j の辞書順）
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    n = len(positions)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+    if n < 2 or radius <= 0:
+        return empty
+    
+    if n <= _BRUTE_FORCE_LIMIT:
+        delta = positions[None, :, :] - positions[:, None, :]
+        if wrap_size is not None:
+            size = np.asarray(wrap_size, dtype=float)
+            delta -= size * np.round(delta / size)
+        d2 = (delta ** 2).sum(axis=2)
+        i, j = np.nonzero(np.triu(d2 < radius * radius, k=1))
+        return i, j, d2[i, j]
+    
+    qi, pi, d2 = radius_pairs(positions, positions, radius, wrap_size=wrap_size)
+    
+    keep = qi < pi
+    qi, pi, d2 = qi[keep], pi[keep], d2[keep]
+    order = np.lexsort((pi, qi))
+    return qi[order], pi[order], d2[order]
+
+
+def _periodic_radius_pairs(
+    queries: np.ndarray,
+    points: np.ndarray,
+    radius: float,
+    cell_size: Optional[float],
+    wrap_size: Tuple[float, float]
+):
+    """端がつながったフィールドで radius_pairs を求める（端の近くの点の複製を加えて検索）"""
+    width, height = wrap_size
+    points = np.mod(points, (width, height))
+    queries = np.mod(queries, (width, height))
+    ghosts = [points]
+    ghost_index = [np.arange(len(points))]
+    for sx in (-1, 0, 1):
+        for sy in (-1, 0, 1):
+            if sx == 0 and sy == 0:
+                continue
+            # 反対側の端から radius 以内にある点だけを複製する
+            near = np.ones(len(points), dtype=bool)
+            if sx == 1:
+                near &= points[:, 0] < radius
+            elif sx == -1:
+                near &= points[:, 0] > width - radius
+            if sy == 1:
+                near &= points[:, 1] < radius
+            elif sy == -1:
+                near &= points[:, 1] > height - radius
+            index = np.flatnonzero(near)
+            if len(index):
+                ghosts.append(points[index] + (sx * width, sy * height))
+                ghost_index.append(index)
+    
+    original = np.concatenate(ghost_index)
+    qi, pi, d2 = _cell_radius_pairs(queries, np.concatenate(ghosts), radius, cell_size)
+    pi = original[pi]
+    
+    # フィールドが radius に比べて小さいと同じ組が複数の複製で見つかるので、最短のものを残す
+    keys = qi * len(points) + pi
+    order = np.lexsort((d2, keys))
+    keys = keys[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    order = order[first]
+    return qi[order], pi[order], d2[order]
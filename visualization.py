@@ -3,31 +3,217 @@
 """
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
+import matplotlib.transforms as mtransforms
 from matplotlib.animation import FuncAnimation
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple
+import unicodedata
 import numpy as np
 import japanize_matplotlib
 
+from rasterizer import GridRasterizer
+from world import WorldConfig, DEFAULT_WORLD
+
+
+def display_width(char: str) -> int:
+    """文字の表示幅（全角は2、半角は1）"""
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+def wrap_display(text: str, width: int, max_lines: int, indent: str = "  ") -> Tuple[str, ...]:
+    """
+    全角文字を2文字分として、表示幅で折り返す
+    
+    max_lines を超える分は読まずに切り捨てるので、
+    テキストがどれだけ長くても処理量は width * max_lines 程度です。
+    
+    Args:
+        text: 折り返すテキスト
+        width: 1行の表示幅（半角文字数）
+        max_lines: 最大行数（超えた場合は最後の行を「…」で終える）
+        indent: 2行目以降の字下げ
+    
+    Returns:
+        行のタプル
+    """
+    lines = []
+    line = ""
+    used = 0
+    
+    for char in text:
+        if char == "\n":
+            char = " "
+        w = display_width(char)
+        if used + w > width:
+            lines.append(line)
+            if len(lines) == max_lines:
+                # 入り切らなかったので最後の行を省略記号で終える
+                last = lines[-1]
+                while last and sum(display_width(c) for c in last) + 2 > width:
+                    last = last[:-1]
+                lines[-1] = last + "…"
+                return tuple(lines)
+            line = indent
+            used = len(indent)
+        line += char
+        used += w
+    
+    if line.strip():
+        lines.append(line)
+    return tuple(lines)
+
+
+class LogPanel:
+    """イベントログを1つのTextで表示するパネル
+    
+    イベントごとの折り返し結果は通し番号をキーに覚えておき、
+    新しいイベントが届いた時だけテキストを組み直します。
+    """
+    
+    def __init__(
+        self,
+        ax,
+        max_lines: int = 15,
+        width: int = 72,
+        max_lines_per_event: int = 3,
+        fontsize: int = 7
+    ):
+        """
+        Args:
+            ax: 表示先のAxes
+            max_lines: 表示する最大行数
+            width: 1行の表示幅（半角文字数）
+            max_lines_per_event: 1件のイベントに使う最大行数
+            fontsize: フォントサイズ
+        """
+        self.max_lines = max_lines
+        self.width = width
+        self.max_lines_per_event = max_lines_per_event
+        
+        self.text = ax.text(
+            0.05, 0.95,
+            "",
+            transform=ax.transAxes,
+            verticalalignment='top',
+            fontsize=fontsize,
+            fontfamily='sans-serif'
+        )
+        
+        self._wrapped: Dict[int, Tuple[str, ...]] = {}
+        self._signature = None
+    
+    def _lines_for(self, event) -> Tuple[str, ...]:
+        """イベントを折り返した行（キャッシュ済みならそれを使う）"""
+        lines = self._wrapped.get(event.seq)
+        if lines is None:
+            lines = wrap_display(str(event), self.width, self.max_lines_per_event)
+            self._wrapped[event.seq] = lines
+        return lines
+    
+    def update(self, events: Sequence) -> bool:
+        """
+        表示するイベントを更新
+        
+        Args:
+            events: 古い順のイベント（SimEvent）
+        
+        Returns:
+            テキストを書き換えたかどうか
+        """
+        signature = (events[0].seq, events[-1].seq, len(events)) if events else None
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        
+        # 新しいイベントから順に、行数の上限まで詰める
+        lines: List[str] = []
+        shown = set()
+        for event in reversed(events):
+            if len(lines) >= self.max_lines:
+                break
+            lines[:0] = self._lines_for(event)
+            shown.add(event.seq)
+        
+        # 表示しなくなったイベントのキャッシュを捨てる
+        if len(self._wrapped) > len(shown):
+            self._wrapped = {seq: self._wrapped[seq] for seq in shown}
+        
+        self.text.set_text('\n'.join(lines[-self.max_lines:]))
+        return True
+
+
+def _resolve_world(engine, world: Optional[WorldConfig]) -> WorldConfig:
+    """ビジュアライザーが使うワールド設定（指定 > エンジンのワールド > 既定）"""
+    if world is not None:
+        return world
+    return getattr(engine, 'world', None) or DEFAULT_WORLD
+
 
 class PokemonVisualizer:
-    """ポケモンシミュレーションのビジュアライザー"""
+    """ポケモンシミュレーションのビジュアライザー
+    
+    描画要素（Artist）は最初のフレームで一度だけ作成し、以降のフレームでは
+    位置・テキスト・角度などを書き換えるだけにしています。
+    変化する要素だけをブリッティングで再描画するので、
+    ポケモンやアイテムが増えてもフレームあたりの処理はほぼ一定です。
+    
+    ポケモンが lod_threshold 匹を超えると、マップは位置の密度のヒートマップになり、
+    名前とステータスカードは注目するポケモン（focus_keys、なければHPの低い順）だけに表示します。
+    """
     
-    def __init__(self, simulation_engine, update_interval: int = 500):
+    # ステータスカードのレイアウト
+    CARD_TOP = 0.88
+    CARD_HEIGHT = 0.28
+    CARD_GAP = 0.02
+    GAUGE_RADIUS = 0.055
+    MAX_ABILITIES_SHOWN = 4
+    MAX_INVENTORY_SHOWN = 3
+    MAX_RELATIONSHIPS_SHOWN = 7
+    
+    def __init__(
+        self,
+        simulation_engine,
+        update_interval: int = 500,
+        max_status_cards: int = 3,
+        runner=None,
+        interpolate: bool = False,
+        lod_threshold: int = 300,
+        lod_bins: int = 80,
+        species_channels: bool = True,
+        focus_keys: Optional[List[str]] = None,
+        world: Optional[WorldConfig] = None
+    ):
         """
         Args:
             simulation_engine: シミュレーションエンジン
             update_interval: 更新間隔（ミリ秒）
+            max_status_cards: ステータスカードを表示するポケモンの最大数
+            runner: SimulationRunner（指定するとステップは進めず、最新のスナップショットを描画する）
+            interpolate: runner 使用時にスナップショット間の座標を補間するかどうか
+            lod_threshold: この数を超えるとヒートマップ表示に切り替える
+            lod_bins: ヒートマップの1辺のビンの数
+            species_channels: ヒートマップを種ごとの色で重ねるかどうか（Falseなら全体の密度のみ）
+            focus_keys: 名前とステータスを表示するポケモンのキー（省略時は自動で選ぶ）
+            world: ワールド設定（省略時はエンジンのワールド）
         """
         self.engine = simulation_engine
+        self.world = _resolve_world(simulation_engine, world)
+        self._label_offset = 0.03 * self.world.height  # 名前をマーカーの少し上に出す
         self.update_interval = update_interval
+        self.max_status_cards = max_status_cards
+        self.runner = runner
+        self.interpolate = interpolate
+        self.lod_threshold = lod_threshold
+        self.lod_bins = lod_bins
+        self.species_channels = species_channels
+        self.focus_keys = list(focus_keys) if focus_keys else None
         
         # フィギュアとサブプロットの作成
         self.fig = plt.figure(figsize=(14, 8))
         
         # メインの2Dマップ
         self.ax_map = plt.subplot2grid((2, 3), (0, 0), colspan=2, rowspan=2)
-        self.ax_map.set_xlim(0, 10)
-        self.ax_map.set_ylim(0, 10)
+        self.ax_map.set_xlim(0, self.world.width)
+        self.ax_map.set_ylim(0, self.world.height)
         self.ax_map.set_aspect('equal')
         self.ax_map.set_title('ポケモンシミュレーション - 2Dマップ', fontsize=14, fontweight='bold')
         self.ax_map.set_xlabel('X座標')
@@ -37,82 +223,165 @@ class PokemonVisualizer:
         # ステータス表示
         self.ax_status = plt.subplot2grid((2, 3), (0, 2))
         self.ax_status.axis('off')
-        self.ax_status.set_title('ステータス', fontsize=12, fontweight='bold')
+        self.ax_status.set_xlim(0, 1)
+        self.ax_status.set_ylim(0, 1)
+        self.ax_status.set_title('ステータス', fontsize=12, fontweight='bold', pad=10)
         
         # ログ表示
         self.ax_log = plt.subplot2grid((2, 3), (1, 2))
         self.ax_log.axis('off')
         self.ax_log.set_title('イベントログ', fontsize=12, fontweight='bold')
         
-        # ポケモンの散布図プロット
+        # ポケモンの散布図プロット（ヒートマップ表示中は注目するポケモンだけ）
+        self.pokemon_keys = []
         self.scatter = None
-        self.pokemon_texts = {}
-        self.status_text = None
-        self.log_text = None
+        self.label_texts = []
+        self.step_text = None
+        self.status_cards = []
+        self.log_panel = None
         
-        # アイテムの散布図プロット
+        # ヒートマップ（ポケモンが多いときの表示）
+        self.lod = False
+        self.heatmap = None
+        self._key_index = {}
+        self._species_index = None
+        self._species_colors = None
+        
+        # アイテムの散布図プロットと絵文字テキストのプール
         self.item_scatter = None
-        self.item_texts = {}
+        self.item_texts = []
         
         # 凡例用のパッチ
         self.legend_patches = []
         
+        # フレームごとに書き換える描画要素（ブリッティングの対象）
+        self._dynamic_artists = []
+        
         plt.tight_layout()
     
     def init_plot(self):
-        """プロットの初期化"""
+        """プロットの初期化（ウィンドウのリサイズ時にも呼ばれる）"""
+        if self.runner is not None:
+            snapshot = self.runner.latest()
+            return self.render(snapshot.state, snapshot.events, snapshot.positions, snapshot.colors)
+        
+        state = self.engine.get_simulation_state()
+        return self.render(state, self.engine.get_recent_events(n=15))
+    
+    def update_plot(self, frame):
+        """プロットを更新"""
+        if self.runner is not None:
+            # シミュレーションはランナーが進めるので、最新の状態を描くだけ
+            snapshot = self.runner.sample(self.interpolate)
+            return self.render(snapshot.state, snapshot.events, snapshot.positions, snapshot.colors)
+        
+        # シミュレーションを1ステップ進める
+        self.engine.step(include_state=False)
         state = self.engine.get_simulation_state()
+        return self.render(state, self.engine.get_recent_events(n=15))
+    
+    def render(self, state: Dict, events: Sequence, positions=None, colors=None) -> List:
+        """
+        状態を描画要素に反映
+        
+        エンジンを参照しないので、記録済みの状態を描画することもできます。
+        
+        Args:
+            state: get_simulation_state() 形式の状態
+            events: 表示するイベント（SimEvent、古い順）
+            positions: ポケモンの座標の配列 (N, 2)（省略時は state から取得）
+            colors: ポケモンの色の配列 (N, 3)（省略時は state から取得）
+        
+        Returns:
+            書き換えた描画要素のリスト
+        """
+        if self.scatter is None:
+            self._build_artists(state)
         
-        # ポケモンの初期位置と色
-        positions = []
-        colors = []
-        sizes = []
-        
-        for key, pokemon_data in state['pokemons'].items():
-            pos = pokemon_data['position']
-            positions.append(pos)
-            colors.append(pokemon_data['color'])
-            sizes.append(300)
-        
-        if positions:
-            positions_array = np.array(positions)
-            self.scatter = self.ax_map.scatter(
-                positions_array[:, 0],
-                positions_array[:, 1],
-                c=colors,
-                s=sizes,
-                alpha=0.7,
-                edgecolors='black',
-                linewidths=2
+        focus = self._update_pokemons(state, positions, colors)
+        self._update_items(state)
+        self._update_status_text(state, focus)
+        self.log_panel.update(events)
+        
+        return self._dynamic_artists
+    
+    def _build_artists(self, state: Dict):
+        """描画要素を一度だけ作成"""
+        self.pokemon_keys = list(state['pokemons'].keys())
+        self._key_index = {key: i for i, key in enumerate(self.pokemon_keys)}
+        pokemons = [state['pokemons'][key] for key in self.pokemon_keys]
+        self.lod = len(self.pokemon_keys) > self.lod_threshold
+        
+        if self.lod:
+            self._build_heatmap(pokemons)
+            label_count = len(self.focus_keys) if self.focus_keys else self.max_status_cards
+        else:
+            label_count = len(self.pokemon_keys)
+        
+        # 名前を表示するポケモンの散布図（位置と色は毎フレーム差し替える）
+        self.scatter = self.ax_map.scatter(
+            np.empty(0),
+            np.empty(0),
+            s=300,
+            alpha=0.7,
+            edgecolors='black',
+            linewidths=2,
+            zorder=2
+        )
+        self._dynamic_artists.append(self.scatter)
+        
+        # ポケモン名のテキスト
+        for _ in range(min(label_count, len(self.pokemon_keys))):
+            text = self.ax_map.text(
+                0, 0,
+                "",
+                ha='center',
+                va='bottom',
+                fontsize=9,
+                fontweight='bold',
+                clip_on=True,
+                bbox=dict(boxstyle='round,pad=0.3', facecolor='white', alpha=0.7)
             )
-            
-            # ポケモン名のテキスト
-            for i, (key, pokemon_data) in enumerate(state['pokemons'].items()):
-                pos = pokemon_data['position']
-                text = self.ax_map.text(
-                    pos[0], pos[1] + 0.3,
-                    pokemon_data['name'],
-                    ha='center',
-                    va='bottom',
-                    fontsize=9,
-                    fontweight='bold',
-                    bbox=dict(boxstyle='round,pad=0.3', facecolor='white', alpha=0.7)
-                )
-                self.pokemon_texts[key] = text
-        
-        # アイテムの初期化
-        self._init_items(state)
+            self.label_texts.append(text)
+            self._dynamic_artists.append(text)
+        
+        # アイテムは空の散布図を作っておき、オフセットだけを差し替える
+        self.item_scatter = self.ax_map.scatter(
+            np.empty(0),
+            np.empty(0),
+            s=100,
+            alpha=0.8,
+            marker='s',  # 四角形
+            edgecolors='gold',
+            linewidths=1.5
+        )
+        self._dynamic_artists.append(self.item_scatter)
         
         # 凡例を作成
         self._update_legend(state)
         
-        # ステータスを初期化
-        self._update_status_text(state)
+        # Step数を表示（左上）
+        self.step_text = self.ax_status.text(
+            0.05, 0.98,
+            "",
+            transform=self.ax_status.transAxes,
+            ha='left',
+            va='top',
+            fontsize=9,
+            fontweight='bold',
+            bbox=dict(boxstyle='round,pad=0.3', facecolor='lightblue', alpha=0.5, edgecolor='blue', linewidth=1)
+        )
+        self._dynamic_artists.append(self.step_text)
         
-        # ログを初期化
-        self._update_log_text()
+        # ステータスカード（表示するポケモンはフレームごとに割り当てる）
+        y_position = self.CARD_TOP
+        for _ in range(min(self.max_status_cards, len(self.pokemon_keys))):
+            self.status_cards.append(self._build_status_card(y_position))
+            y_position -= self.CARD_HEIGHT + self.CARD_GAP
         
-        return self.scatter,
+        # ログ
+        self.log_panel = LogPanel(self.ax_log, max_lines=15, width=72)
+        self._dynamic_artists.append(self.log_panel.text)
     
     def _update_legend(self, state: Dict):
         """凡例を更新"""
@@ -137,319 +406,377 @@ class PokemonVisualizer:
             title='ポケモン'
         )
     
-    def _init_items(self, state: Dict):
-        """アイテムの初期化"""
-        items_data = state.get('items', [])
-        if items_data:
-            positions = [item['position'] for item in items_data]
-            colors = [item['color'] for item in items_data]
-            
-            if positions:
-                positions_array = np.array(positions)
-                self.item_scatter = self.ax_map.scatter(
-                    positions_array[:, 0],
-                    positions_array[:, 1],
-                    c=colors,
-                    s=100,
-                    alpha=0.8,
-                    marker='s',  # 四角形
-                    edgecolors='gold',
-                    linewidths=1.5
-                )
+    def _build_heatmap(self, pokemons: List[Dict]):
+        """ヒートマップを作成し、種ごとの色を決める"""
+        if self.species_channels:
+            species = [p.get('species', p['name']) for p in pokemons]
+            _, self._species_index = np.unique(species, return_inverse=True)
+        else:
+            self._species_index = np.zeros(len(pokemons), dtype=np.int64)
+        self._species_index = self._species_index.reshape(-1)
+        
+        # 種の色は、その種で最初に登録されたポケモンの色
+        colors = np.array([p['color'] for p in pokemons], dtype=float).reshape(-1, 3)
+        _, first_members = np.unique(self._species_index, return_index=True)
+        self._species_colors = colors[first_members]
+        
+        bins = self.lod_bins
+        extent = (0, self.world.width, 0, self.world.height)
+        if self.species_channels:
+            empty = np.ones((bins, bins, 3))
+            self.heatmap = self.ax_map.imshow(empty, extent=extent, origin='lower', interpolation='nearest', zorder=0.5)
+        else:
+            empty = np.zeros((bins, bins))
+            self.heatmap = self.ax_map.imshow(
+                empty, extent=extent, origin='lower', interpolation='nearest',
+                cmap='magma_r', vmin=0, vmax=1, zorder=0.5
+            )
+        self._dynamic_artists.append(self.heatmap)
     
-    def update_plot(self, frame):
-        """プロットを更新"""
-        # シミュレーションを1ステップ進める
-        self.engine.step()
-        state = self.engine.get_simulation_state()
+    def _update_heatmap(self, positions: np.ndarray):
+        """全ポケモンの位置をビンに数えてヒートマップを更新"""
+        bins = self.lod_bins
+        n_species = len(self._species_colors)
         
-        # ポケモンの位置と色を更新
-        positions = []
-        colors = []
+        cells = (positions * (bins / np.array(self.world.size))).astype(np.int64)
+        np.clip(cells, 0, bins - 1, out=cells)
+        flat = (self._species_index * bins + cells[:, 1]) * bins + cells[:, 0]
+        counts = np.bincount(flat, minlength=n_species * bins * bins).reshape(n_species, bins, bins)
         
-        for key, pokemon_data in state['pokemons'].items():
-            pos = pokemon_data['position']
-            positions.append(pos)
-            colors.append(pokemon_data['color'])
-            
-            # テキストの位置を更新
-            if key in self.pokemon_texts:
-                self.pokemon_texts[key].set_position((pos[0], pos[1] + 0.3))
+        # 少ない所も見えるように対数で0-1に正規化
+        density = np.log1p(counts) / np.log1p(max(1, counts.max()))
         
-        if positions:
-            positions_array = np.array(positions)
-            self.scatter.set_offsets(positions_array)
-            self.scatter.set_facecolors(colors)
+        if self.species_channels:
+            # 白地から、種ごとの密度に応じてその種の色に近づける
+            image = 1.0 - np.tensordot(density, 1.0 - self._species_colors, axes=(0, 0))
+            np.clip(image, 0.0, 1.0, out=image)
+        else:
+            image = density[0]
+        self.heatmap.set_data(image)
+    
+    def _select_focus(self, state: Dict) -> List[str]:
+        """名前とステータスを表示するポケモンのキー"""
+        if self.focus_keys:
+            return [key for key in self.focus_keys if key in self._key_index]
+        if not self.lod:
+            return self.pokemon_keys[:self.max_status_cards]
         
-        # アイテムを更新
-        self._update_items(state)
+        # ヒートマップ表示中はHPの低い順に選ぶ（同じHPなら登録順）
+        pokemons = state['pokemons']
+        hp = np.array([pokemons[key]['hp'] for key in self.pokemon_keys])
+        top = np.argsort(hp, kind='stable')[:self.max_status_cards]
+        return [self.pokemon_keys[i] for i in top.tolist()]
+    
+    def _update_pokemons(self, state: Dict, positions=None, colors=None) -> List[str]:
+        """
+        ポケモンの位置と色、名前の位置を更新
+        
+        Returns:
+            ステータスカードに表示するポケモンのキー
+        """
+        pokemons = state['pokemons']
+        if positions is None:
+            positions = np.array([pokemons[key]['position'] for key in self.pokemon_keys], dtype=float)
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        
+        focus = self._select_focus(state)
+        if self.lod:
+            self._update_heatmap(positions)
+            shown = focus
+        else:
+            shown = self.pokemon_keys
         
-        # ステータステキストを更新
-        self._update_status_text(state)
+        index = [self._key_index[key] for key in shown]
+        shown_positions = positions[index]
+        if colors is None:
+            shown_colors = [pokemons[key]['color'] for key in shown]
+        else:
+            shown_colors = np.asarray(colors, dtype=float).reshape(-1, 3)[index]
         
-        # ログテキストを更新
-        self._update_log_text()
+        self.scatter.set_offsets(shown_positions)
+        self.scatter.set_facecolors(shown_colors)
         
-        return self.scatter,
+        for text, key, (x, y) in zip(self.label_texts, shown, shown_positions.tolist()):
+            text.set_position((x, y + self._label_offset))
+            text.set_text(pokemons[key]['name'])
+            text.set_visible(True)
+        for text in self.label_texts[len(shown):]:
+            text.set_visible(False)
+        
+        return focus
     
     def _update_items(self, state: Dict):
-        """アイテムの表示を更新"""
+        """アイテムの表示を更新（絵文字テキストは使い回す）"""
         items_data = state.get('items', [])
         
-        # 既存のアイテムscatterを削除
-        if self.item_scatter is not None:
-            self.item_scatter.remove()
-            self.item_scatter = None
+        positions = np.array([item.position for item in items_data], dtype=float).reshape(-1, 2)
+        self.item_scatter.set_offsets(positions)
+        self.item_scatter.set_facecolors([item.color for item in items_data])
         
-        # アイテムテキストを削除
-        for text in self.item_texts.values():
-            text.remove()
-        self.item_texts.clear()
+        # 足りない分だけテキストを追加
+        while len(self.item_texts) < len(items_data):
+            text = self.ax_map.text(
+                0, 0,
+                "",
+                ha='center',
+                va='center',
+                fontsize=12,
+                clip_on=True
+            )
+            self.item_texts.append(text)
+            self._dynamic_artists.append(text)
         
-        # 新しいアイテムを描画
-        if items_data:
-            positions = [item['position'] for item in items_data]
-            colors = [item['color'] for item in items_data]
-            
-            if positions:
-                positions_array = np.array(positions)
-                self.item_scatter = self.ax_map.scatter(
-                    positions_array[:, 0],
-                    positions_array[:, 1],
-                    c=colors,
-                    s=100,
-                    alpha=0.8,
-                    marker='s',  # 四角形
-                    edgecolors='gold',
-                    linewidths=1.5
-                )
-                
-                # アイテムの絵文字を表示
-                for i, item in enumerate(items_data):
-                    pos = item['position']
-                    text = self.ax_map.text(
-                        pos[0], pos[1],
-                        item['emoji'],
-                        ha='center',
-                        va='center',
-                        fontsize=12
-                    )
-                    self.item_texts[i] = text
-    
-    def _update_status_text(self, state: Dict):
-        """ステータスをビジュアルに表示"""
-        if self.status_text:
-            self.status_text.remove()
-        
-        # ステータスエリアをクリア
-        self.ax_status.clear()
-        self.ax_status.axis('off')
-        self.ax_status.set_xlim(0, 1)
-        self.ax_status.set_ylim(0, 1)
-        self.ax_status.set_title('ステータス', fontsize=12, fontweight='bold', pad=10)
+        for text, item in zip(self.item_texts, items_data):
+            text.set_position(item.position)
+            text.set_text(item.emoji)
+            text.set_visible(True)
         
-        # Step数を表示（左上）
-        self.ax_status.text(
-            0.05, 0.98,
-            f"Step: {state['step']}",
+        for text in self.item_texts[len(items_data):]:
+            text.set_visible(False)
+    
+    def _status_text(self, x: float, y: float, text: str = "", **kwargs):
+        """ステータスエリアにテキストを作成"""
+        artist = self.ax_status.text(x, y, text, transform=self.ax_status.transAxes, **kwargs)
+        self._dynamic_artists.append(artist)
+        return artist
+    
+    def _build_status_card(self, y_position: float) -> Dict:
+        """
+        ステータスカード1枚分の描画要素を作成
+        
+        どのポケモンを表示するかは _bind_status_card で割り当てます。
+        
+        Args:
+            y_position: カード上端のY座標
+        
+        Returns:
+            カードの描画要素の辞書
+        """
+        first_artist = len(self._dynamic_artists)
+        
+        # カードの背景（ポケモンの色で）
+        card_y = y_position - self.CARD_HEIGHT
+        background = plt.Rectangle(
+            (0.02, card_y),
+            0.96,
+            self.CARD_HEIGHT,
             transform=self.ax_status.transAxes,
+            alpha=0.15,
+            linewidth=2,
+            zorder=0
+        )
+        self.ax_status.add_patch(background)
+        self._dynamic_artists.append(background)
+        
+        # ポケモン名（左上）
+        name = self._status_text(
+            0.08, y_position - 0.02,
             ha='left',
             va='top',
-            fontsize=9,
+            fontsize=10,
             fontweight='bold',
-            bbox=dict(boxstyle='round,pad=0.3', facecolor='lightblue', alpha=0.5, edgecolor='blue', linewidth=1)
+            color='black',
+            bbox=dict(boxstyle='round,pad=0.3', facecolor='white', alpha=0.8, edgecolor='black', linewidth=1.5)
         )
         
-        # ポケモンごとのステータスカードを描画
-        y_start = 0.88
-        card_height = 0.28
-        y_position = y_start
-        
-        # 各ポケモンのステータス
-        for idx, (key, pokemon_data) in enumerate(state['pokemons'].items()):
-            name = pokemon_data['name']
-            hp = pokemon_data['hp']
-            energy = pokemon_data['energy']
-            mood = pokemon_data['mood']
-            color = pokemon_data['color']
+        card = {'key': None, 'card_y': card_y, 'background': background, 'name': name, 'relationships': []}
+        
+        # HPとEnergyを円形プログレスで表示（左側）
+        circle_y = y_position - 0.14
+        card['hp'] = self._build_circular_progress(
+            self.ax_status, 0.15, circle_y, "HP",
+            (1.0, 0.2, 0.2), (0.2, 0.8, 0.2)
+        )
+        card['energy'] = self._build_circular_progress(
+            self.ax_status, 0.32, circle_y, "EN",
+            (1.0, 0.6, 0.0), (0.3, 0.6, 1.0)
+        )
+        
+        # 気分（右上）
+        card['mood_emoji'] = self._status_text(0.92, y_position - 0.02, ha='right', va='top', fontsize=16)
+        card['mood'] = self._status_text(0.92, y_position - 0.06, ha='right', va='top', fontsize=7)
+        
+        # 技（最大4個表示）
+        info_y = y_position - 0.1
+        card['abilities_header'] = self._status_text(
+            0.52, info_y,
+            ha='left',
+            fontsize=7,
+            fontweight='bold',
+            color='darkblue'
+        )
+        card['abilities'] = [
+            self._status_text(0.54, info_y - 0.025 * (i + 1), ha='left', fontsize=6)
+            for i in range(self.MAX_ABILITIES_SHOWN)
+        ]
+        
+        # 持ち物（右側下部）
+        bag_y = card_y + 0.02
+        card['bag_header'] = self._status_text(
+            0.52, bag_y,
+            ha='left',
+            fontsize=7,
+            fontweight='bold',
+            color='darkgreen'
+        )
+        card['bag'] = [
+            self._status_text(
+                0.68 + i * 0.1, bag_y,
+                ha='center',
+                fontsize=12,
+                bbox=dict(boxstyle='round,pad=0.2', facecolor='white', alpha=0.7, edgecolor='gold', linewidth=1)
+            )
+            for i in range(self.MAX_INVENTORY_SHOWN)
+        ]
+        
+        card['artists'] = self._dynamic_artists[first_artist:]
+        return card
+    
+    def _bind_status_card(self, card: Dict, key: Optional[str], pokemon_data: Optional[Dict]):
+        """カードに表示するポケモンを割り当てる（Noneならカードを隠す）"""
+        card['key'] = key
+        for artist in card['artists']:
+            artist.set_visible(key is not None)
+        for bar in card['relationships']:
+            for artist in (bar['background'], bar['fill'], bar['label']):
+                artist.set_visible(False)
+        if key is None:
+            return
+        
+        card['name'].set_text(pokemon_data['name'])
+        # 値が同じでも描き直すように、ゲージの前回値を忘れる
+        card['hp']['value'] = None
+        card['energy']['value'] = None
+    
+    def _build_relationship_bar(self, card: Dict, slot: int) -> Dict:
+        """関係性のミニバーを1本作成"""
+        rel_y = card['card_y'] + 0.01
+        rel_x = 0.08 + slot * 0.13
+        bar_width = 0.1
+        bar_height = 0.008
+        
+        # 背景
+        background = plt.Rectangle(
+            (rel_x, rel_y),
+            bar_width,
+            bar_height,
+            transform=self.ax_status.transAxes,
+            facecolor='lightgray',
+            edgecolor='gray',
+            linewidth=0.5,
+            zorder=1
+        )
+        self.ax_status.add_patch(background)
+        
+        fill = plt.Rectangle(
+            (rel_x, rel_y),
+            0,
+            bar_height,
+            transform=self.ax_status.transAxes,
+            edgecolor='none',
+            zorder=1.5
+        )
+        self.ax_status.add_patch(fill)
+        
+        # 相手の名前（1文字）
+        label = self._status_text(
+            rel_x + bar_width / 2, rel_y - 0.01,
+            ha='center',
+            va='top',
+            fontsize=6,
+            fontweight='bold'
+        )
+        
+        self._dynamic_artists.extend([background, fill])
+        return {'background': background, 'fill': fill, 'label': label, 'width': bar_width}
+    
+    def _update_status_text(self, state: Dict, focus: List[str]):
+        """
+        ステータスカードの表示を更新
+        
+        Args:
+            state: シミュレーションの状態
+            focus: カードに表示するポケモンのキー（カードの枚数を超えた分は表示しない）
+        """
+        self.step_text.set_text(f"Step: {state['step']}")
+        
+        pokemons = state['pokemons']
+        for slot, card in enumerate(self.status_cards):
+            key = focus[slot] if slot < len(focus) else None
+            if key != card['key']:
+                self._bind_status_card(card, key, pokemons.get(key))
+            if key is None:
+                continue
+            
+            pokemon_data = pokemons[key]
             abilities = pokemon_data.get('abilities', [])
             inventory = pokemon_data.get('inventory', [])
             
-            # カードの背景（ポケモンの色で）
-            card_y = y_position - card_height
-            card_rect = plt.Rectangle(
-                (0.02, card_y),
-                0.96,
-                card_height,
-                transform=self.ax_status.transAxes,
-                facecolor=color,
-                alpha=0.15,
-                edgecolor=color,
-                linewidth=2,
-                zorder=0
-            )
-            self.ax_status.add_patch(card_rect)
-            
-            # ポケモン名（左上）
-            self.ax_status.text(
-                0.08, y_position - 0.02,
-                name,
-                transform=self.ax_status.transAxes,
-                ha='left',
-                va='top',
-                fontsize=10,
-                fontweight='bold',
-                color='black',
-                bbox=dict(boxstyle='round,pad=0.3', facecolor=color, alpha=0.8, edgecolor='black', linewidth=1.5)
-            )
+            # カードの色（HPが減ると暗くなる）
+            color = pokemon_data['color']
+            card['background'].set_facecolor(color)
+            card['background'].set_edgecolor(color)
+            card['name'].get_bbox_patch().set_facecolor(color)
             
-            # HPとEnergyを円形プログレスで表示（左側）
-            circle_y = y_position - 0.14
+            self._update_circular_progress(card['hp'], pokemon_data['hp'])
+            self._update_circular_progress(card['energy'], pokemon_data['energy'])
             
-            # HP円形プログレス
-            self._draw_circular_progress(
-                self.ax_status, 0.15, circle_y, hp, "HP",
-                (1.0, 0.2, 0.2), (0.2, 0.8, 0.2)
-            )
+            card['mood_emoji'].set_text(self._get_mood_emoji(pokemon_data['mood']))
+            card['mood'].set_text(pokemon_data['mood'])
             
-            # Energy円形プログレス
-            self._draw_circular_progress(
-                self.ax_status, 0.32, circle_y, energy, "EN",
-                (1.0, 0.6, 0.0), (0.3, 0.6, 1.0)
-            )
+            # 技
+            card['abilities_header'].set_text(f"⚡ 技 ({len(abilities)})" if abilities else "")
+            for i, text in enumerate(card['abilities']):
+                text.set_text(f"• {abilities[i][:6]}" if i < len(abilities) else "")  # 最大6文字
             
-            # 気分（右上）
-            mood_emoji = self._get_mood_emoji(mood)
-            self.ax_status.text(
-                0.92, y_position - 0.02,
-                f"{mood_emoji}",
-                transform=self.ax_status.transAxes,
-                ha='right',
-                va='top',
-                fontsize=16
-            )
-            self.ax_status.text(
-                0.92, y_position - 0.06,
-                mood,
-                transform=self.ax_status.transAxes,
-                ha='right',
-                va='top',
-                fontsize=7
-            )
+            # 持ち物
+            card['bag_header'].set_text(f"🎒 {len(inventory)}/3" if inventory else "")
+            for i, text in enumerate(card['bag']):
+                visible = i < len(inventory)
+                text.set_visible(visible)
+                if visible:
+                    text.set_text(inventory[i]['emoji'])
             
-            # 技と持ち物（右側に表示）
-            info_y = y_position - 0.1
+            # 関係性（カード下部にミニバーで表示）
+            relationships = list(pokemon_data['relationships'].items())[:self.MAX_RELATIONSHIPS_SHOWN]
+            while len(card['relationships']) < len(relationships):
+                card['relationships'].append(self._build_relationship_bar(card, len(card['relationships'])))
             
-            # 技（最大4個表示）
-            if abilities:
-                self.ax_status.text(
-                    0.52, info_y,
-                    f"⚡ 技 ({len(abilities)})",
-                    transform=self.ax_status.transAxes,
-                    ha='left',
-                    fontsize=7,
-                    fontweight='bold',
-                    color='darkblue'
-                )
+            for i, bar in enumerate(card['relationships']):
+                visible = i < len(relationships)
+                for artist in (bar['background'], bar['fill'], bar['label']):
+                    artist.set_visible(visible)
+                if not visible:
+                    continue
                 
-                display_abilities = abilities[:4]
-                for i, ability in enumerate(display_abilities):
-                    self.ax_status.text(
-                        0.54, info_y - 0.025 * (i + 1),
-                        f"• {ability[:6]}",  # 最大6文字
-                        transform=self.ax_status.transAxes,
-                        ha='left',
-                        fontsize=6
-                    )
-            
-            # 持ち物（右側下部）
-            bag_y = card_y + 0.02
-            if inventory:
-                self.ax_status.text(
-                    0.52, bag_y,
-                    f"🎒 {len(inventory)}/3",
-                    transform=self.ax_status.transAxes,
-                    ha='left',
-                    fontsize=7,
-                    fontweight='bold',
-                    color='darkgreen'
-                )
+                other_key, relationship = relationships[i]
+                if relationship > 30:
+                    bar_color = (0.2, 0.8, 0.2)  # 緑
+                elif relationship < -30:
+                    bar_color = (0.8, 0.2, 0.2)  # 赤
+                else:
+                    bar_color = (0.8, 0.8, 0.2)  # 黄
                 
-                # アイテムをアイコンで表示
-                for i, item in enumerate(inventory):
-                    self.ax_status.text(
-                        0.68 + i * 0.1, bag_y,
-                        item['emoji'],
-                        transform=self.ax_status.transAxes,
-                        ha='center',
-                        fontsize=12,
-                        bbox=dict(boxstyle='round,pad=0.2', facecolor='white', alpha=0.7, edgecolor='gold', linewidth=1)
-                    )
-            
-            # 関係性（カード下部にミニバーで表示）
-            if pokemon_data['relationships']:
-                rel_y = card_y + 0.01
-                rel_x_start = 0.08
-                
-                for i, (other_key, relationship) in enumerate(pokemon_data['relationships'].items()):
-                    other_name = self.engine.pokemons[other_key].name
-                    rel_x = rel_x_start + i * 0.13
-                    
-                    # 関係性バー
-                    bar_width = 0.1
-                    bar_height = 0.008
-                    
-                    # 背景
-                    bg_rect = plt.Rectangle(
-                        (rel_x, rel_y),
-                        bar_width,
-                        bar_height,
-                        transform=self.ax_status.transAxes,
-                        facecolor='lightgray',
-                        edgecolor='gray',
-                        linewidth=0.5
-                    )
-                    self.ax_status.add_patch(bg_rect)
-                    
-                    # 関係性の値に応じた色とサイズ
-                    rel_normalized = (relationship + 100) / 200.0  # 0-1に正規化
-                    if relationship > 30:
-                        bar_color = (0.2, 0.8, 0.2)  # 緑
-                    elif relationship < -30:
-                        bar_color = (0.8, 0.2, 0.2)  # 赤
-                    else:
-                        bar_color = (0.8, 0.8, 0.2)  # 黄
-                    
-                    fill_width = bar_width * rel_normalized
-                    fill_rect = plt.Rectangle(
-                        (rel_x, rel_y),
-                        fill_width,
-                        bar_height,
-                        transform=self.ax_status.transAxes,
-                        facecolor=bar_color,
-                        edgecolor='none'
-                    )
-                    self.ax_status.add_patch(fill_rect)
-                    
-                    # 相手の名前（1文字）
-                    self.ax_status.text(
-                        rel_x + bar_width / 2, rel_y - 0.01,
-                        other_name[0],
-                        transform=self.ax_status.transAxes,
-                        ha='center',
-                        va='top',
-                        fontsize=6,
-                        fontweight='bold'
-                    )
-            
-            y_position -= card_height + 0.02  # 次のカードへ
+                bar['fill'].set_width(bar['width'] * (relationship + 100) / 200.0)  # 0-1に正規化
+                bar['fill'].set_facecolor(bar_color)
+                bar['label'].set_text(pokemons[other_key]['name'][0])
     
-    def _draw_circular_progress(self, ax, x, y, value, label, low_color, high_color):
-        """円形プログレスバーを描画"""
-        radius = 0.055
+    @staticmethod
+    def _gauge_color(value: float, low_color, high_color):
+        """値に応じたゲージの色（低いと low_color、高いと high_color）"""
+        if value < 30:
+            return low_color
+        if value < 70:
+            t = (value - 30) / 40.0
+            return tuple(low_color[i] * (1-t) + high_color[i] * t for i in range(3))
+        return high_color
+    
+    def _build_circular_progress(self, ax, x, y, label, low_color, high_color) -> Dict:
+        """円形プログレスバーの描画要素を作成"""
+        radius = self.GAUGE_RADIUS
         
         # 背景円
-        bg_circle = plt.Circle(
+        background = plt.Circle(
             (x, y),
             radius,
             transform=ax.transAxes,
@@ -458,33 +785,19 @@ class PokemonVisualizer:
             linewidth=1.5,
             zorder=1
         )
-        ax.add_patch(bg_circle)
+        ax.add_patch(background)
         
-        # プログレス円（パイチャート風）
-        if value > 0:
-            # 色の決定
-            if value < 30:
-                color = low_color
-            elif value < 70:
-                t = (value - 30) / 40.0
-                color = tuple(low_color[i] * (1-t) + high_color[i] * t for i in range(3))
-            else:
-                color = high_color
-            
-            # 円弧を描画（上から時計回り）
-            theta = np.linspace(np.pi/2, np.pi/2 - 2*np.pi*(value/100), 100)
-            x_arc = x + radius * 0.85 * np.cos(theta)
-            y_arc = y + radius * 0.85 * np.sin(theta)
-            
-            # 塗りつぶし
-            wedge = mpatches.Wedge(
-                (x, y), radius * 0.85, 90 - 360*(value/100), 90,
-                transform=ax.transAxes,
-                facecolor=color,
-                edgecolor='none',
-                zorder=2
-            )
-            ax.add_patch(wedge)
+        # プログレス円（上から時計回り）
+        # Wedgeは反時計回りにしか伸びないので、中心を通る縦軸で左右反転して描き、
+        # 始点を90度に固定したまま set_theta2 で終点を伸ばす
+        mirror = mtransforms.Affine2D().translate(-x, -y).scale(-1, 1).translate(x, y)
+        wedge = mpatches.Wedge(
+            (x, y), radius * 0.85, 90, 90,
+            transform=mirror + ax.transAxes,
+            edgecolor='none',
+            zorder=2
+        )
+        ax.add_patch(wedge)
         
         # 中央に白い円
         center_circle = plt.Circle(
@@ -498,9 +811,9 @@ class PokemonVisualizer:
         ax.add_patch(center_circle)
         
         # 数値表示
-        ax.text(
+        value_text = ax.text(
             x, y,
-            f"{value:.0f}",
+            "",
             transform=ax.transAxes,
             ha='center',
             va='center',
@@ -510,7 +823,7 @@ class PokemonVisualizer:
         )
         
         # ラベル
-        ax.text(
+        label_text = ax.text(
             x, y - radius - 0.01,
             label,
             transform=ax.transAxes,
@@ -519,6 +832,28 @@ class PokemonVisualizer:
             fontsize=7,
             fontweight='bold'
         )
+        
+        self._dynamic_artists.extend([background, wedge, center_circle, value_text, label_text])
+        return {
+            'wedge': wedge,
+            'text': value_text,
+            'low_color': low_color,
+            'high_color': high_color,
+            'value': None
+        }
+    
+    def _update_circular_progress(self, gauge: Dict, value: float):
+        """円形プログレスバーの値を更新"""
+        if gauge['value'] == value:
+            return
+        gauge['value'] = value
+        
+        wedge = gauge['wedge']
+        wedge.set_visible(value > 0)
+        if value > 0:
+            wedge.set_theta2(90 + 360 * (value / 100))
+            wedge.set_facecolor(self._gauge_color(value, gauge['low_color'], gauge['high_color']))
+        gauge['text'].set_text(f"{value:.0f}")
     
     def _draw_status_bar(self, ax, x, y, value, label, low_color, high_color):
         """ステータスバーを描画"""
@@ -586,33 +921,14 @@ class PokemonVisualizer:
         }
         return mood_emojis.get(mood, "😐")
     
-    def _update_log_text(self):
-        """ログテキストを更新"""
-        if self.log_text:
-            self.log_text.remove()
-        
-        recent_logs = self.engine.get_recent_logs(n=15)
-        log_text = '\n'.join(recent_logs[-15:])  # 最新15件
-        
-        # 日本語と絵文字に対応したフォント設定
-        self.log_text = self.ax_log.text(
-            0.05, 0.95,
-            log_text,
-            transform=self.ax_log.transAxes,
-            verticalalignment='top',
-            fontsize=7,
-            wrap=True,
-            fontfamily='sans-serif'  # monospaceから変更
-        )
-    
     def run(self):
-        """アニメーションを実行"""
+        """アニメーションを実行（変化する要素だけをブリッティングで描き直す）"""
         anim = FuncAnimation(
             self.fig,
             self.update_plot,
             init_func=self.init_plot,
             interval=self.update_interval,
-            blit=False,
+            blit=True,
             cache_frame_data=False
         )
         
@@ -623,19 +939,33 @@ class PokemonVisualizer:
 class SimplePokemonVisualizer:
     """シンプルなポケモンビジュアライザー（ライフゲーム風）"""
     
-    def __init__(self, simulation_engine, grid_size: int = 50, update_interval: int = 500):
+    def __init__(
+        self,
+        simulation_engine,
+        grid_size: int = 50,
+        update_interval: int = 500,
+        runner=None,
+        blend: bool = False,
+        world: Optional[WorldConfig] = None
+    ):
         """
         Args:
             simulation_engine: シミュレーションエンジン
             grid_size: グリッドのサイズ
             update_interval: 更新間隔（ミリ秒）
+            runner: SimulationRunner（指定するとステップは進めず、最新のスナップショットを描画する）
+            blend: 重なったポケモンの色を足し合わせて表示するかどうか
+            world: ワールド設定（省略時はエンジンのワールド）
         """
         self.engine = simulation_engine
+        self.world = _resolve_world(simulation_engine, world)
         self.grid_size = grid_size
         self.update_interval = update_interval
+        self.runner = runner
         
-        # グリッドの初期化
-        self.grid = np.zeros((grid_size, grid_size, 3))
+        # グリッドの初期化（バッファはラスタライザーが使い回す）
+        self.rasterizer = GridRasterizer(grid_size, field_size=self.world.size, accumulate=blend)
+        self.grid = self.rasterizer.buffer
         
         # フィギュアとサブプロットの作成
         self.fig, (self.ax_grid, self.ax_log) = plt.subplots(1, 2, figsize=(14, 6))
@@ -648,74 +978,58 @@ class SimplePokemonVisualizer:
         # ログ表示
         self.ax_log.axis('off')
         self.ax_log.set_title('イベントログ', fontsize=12, fontweight='bold')
-        self.log_text = None
+        self.log_panel = LogPanel(self.ax_log, max_lines=30, width=110)
         
         plt.tight_layout()
     
     def init_plot(self):
         """プロットの初期化"""
-        self._update_grid()
-        return self.im,
-    
-    def _update_grid(self):
-        """グリッドを更新"""
-        # グリッドをリセット
-        self.grid = np.zeros((self.grid_size, self.grid_size, 3))
-        
-        state = self.engine.get_simulation_state()
-        
-        for key, pokemon_data in state['pokemons'].items():
-            pos = pokemon_data['position']
-            color = pokemon_data['color']
-            
-            # 位置をグリッド座標に変換
-            x = int(pos[0] / 10.0 * self.grid_size)
-            y = int(pos[1] / 10.0 * self.grid_size)
-            
-            # 境界チェック
-            x = max(0, min(self.grid_size - 1, x))
-            y = max(0, min(self.grid_size - 1, y))
-            
-            # グリッドに色を設定（3x3の領域）
-            for dx in range(-1, 2):
-                for dy in range(-1, 2):
-                    nx = x + dx
-                    ny = y + dy
-                    if 0 <= nx < self.grid_size and 0 <= ny < self.grid_size:
-                        self.grid[ny, nx] = color
+        if self.runner is not None:
+            snapshot = self.runner.latest()
+            return self.render(snapshot.state, snapshot.events, snapshot.positions, snapshot.colors)
         
-        self.im.set_data(self.grid)
+        _, positions, colors = self.engine.get_render_arrays()
+        return self.render(None, self.engine.get_recent_events(n=30), positions, colors)
     
-    def update_plot(self, frame):
-        """プロットを更新"""
-        # シミュレーションを1ステップ進める
-        self.engine.step()
+    def render(self, state: Optional[Dict], events: Sequence, positions=None, colors=None):
+        """
+        状態をグリッドとログに反映
+        
+        Args:
+            state: get_simulation_state() 形式の状態（positions と colors を渡す場合は不要）
+            events: 表示するイベント（SimEvent、古い順）
+            positions: ポケモンの座標の配列 (N, 2)（省略時は state から取得）
+            colors: ポケモンの色の配列 (N, 3)（省略時は state から取得）
+        """
+        if positions is None or colors is None:
+            pokemons = list(state['pokemons'].values())
+            positions = [p['position'] for p in pokemons]
+            colors = [p['color'] for p in pokemons]
         
         # グリッドを更新
-        self._update_grid()
+        self._update_grid(positions, colors)
         
         # ログを更新
-        self._update_log_text()
+        self.log_panel.update(events)
         
         return self.im,
     
-    def _update_log_text(self):
-        """ログテキストを更新"""
-        if self.log_text:
-            self.log_text.remove()
-        
-        recent_logs = self.engine.get_recent_logs(n=30)
-        log_text = '\n'.join(recent_logs[-30:])
+    def _update_grid(self, positions, colors):
+        """グリッドを更新（各ポケモンを3x3の領域で描く）"""
+        self.grid = self.rasterizer.rasterize(positions, colors)
+        self.im.set_data(self.grid)
+    
+    def update_plot(self, frame):
+        """プロットを更新"""
+        if self.runner is not None:
+            # シミュレーションはランナーが進めるので、最新の状態を描くだけ
+            snapshot = self.runner.latest()
+            return self.render(snapshot.state, snapshot.events, snapshot.positions, snapshot.colors)
         
-        # 日本語と絵文字に対応したフォント設定
-        self.log_text = self.ax_log.text(
-            0.05, 0.95,
-            log_text,
-            transform=self.ax_log.transAxes,
-            verticalalignment='top',
-            fontsize=7,
-            fontfamily='sans-serif'  # monospaceから変更
-        )
+        # シミュレーションを1ステップ進める（グリッドには座標と色の配列だけを使う）
+        self.engine.step(include_state=False)
+        _, positions, colors = self.engine.get_render_arrays()
+        return self.render(None, self.engine.get_recent_events(n=30), positions, colors)
     
     def run(self):
         """アニメーションを実行"""
@@ -0,0 +1,687 @@
+"""
+Webビューアー: シミュレーションの状態の差分をWebSocketでブラウザに配信する
+
+標準ライブラリだけで動くローカルのHTTP/WebSocketサーバーです。
+シミュレーション側は描画を一切行わず、ステップごとに差分を1回だけエンコードして
+全ての観測者に同じバイト列を送るので、観測者が増えてもほとんど負荷が増えません。
+
+メッセージの形式:
+    キーフレーム（テキスト, JSON）: 接続時と、ポケモンの顔ぶれが変わった時に送る全状態
+    差分（バイナリ, リトルエンディアン）:
+        0   uint8   種類 (1 = 差分)
+        1   uint8   フラグ (bit0: アイテムの一覧を含む)
+        4   uint32  ステップ数
+        8   uint32  ポケモンの数 N
+        12  uint32  ステータスが変化したポケモンの数 M
+        16  uint32  末尾のJSONのバイト数
+        20  float32 座標 [N, 2]
+            uint32  変化したポケモンの番号 [M]
+            uint8   HP [M], 元気 [M], 気分の番号 [M]
+            JSON    {"events": [...], "missed": M, "items": [...]}
+                    （前回の差分以降の新しいイベント、送れなかったイベントの数、変化した時だけアイテム）
+"""
+import base64
+import hashlib
+import json
+import queue
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from pokemon_alos import POKEMON_COLORS
+from events import SimEvent
+from sim_runner import SimulationRunner, StateSnapshot
+from world import DEFAULT_WORLD
+
+
+# RFC 6455 のハンドシェイクで使う固定のGUID
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# ループバックの別名（どの名前で開いても同じサーバーのページとして扱う）
+_LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+_OP_TEXT = 0x1
+_OP_BINARY = 0x2
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+# 差分メッセージのヘッダー（種類, フラグ, ステップ数, N, M, JSONのバイト数）
+_DELTA_HEADER = struct.Struct("<BBxxIIII")
+_MSG_DELTA = 1
+_FLAG_ITEMS = 0x1
+
+# 1つの差分で送るイベントの上限（クライアントが表示する行数と同じ。超えた分は数だけ送る）
+_MAX_DELTA_EVENTS = 200
+
+# 気分の番号（差分では文字列の代わりにこの番号を送る）
+MOODS = ("normal", "happy", "angry", "tired", "excited")
+_MOOD_CODES = {mood: code for code, mood in enumerate(MOODS)}
+
+
+def _ws_frame(opcode: int, payload: bytes) -> bytes:
+    """サーバーからクライアントへのWebSocketフレームを作成（マスクなし）"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _read_ws_frame(rfile) -> Tuple[int, bytes]:
+    """クライアントからのWebSocketフレームを1つ読む（接続が切れたら EOFError）"""
+    head = rfile.read(2)
+    if len(head) < 2:
+        raise EOFError
+    opcode = head[0] & 0x0F
+    masked = head[1] & 0x80
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if masked else b""
+    payload = rfile.read(length)
+    if len(payload) < length:
+        raise EOFError
+    if masked:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def _event_json(event) -> Dict:
+    """クライアントに送るイベントの形式"""
+    return {"seq": event.seq, "step": event.step, "kind": event.kind, "message": event.message}
+
+
+def _stats_arrays(snapshot: StateSnapshot) -> np.ndarray:
+    """スナップショットから (HP, 元気, 気分の番号) の配列 (N, 3) を作成"""
+    pokemons = snapshot.state["pokemons"]
+    stats = np.empty((len(snapshot.keys), 3), dtype=np.int64)
+    for i, key in enumerate(snapshot.keys):
+        data = pokemons[key]
+        stats[i] = (data["hp"], data["energy"], _MOOD_CODES.get(data["mood"], 0))
+    np.clip(stats, 0, 255, out=stats)
+    return stats.astype(np.uint8)
+
+
+class _Client:
+    """接続中の観測者1人分の送信キュー"""
+    
+    def __init__(self, connection: socket.socket, max_queue: int):
+        self.connection = connection
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.closed = threading.Event()
+        self._send_lock = threading.Lock()
+    
+    def send(self, frame: bytes):
+        """フレームをソケットに書き込む（送信中のフレームが混ざらないようにロックする）"""
+        with self._send_lock:
+            self.connection.sendall(frame)
+    
+    def close(self):
+        """接続を閉じるよう送信スレッドに伝える"""
+        self.closed.set()
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class WebViewerServer:
+    """シミュレーションの差分をブラウザに配信するローカルサーバー
+    
+    ランナーのティックごとに最新のスナップショットを受け取り、
+    配信スレッドで前回送ったスナップショットとの差分を作ります。
+    配信が追いつかない場合はスナップショットをまとめて1つの差分にし、
+    送信キューがあふれた観測者には次のティックでキーフレームを送り直します。
+    """
+    
+    def __init__(
+        self,
+        runner: SimulationRunner,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        field_size: Optional[Tuple[float, float]] = None,
+        max_queue: int = 64,
+        allowed_origins: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            runner: スナップショットを公開するシミュレーションランナー
+            host: 待ち受けるアドレス（外部に公開しないよう既定はlocalhost）
+            port: 待ち受けるポート（0なら空いているポートを使う）
+            field_size: フィールドの大きさ (幅, 高さ)（省略時はエンジンのワールドの大きさ）
+            max_queue: 観測者ごとに溜めておける未送信のメッセージ数
+            allowed_origins: このサーバー自身のページ以外に WebSocket の接続を許可するオリジン
+                （"http://example.local:8765" の形式。ブラウザで開いた他のサイトからの接続は拒否する）
+        """
+        self.runner = runner
+        world = getattr(runner.engine, "world", None) or DEFAULT_WORLD
+        self.field_size = field_size or world.size
+        self.wraps = world.wraps
+        self.max_queue = max_queue
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        
+        self._clients: List[_Client] = []
+        self._pending: List[_Client] = []
+        self._incoming: Optional[StateSnapshot] = None
+        self._incoming_events: List[SimEvent] = []  # まだ配信していない新しいイベント（古い順）
+        self._missed_events = 0  # 配信できずに捨てたイベントの数
+        self._event_cursor = -1  # 配信用に取り出した最後のイベントの通し番号
+        self._last: Optional[StateSnapshot] = None
+        self._last_stats: Optional[np.ndarray] = None
+        self._condition = threading.Condition()
+        self._stopping = False
+        
+        self._httpd = ThreadingHTTPServer((host, port), _ViewerRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.viewer = self
+        self._threads: List[threading.Thread] = []
+        
+        bound_port = self._httpd.server_address[1]
+        hosts = _LOOPBACK_HOSTS if host in ("127.0.0.1", "localhost", "::1") else (host,)
+        self.allowed_origins = {f"http://{name}:{bound_port}" for name in hosts}
+        self.allowed_origins.update(origin.rstrip("/").lower() for origin in allowed_origins or ())
+    
+    def is_allowed_origin(self, origin: Optional[str]) -> bool:
+        """
+        WebSocket の接続元のオリジンを許可するかどうか
+        
+        ブラウザは WebSocket の接続に必ず Origin を付けるので、他のサイトのページからの接続はここで拒否します。
+        Origin のない接続はブラウザ以外のクライアント（スクリプトなど）なので許可します。
+        """
+        if origin is None:
+            return True
+        return origin.rstrip("/").lower() in self.allowed_origins
+    
+    @property
+    def url(self) -> str:
+        """ブラウザで開くURL"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+    
+    @property
+    def observer_count(self) -> int:
+        """接続中の観測者の数"""
+        with self._condition:
+            return len(self._clients) + len(self._pending)
+    
+    def start(self):
+        """サーバーと配信スレッドを開始し、ランナーのティックを受け取り始める"""
+        self._last = self.runner.latest()
+        self._last_stats = _stats_arrays(self._last)
+        self._event_cursor = self._last.events[-1].seq if self._last.events else -1
+        self.runner.add_tick_listener(self._on_tick)
+        
+        for target, name in ((self._httpd.serve_forever, "web-viewer-http"), (self._broadcast_loop, "web-viewer-broadcast")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self):
+        """全ての接続を閉じてサーバーを止める"""
+        with self._condition:
+            self._stopping = True
+            clients = self._clients + self._pending
+            self._clients, self._pending = [], []
+            self._condition.notify()
+        for client in clients:
+            client.close()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+    
+    def _on_tick(self, snapshot: StateSnapshot):
+        """ランナーのスレッドから呼ばれる（最新のスナップショットと新しいイベントを置くだけ）
+        
+        スナップショットの events は最近の数件だけなので、配信が遅れて複数のティックを
+        1つの差分にまとめても取りこぼさないよう、イベントはエンジンのログから通し番号で取り出します。
+        """
+        events, missed = self._collect_events()
+        with self._condition:
+            self._incoming = snapshot
+            self._incoming_events.extend(events)
+            self._missed_events += missed
+            overflow = len(self._incoming_events) - _MAX_DELTA_EVENTS
+            if overflow > 0:
+                del self._incoming_events[:overflow]
+                self._missed_events += overflow
+            self._condition.notify()
+    
+    def _collect_events(self) -> Tuple[List[SimEvent], int]:
+        """エンジンのイベントログから前回以降のイベントを取り出す（ランナーのスレッドで呼ぶ）
+        
+        Returns:
+            (新しいイベントのリスト, ログのリングバッファからあふれて取り出せなかったイベントの数)
+        """
+        cursor = self._event_cursor
+        events = []
+        for event in reversed(self.runner.engine.event_log):
+            if event.seq <= cursor:
+                break
+            events.append(event)
+        if not events:
+            return [], 0
+        events.reverse()
+        self._event_cursor = events[-1].seq
+        return events, events[0].seq - cursor - 1
+    
+    def _register(self, client: _Client):
+        """新しい観測者を登録（次の配信でキーフレームを送る）"""
+        with self._condition:
+            self._pending.append(client)
+            self._condition.notify()
+    
+    def _unregister(self, client: _Client):
+        """切断した観測者を外す"""
+        with self._condition:
+            for clients in (self._clients, self._pending):
+                if client in clients:
+                    clients.remove(client)
+    
+    def _broadcast_loop(self):
+        """スナップショットを差分にエンコードして全ての観測者に送る"""
+        while True:
+            with self._condition:
+                while not self._stopping and self._incoming is None and not self._pending:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                snapshot, self._incoming = self._incoming, None
+                events, self._incoming_events = self._incoming_events, []
+                missed, self._missed_events = self._missed_events, 0
+                pending, self._pending = self._pending, []
+            
+            # 新しい観測者には、次の差分の基準になる状態をキーフレームで送る
+            if pending:
+                frame = _ws_frame(_OP_TEXT, self.encode_keyframe(self._last).encode("utf-8"))
+                self._publish(pending, frame)
+                with self._condition:
+                    self._clients.extend(pending)
+            
+            if snapshot is None:
+                continue
+            
+            with self._condition:
+                clients = list(self._clients)
+            if snapshot.keys != self._last.keys:
+                # ポケモンの顔ぶれが変わったら差分ではなく全状態を送る
+                frame = _ws_frame(_OP_TEXT, self.encode_keyframe(snapshot).encode("utf-8"))
+                self._last_stats = _stats_arrays(snapshot)
+            else:
+                frame = _ws_frame(_OP_BINARY, self.encode_delta(snapshot, events, missed))
+            self._last = snapshot
+            self._publish(clients, frame)
+    
+    def _publish(self, clients: List[_Client], frame: bytes):
+        """同じフレームを各観測者の送信キューに積む"""
+        for client in clients:
+            if client.closed.is_set():
+                continue
+            try:
+                client.queue.put_nowait(frame)
+            except queue.Full:
+                # 追いつけない観測者は未送信分を捨てて、キーフレームからやり直す
+                while True:
+                    try:
+                        client.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                with self._condition:
+                    if client in self._clients:
+                        self._clients.remove(client)
+                        self._pending.append(client)
+                continue
+            self.messages_sent += 1
+            self.bytes_sent += len(frame)
+    
+    def encode_keyframe(self, snapshot: StateSnapshot) -> str:
+        """スナップショットの全状態をJSONにエンコード"""
+        pokemons = snapshot.state["pokemons"]
+        stats = _stats_arrays(snapshot)
+        keyframe = {
+            "type": "keyframe",
+            "step": snapshot.step,
+            "field": list(self.field_size),
+            "wrap": self.wraps,
+            "interval": self.runner.tick_interval,
+            "moods": list(MOODS),
+            "keys": list(snapshot.keys),
+            "names": [pokemons[key]["name"] for key in snapshot.keys],
+            "species": [pokemons[key].get("species", "") for key in snapshot.keys],
+            "colors": [list(POKEMON_COLORS.get(key, (0.5, 0.5, 0.5))) for key in snapshot.keys],
+            "positions": np.round(snapshot.positions, 3).tolist(),
+            "hp": stats[:, 0].tolist(),
+            "energy": stats[:, 1].tolist(),
+            "mood": stats[:, 2].tolist(),
+            "items": self._items_json(snapshot),
+            "events": [_event_json(event) for event in snapshot.events]
+        }
+        return json.dumps(keyframe, ensure_ascii=False)
+    
+    def encode_delta(
+        self,
+        snapshot: StateSnapshot,
+        events: Optional[List[SimEvent]] = None,
+        missed: int = 0
+    ) -> bytes:
+        """
+        前回送ったスナップショットからの差分をバイナリにエンコード
+        
+        Args:
+            snapshot: 前回と同じポケモンの並びを持つスナップショット
+            events: 前回の差分以降の新しいイベント（省略時はスナップショットの最近のイベントから求める）
+            missed: 送れずに捨てたイベントの数（クライアントに省略したことを表示させる）
+        
+        Returns:
+            差分メッセージのバイト列（モジュールのdocstringの形式）
+        """
+        previous = self._last
+        stats = _stats_arrays(snapshot)
+        changed = np.flatnonzero((stats != self._last_stats).any(axis=1)).astype("<u4")
+        self._last_stats = stats
+        
+        flags = 0
+        tail: Dict = {}
+        if events is None:
+            last_seq = previous.events[-1].seq if previous.events else -1
+            events = [event for event in snapshot.events if event.seq > last_seq]
+        if events:
+            tail["events"] = [_event_json(event) for event in events]
+        if missed:
+            tail["missed"] = missed
+        # アイテムの一覧は変化するまで同じリストなので、同一性で比べられる
+        if snapshot.state["items"] is not previous.state["items"]:
+            tail["items"] = self._items_json(snapshot)
+            flags |= _FLAG_ITEMS
+        tail_bytes = json.dumps(tail, ensure_ascii=False).encode("utf-8") if tail else b""
+        
+        changed_stats = stats[changed]
+        return b"".join((
+            _DELTA_HEADER.pack(_MSG_DELTA, flags, snapshot.step, len(snapshot.keys), len(changed), len(tail_bytes)),
+            np.ascontiguousarray(snapshot.positions, dtype="<f4").tobytes(),
+            changed.tobytes(),
+            np.ascontiguousarray(changed_stats.T).tobytes(),
+            tail_bytes
+        ))
+    
+    @staticmethod
+    def _items_json(snapshot: StateSnapshot) -> List[Dict]:
+        """クライアントに送るアイテムの形式"""
+        return [
+            {
+                "name": item.name,
+                "position": [round(item.position[0], 3), round(item.position[1], 3)],
+                "color": list(item.color),
+                "emoji": item.emoji
+            }
+            for item in snapshot.state["items"]
+        ]
+
+
+class _ViewerRequestHandler(BaseHTTPRequestHandler):
+    """クライアントのHTMLを返し、/ws へのWebSocket接続を受け付ける"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        # アクセスログはシミュレーションのイベント表示を邪魔するので出さない
+        pass
+    
+    def do_GET(self):
+        if self.path in ("/", "/index.html"):
+            body = _CLIENT_HTML.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+            self._serve_websocket()
+        else:
+            self.send_error(404)
+    
+    def _serve_websocket(self):
+        """ハンドシェイクの後、接続が切れるまで送信キューの中身を送り続ける"""
+        viewer: WebViewerServer = self.server.viewer
+        if not viewer.is_allowed_origin(self.headers.get("Origin")):
+            self.send_error(403)
+            return
+        key = self.headers.get("Sec-WebSocket-Key")
+        if not key:
+            self.send_error(400)
+            return
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode("ascii")).digest()).decode("ascii")
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+        
+        client = _Client(self.connection, viewer.max_queue)
+        reader = threading.Thread(target=self._read_loop, args=(client,), name="web-viewer-reader", daemon=True)
+        reader.start()
+        viewer._register(client)
+        
+        try:
+            while not client.closed.is_set():
+                frame = client.queue.get()
+                if frame is None:
+                    break
+                client.send(frame)
+            client.send(_ws_frame(_OP_CLOSE, b""))
+        except OSError:
+            pass
+        finally:
+            client.closed.set()
+            viewer._unregister(client)
+    
+    def _read_loop(self, client: _Client):
+        """クライアントからのフレームを読み、切断とpingに応答する"""
+        try:
+            while not client.closed.is_set():
+                opcode, payload = _read_ws_frame(self.rfile)
+                if opcode == _OP_CLOSE:
+                    break
+                if opcode == _OP_PING:
+                    client.send(_ws_frame(_OP_PONG, payload))
+        except (EOFError, OSError, struct.error):
+            pass
+        client.close()
+
+
+_CLIENT_HTML = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8">
+<title>ポケモンALOs シミュレーション</title>
+<style>
+  body { margin: 0; display: flex; height: 100vh; font-family: sans-serif; background: #f4f4f4; }
+  #map { flex: 1; display: flex; flex-direction: column; }
+  #status { padding: 6px 10px; font-size: 13px; background: #fff; border-bottom: 1px solid #ddd; }
+  #canvas { flex: 1; width: 100%; min-height: 0; }
+  #log { width: 420px; overflow-y: auto; background: #fff; border-left: 1px solid #ddd;
+         font-size: 12px; padding: 6px 10px; white-space: pre-wrap; }
+  .event { border-bottom: 1px solid #eee; padding: 2px 0; }
+  .battle { color: #b22; } .friendship { color: #2a7; } .item { color: #a70; } .narrative { color: #447; }
+  .gap { color: #999; font-style: italic; }
+</style>
+</head>
+<body>
+<div id="map"><div id="status">接続中...</div><canvas id="canvas"></canvas></div>
+<div id="log"></div>
+<script>
+"use strict";
+const canvas = document.getElementById("canvas");
+const ctx = canvas.getContext("2d");
+const statusEl = document.getElementById("status");
+const logEl = document.getElementById("log");
+const MAX_LOG = 200;
+
+let world = null;           // キーフレームで受け取った顔ぶれと状態
+let prevPos = null, curPos = null, tickAt = 0;
+let lastStep = 0, ticks = 0, bytes = 0, rateStart = performance.now(), rateText = "";
+
+function addEvents(events) {
+  for (const e of events) {
+    const div = document.createElement("div");
+    div.className = "event " + e.kind;
+    div.textContent = "[Step " + e.step + "] " + e.message;
+    logEl.prepend(div);
+  }
+  while (logEl.childElementCount > MAX_LOG) logEl.lastChild.remove();
+}
+
+function addGap(count) {
+  const div = document.createElement("div");
+  div.className = "event gap";
+  div.textContent = "… " + count + "件のイベントを省略";
+  logEl.prepend(div);
+}
+
+function applyKeyframe(k) {
+  world = k;
+  curPos = Float32Array.from(k.positions.flat());
+  prevPos = curPos;
+  tickAt = performance.now();
+  lastStep = k.step;
+  logEl.textContent = "";
+  addEvents(k.events);
+}
+
+function applyDelta(buf) {
+  const view = new DataView(buf);
+  const flags = view.getUint8(1);
+  const step = view.getUint32(4, true), n = view.getUint32(8, true);
+  const m = view.getUint32(12, true), tailLen = view.getUint32(16, true);
+  let offset = 20;
+  const positions = new Float32Array(buf, offset, n * 2); offset += n * 8;
+  const index = new Uint32Array(buf, offset, m); offset += m * 4;
+  const stats = new Uint8Array(buf, offset, m * 3); offset += m * 3;
+  for (let j = 0; j < m; j++) {
+    const i = index[j];
+    world.hp[i] = stats[j]; world.energy[i] = stats[m + j]; world.mood[i] = stats[2 * m + j];
+  }
+  prevPos = currentPositions(performance.now());
+  curPos = positions.slice();
+  tickAt = performance.now();
+  if (tailLen > 0) {
+    const tail = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, offset, tailLen)));
+    if (tail.missed) addGap(tail.missed);
+    if (tail.events) addEvents(tail.events);
+    if (flags & 1) world.items = tail.items;
+  }
+  lastStep = step;
+}
+
+// 前のティックと最新のティックの間で座標を補間する
+function currentPositions(now) {
+  if (!world || world.interval <= 0 || prevPos.length !== curPos.length) return curPos;
+  const t = Math.min(1, (now - tickAt) / (world.interval * 1000));
+  const out = new Float32Array(curPos.length);
+  for (let i = 0; i < out.length; i++) {
+    let d = curPos[i] - prevPos[i];
+    if (world.wrap) {
+      // 端をまたいだ移動は最短の向きに補間し、フィールド内に戻す
+      const size = world.field[i % 2];
+      d -= size * Math.round(d / size);
+      out[i] = ((prevPos[i] + d * t) % size + size) % size;
+    } else {
+      out[i] = prevPos[i] + d * t;
+    }
+  }
+  return out;
+}
+
+function rgb(c, factor) {
+  return "rgb(" + c.map(v => Math.round(v * factor * 255)).join(",") + ")";
+}
+
+function draw(now) {
+  requestAnimationFrame(draw);
+  const w = canvas.clientWidth, h = canvas.clientHeight;
+  if (canvas.width !== w || canvas.height !== h) { canvas.width = w; canvas.height = h; }
+  ctx.fillStyle = "#e8f5e9";
+  ctx.fillRect(0, 0, w, h);
+  if (!world) return;
+  
+  const margin = 20;
+  const scale = Math.min((w - 2 * margin) / world.field[0], (h - 2 * margin) / world.field[1]);
+  const sx = x => margin + x * scale;
+  const sy = y => h - margin - y * scale;
+  ctx.strokeStyle = "#9c9";
+  ctx.strokeRect(sx(0), sy(world.field[1]), world.field[0] * scale, world.field[1] * scale);
+  
+  ctx.textAlign = "center";
+  ctx.textBaseline = "middle";
+  ctx.font = "14px sans-serif";
+  for (const item of world.items) {
+    ctx.fillStyle = rgb(item.color, 1);
+    ctx.fillText(item.emoji, sx(item.position[0]), sy(item.position[1]));
+  }
+  
+  const pos = currentPositions(now);
+  const n = world.keys.length;
+  const detailed = n <= 50;
+  const radius = detailed ? 10 : Math.max(1.5, Math.min(6, 400 / Math.sqrt(n) / 10));
+  ctx.font = "11px sans-serif";
+  for (let i = 0; i < n; i++) {
+    const x = sx(pos[2 * i]), y = sy(pos[2 * i + 1]);
+    // HPが低いほど暗くする（最低30%）
+    ctx.fillStyle = rgb(world.colors[i], Math.max(0.3, world.hp[i] / 100));
+    ctx.beginPath();
+    ctx.arc(x, y, radius, 0, 2 * Math.PI);
+    ctx.fill();
+    if (detailed) {
+      ctx.fillStyle = "#333";
+      ctx.fillText(world.names[i] + " (" + world.moods[world.mood[i]] + ")", x, y - radius - 8);
+      ctx.fillStyle = "#ccc";
+      ctx.fillRect(x - 15, y + radius + 3, 30, 4);
+      ctx.fillStyle = world.hp[i] > 30 ? "#4caf50" : "#e53935";
+      ctx.fillRect(x - 15, y + radius + 3, 30 * world.hp[i] / 100, 4);
+    }
+  }
+  
+  if (now - rateStart >= 1000) {
+    rateText = (ticks * 1000 / (now - rateStart)).toFixed(1) + " ticks/s, " +
+               (bytes / Math.max(ticks, 1) / 1024).toFixed(1) + " KB/tick";
+    ticks = 0; bytes = 0; rateStart = now;
+  }
+  statusEl.textContent = "Step " + lastStep + " | ポケモン " + n + "体 | アイテム " +
+                         world.items.length + "個 | " + rateText;
+}
+
+function connect() {
+  const ws = new WebSocket("ws://" + location.host + "/ws");
+  ws.binaryType = "arraybuffer";
+  ws.onmessage = msg => {
+    ticks++;
+    if (typeof msg.data === "string") {
+      bytes += msg.data.length;
+      applyKeyframe(JSON.parse(msg.data));
+    } else if (world) {
+      bytes += msg.data.byteLength;
+      applyDelta(msg.data);
+    }
+  };
+  ws.onclose = () => { statusEl.textContent = "切断されました。再接続中..."; setTimeout(connect, 1000); };
+}
+
+connect();
+requestAnimationFrame(draw);
+</script>
+</body>
+</html>
+"""
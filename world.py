@@ -0,0 +1,125 @@
+"""
+ワールド設定: フィールドの大きさ、境界の扱い、インタラクションの距離
+"""
+import math
+import random
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+
+# 境界の扱い
+BOUNDARY_MODES = ("clamp", "wrap")
+
+# 既定のフィールドの面積（この面積ごとにアイテムの出現領域を1つ割り当てる）
+_BASE_REGION_SIZE = 10.0
+
+
+class WorldConfig(NamedTuple):
+    """シミュレーションのワールドの設定（全てのサブシステムがこれを参照する）
+    
+    boundary が "clamp" なら端で止まり、"wrap" なら反対側から出てくる
+    （距離と移動の向きも端をまたいだ最短のものになる）。
+    """
+    width: float = 10.0
+    height: float = 10.0
+    boundary: str = "clamp"
+    interaction_radius: float = 1.5  # この距離未満でバトルや交流が起きる
+    awareness_radius: float = 3.0    # この距離未満で互いに気づいて近づく/離れる
+    pickup_radius: float = 0.6       # この距離未満のアイテムを拾う
+    
+    @property
+    def size(self) -> Tuple[float, float]:
+        """フィールドの大きさ (幅, 高さ)"""
+        return (self.width, self.height)
+    
+    @property
+    def wraps(self) -> bool:
+        """端がつながっているかどうか"""
+        return self.boundary == "wrap"
+    
+    @property
+    def item_regions(self) -> Tuple[int, int]:
+        """アイテムの出現領域の分割数（既定の10×10ごとに1つ）"""
+        return (
+            max(1, math.ceil(self.width / _BASE_REGION_SIZE)),
+            max(1, math.ceil(self.height / _BASE_REGION_SIZE))
+        )
+    
+    def validate(self) -> 'WorldConfig':
+        """設定の値を検証して自身を返す"""
+        if self.width <= 0 or self.height <= 0:
+            raise ValueError(f"フィールドの大きさは正の値にしてください: {self.width}×{self.height}")
+        if self.boundary not in BOUNDARY_MODES:
+            raise ValueError(f"未知の境界の扱い: {self.boundary}（{'/'.join(BOUNDARY_MODES)}）")
+        if not 0 < self.interaction_radius <= self.awareness_radius:
+            raise ValueError("距離は 0 < interaction_radius <= awareness_radius にしてください")
+        return self
+    
+    @classmethod
+    def for_agents(cls, n_agents: int, density: float = 0.03, **kwargs) -> 'WorldConfig':
+        """
+        個体数に合わせて、面積あたりの個体数が density になる正方形のワールドを作成
+        
+        Args:
+            n_agents: ポケモンの数
+            density: 面積1あたりのポケモンの数（既定の10×10に3体なら0.03）
+            **kwargs: その他の WorldConfig の値
+        
+        Returns:
+            WorldConfig（1辺は10以上）
+        """
+        side = max(10.0, math.sqrt(n_agents / density))
+        return cls(width=side, height=side, **kwargs)
+    
+    def random_position(self, rng: Optional[random.Random] = None) -> Tuple[float, float]:
+        """
+        フィールド内のランダムな位置
+        
+        Args:
+            rng: 使う乱数（省略時はrandomモジュール）。実行を再現する場合はシード付きのものを渡す
+        
+        Returns:
+            (x, y)
+        """
+        rng = rng if rng is not None else random
+        return (rng.uniform(0, self.width), rng.uniform(0, self.height))
+    
+    def confine(self, x: float, y: float) -> Tuple[float, float]:
+        """座標を境界の扱いに従ってフィールド内に収める"""
+        if self.boundary == "wrap":
+            return (x % self.width, y % self.height)
+        return (max(0.0, min(self.width, x)), max(0.0, min(self.height, y)))
+    
+    def delta(self, x1: float, y1: float, x2: float, y2: float) -> Tuple[float, float]:
+        """(x1, y1) から (x2, y2) への変位（wrapなら端をまたいだ最短の変位）"""
+        dx = x2 - x1
+        dy = y2 - y1
+        if self.boundary == "wrap":
+            dx -= self.width * round(dx / self.width)
+            dy -= self.height * round(dy / self.height)
+        return dx, dy
+    
+    def distance(self, x1: float, y1: float, x2: float, y2: float) -> float:
+        """2点間の距離（wrapなら端をまたいだ最短の距離）"""
+        if self.boundary != "wrap":
+            return math.hypot(x2 - x1, y2 - y1)
+        return math.hypot(*self.delta(x1, y1, x2, y2))
+    
+    def delta_array(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """座標の配列 (N, 2) の start から end への変位（wrapなら端をまたいだ最短の変位）"""
+        delta = np.asarray(end, dtype=float) - np.asarray(start, dtype=float)
+        if self.boundary == "wrap":
+            size = np.array(self.size)
+            delta -= size * np.round(delta / size)
+        return delta
+    
+    def confine_array(self, positions: np.ndarray) -> np.ndarray:
+        """座標の配列 (N, 2) をフィールド内に収めた配列を返す"""
+        positions = np.asarray(positions, dtype=float)
+        size = np.array(self.size)
+        if self.boundary == "wrap":
+            return np.mod(positions, size)
+        return np.clip(positions, 0.0, size)
+
+
+# 既定のワールド（従来の10×10, 端で止まる）
+DEFAULT_WORLD = WorldConfig()